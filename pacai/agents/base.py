@@ -2,6 +2,7 @@ import abc
 import glob
 import logging
 import os
+import random
 
 from pacai.util import reflection
 
@@ -19,12 +20,19 @@ class BaseAgent(abc.ABC):
 
     Non-abstract children should make sure that their constructors accept `**kwargs`,
     since agents are typically created reflexively.
+
+    Agents that make random choices should use `BaseAgent.rng` instead of the `random` module.
+    The game hands each agent its own random number generator (see `BaseAgent.setRNG`),
+    so that games are reproducible even when several of them are played at once.
     """
 
     def __init__(self, index = 0, **kwargs):
         self.index = index
         self.kwargs = kwargs
 
+        # The global random module, until a game gives this agent a generator.
+        self.rng = random
+
     @abc.abstractmethod
     def getAction(self, state):
         """
@@ -56,6 +64,14 @@ class BaseAgent(abc.ABC):
 
         pass
 
+    def setRNG(self, rng):
+        """
+        Set the random number generator (a `random.Random`) that this agent should use.
+        This is called by the game before `BaseAgent.registerInitialState`.
+        """
+
+        self.rng = rng
+
     @staticmethod
     def loadAgent(name, index, args = {}):
         """
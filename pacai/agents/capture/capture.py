@@ -40,7 +40,8 @@ class CaptureAgent(BaseAgent):
         self.red = gameState.isOnRedTeam(self.index)
         self.distancer = distanceCalculator.Distancer(gameState.getInitialLayout())
 
-        self.distancer.getMazeDistances()
+        # Incremental distancers only spend timeForComputing here, and continue in getAction().
+        self.distancer.getMazeDistances(self.timeForComputing)
 
     def final(self, gameState):
         self.observationHistory = []
@@ -64,6 +65,9 @@ class CaptureAgent(BaseAgent):
 
         self.observationHistory.append(gameState)
 
+        if (self.distancer is not None and not self.distancer.hasAllDistances()):
+            self.distancer.computeMazeDistances(self.timeForComputing)
+
         myState = gameState.getAgentState(self.index)
         myPos = myState.getPosition()
 
@@ -160,6 +164,25 @@ class CaptureAgent(BaseAgent):
 
         return self.distancer.getDistance(pos1, pos2)
 
+    def getMazeDistancesTo(self, pos, targets):
+        """
+        Returns the distances from a position to each of the targets (in the same order)
+        using the builtin distancer.
+        This is faster than calling `CaptureAgent.getMazeDistance` for each target.
+        """
+
+        return self.distancer.distancesTo(pos, targets)
+
+    def getNearest(self, pos, targets):
+        """
+        Returns the target closest to a position (and its distance) as (distance, target),
+        or (None, None) if there are no targets.
+        For example, the distance to the closest food is:
+        `self.getNearest(myPos, self.getFood(gameState).asList())[0]`.
+        """
+
+        return self.distancer.nearest(pos, targets)
+
     def getPreviousObservation(self):
         """
         Returns the `pacai.core.gamestate.AbstractGameState` object corresponding to
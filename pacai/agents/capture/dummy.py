@@ -1,5 +1,3 @@
-import random
-
 from pacai.agents.capture.capture import CaptureAgent
 
 class DummyAgent(CaptureAgent):
@@ -29,4 +27,4 @@ class DummyAgent(CaptureAgent):
         """
 
         actions = gameState.getLegalActions(self.index)
-        return random.choice(actions)
+        return self.rng.choice(actions)
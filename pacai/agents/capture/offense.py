@@ -21,8 +21,7 @@ class OffensiveReflexAgent(ReflexCaptureAgent):
         # This should always be True, but better safe than sorry.
         if (len(foodList) > 0):
             myPos = successor.getAgentState(self.index).getPosition()
-            minDistance = min([self.getMazeDistance(myPos, food) for food in foodList])
-            features['distanceToFood'] = minDistance
+            features['distanceToFood'] = self.getNearest(myPos, foodList)[0]
 
         return features
 
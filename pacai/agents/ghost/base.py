@@ -20,7 +20,7 @@ class GhostAgent(BaseAgent):
         if (len(dist) == 0):
             return Directions.STOP
         else:
-            return probability.sample(dist)
+            return probability.sample(dist, rng = self.rng)
 
     @abc.abstractmethod
     def getDistribution(self, state):
@@ -1,5 +1,3 @@
-import random
-
 from pacai.agents.base import BaseAgent
 
 class RandomAgent(BaseAgent):
@@ -11,4 +9,4 @@ class RandomAgent(BaseAgent):
         super().__init__(index, **kwargs)
 
     def getAction(self, state):
-        return random.choice(state.getLegalActions(self.index))
+        return self.rng.choice(state.getLegalActions(self.index))
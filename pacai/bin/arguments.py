@@ -27,6 +27,12 @@ def getParser(description, name):
             action = 'store', type = int, default = None,
             help = 'Enter seed value to randomize the game')
 
+    parser.add_argument('--agent-processes', dest = 'agentProcesses',
+            action = 'store_true', default = False,
+            help = 'play each agent (or team) from its own process, '
+                + 'which is only sent the moves of the game instead of whole states '
+                + '(default: %(default)s)')
+
     parser.add_argument('--catch-exceptions', dest = 'catchExceptions',
             action = 'store_true', default = False,
             help = 'turns on exception handling and timeouts during games (default: %(default)s)')
@@ -48,6 +54,12 @@ def getParser(description, name):
             action = 'store', type = int, default = view.DEFAULT_SKIP_FRAMES,
             help = 'skip X actual frames between each frame of the gif (default: %(default)s)')
 
+    parser.add_argument('--jobs', dest = 'jobs',
+            action = 'store', type = int, default = None,
+            help = 'play the (non-training) games in this many processes at once, '
+                + 'each game gets its own seed and is played without graphics '
+                + '(default: %(default)s)')
+
     parser.add_argument('--null-graphics', dest = 'nullGraphics',
             action = 'store_true', default = False,
             help = 'generate no graphics (default: %(default)s)')
@@ -68,6 +80,11 @@ def getParser(description, name):
             action = 'store', type = str, default = view.DEFAULT_SPRITES,
             help = 'use the specified spritesheet for graphics (default: %(default)s)')
 
+    parser.add_argument('--successor-cache-size', dest = 'successorCacheSize',
+            action = 'store', type = int, default = 0,
+            help = 'cache up to this many generated successor states per game, '
+                + 'zero turns the cache off (default: %(default)s)')
+
     parser.add_argument('--text-graphics', dest = 'textGraphics',
             action = 'store_true', default = False,
             help = 'display output as text only (default: %(default)s)')
@@ -0,0 +1,187 @@
+"""
+Measure how many games per second the engine can play.
+The standard game loop (`pacai.core.game.Game.run` with a null view)
+is compared with the headless one (`pacai.core.game.Game.simulate`).
+"""
+
+import argparse
+import logging
+import os
+import random
+import sys
+import textwrap
+import time
+
+from pacai.agents.base import BaseAgent
+from pacai.bin import capture
+from pacai.bin import pacman
+from pacai.core.layout import getLayout
+from pacai.ui.capture.null import CaptureNullView
+from pacai.ui.pacman.null import PacmanNullView
+from pacai.util.logs import initLogging
+from pacai.util.logs import updateLoggingLevel
+
+def benchmark(newGame, numGames, seed, fast):
+    """
+    Play `numGames` games made by `newGame(fast, rng)`.
+    Game i is seeded with (seed + i), so both loops play the same games.
+    Returns the number of seconds taken (not counting setup) and the final scores.
+    """
+
+    totalTime = 0.0
+    scores = []
+
+    for i in range(numGames):
+        random.seed(seed + i)
+        rng = random.Random(seed + i)
+
+        game = newGame(fast, rng)
+
+        startTime = time.time()
+        if (fast):
+            game.simulate()
+        else:
+            game.run()
+
+        totalTime += time.time() - startTime
+        scores.append(game.state.getScore())
+
+    return totalTime, scores
+
+def benchmarkCapture(options):
+    layout = getLayout(options.captureLayout)
+    rules = capture.CaptureRules()
+
+    def newGame(fast, rng):
+        display = None
+        if (not fast):
+            display = CaptureNullView()
+
+        agents = _loadAgents(options.captureAgent, range(len(layout.agentPositions)))
+        return rules.newGame(layout, agents, display, options.captureLength, False, rng)
+
+    return _report('capture', options.captureLayout, newGame, options)
+
+def benchmarkPacman(options):
+    layout = getLayout(options.pacmanLayout)
+    rules = pacman.ClassicGameRules()
+
+    def newGame(fast, rng):
+        display = None
+        if (not fast):
+            display = PacmanNullView()
+
+        agents = _loadAgents(options.pacmanAgent, [0])
+        agents += _loadAgents(options.ghostAgent, range(1, layout.getNumGhosts() + 1))
+
+        return rules.newGame(layout, agents[0], agents[1:], display, rng = rng)
+
+    return _report('pacman', options.pacmanLayout, newGame, options)
+
+def parseOptions(argv):
+    """
+    Processes the command used to run the benchmark from the command line.
+    """
+
+    description = """
+    DESCRIPTION:
+        This program measures how many games per second pacman and capture can play
+        with the standard game loop and with the fast (headless) one.
+
+    EXAMPLES:
+        (1) python -m pacai.bin.benchmark
+            - Benchmarks both games with the default (random) agents.
+        (2) python -m pacai.bin.benchmark --pacman-agent GreedyAgent --num-games 50
+            - Benchmarks 50 games of each with a greedy pacman.
+    """
+
+    parser = argparse.ArgumentParser(description = textwrap.dedent(description),
+        prog = os.path.basename(__file__), formatter_class = argparse.RawTextHelpFormatter)
+
+    parser.add_argument('-d', '--debug', dest = 'debug',
+            action = 'store_true', default = False,
+            help = 'set logging level to debug (default: %(default)s)')
+
+    parser.add_argument('-n', '--num-games', dest = 'numGames',
+            action = 'store', type = int, default = 20,
+            help = 'play this many games of each type in each mode (default: %(default)s)')
+
+    parser.add_argument('-s', '--seed', dest = 'seed',
+            action = 'store', type = int, default = 0,
+            help = 'the seed for the first game (default: %(default)s)')
+
+    parser.add_argument('--capture-agent', dest = 'captureAgent',
+            action = 'store', type = str, default = 'RandomAgent',
+            help = 'use this agent for all the capture agents (default: %(default)s)')
+
+    parser.add_argument('--capture-layout', dest = 'captureLayout',
+            action = 'store', type = str, default = 'defaultCapture',
+            help = 'use the specified capture layout (default: %(default)s)')
+
+    parser.add_argument('--capture-length', dest = 'captureLength',
+            action = 'store', type = int, default = 1200,
+            help = 'the maximum number of moves in a capture game (default: %(default)s)')
+
+    parser.add_argument('--ghost-agent', dest = 'ghostAgent',
+            action = 'store', type = str, default = 'RandomGhost',
+            help = 'use this agent for the ghosts (default: %(default)s)')
+
+    parser.add_argument('--pacman-agent', dest = 'pacmanAgent',
+            action = 'store', type = str, default = 'RandomAgent',
+            help = 'use this agent for pacman (default: %(default)s)')
+
+    parser.add_argument('--pacman-layout', dest = 'pacmanLayout',
+            action = 'store', type = str, default = 'mediumClassic',
+            help = 'use the specified pacman layout (default: %(default)s)')
+
+    options, otherjunk = parser.parse_known_args(argv)
+
+    if len(otherjunk) != 0:
+        raise ValueError('Unrecognized options: \'%s\'.' % (str(otherjunk)))
+
+    if (options.numGames <= 0):
+        raise ValueError('The number of games must be positive.')
+
+    return options
+
+def _loadAgents(name, indexes):
+    return [BaseAgent.loadAgent(name, index) for index in indexes]
+
+def _report(name, layoutName, newGame, options):
+    """
+    Run and print both loops, and return the games per second of each as (standard, fast).
+    """
+
+    (standardTime, standardScores) = benchmark(newGame, options.numGames, options.seed, False)
+    (fastTime, fastScores) = benchmark(newGame, options.numGames, options.seed, True)
+
+    if (standardScores != fastScores):
+        logging.warning('The standard and fast loops got different scores for %s.' % (name))
+
+    standardRate = options.numGames / max(standardTime, 1e-9)
+    fastRate = options.numGames / max(fastTime, 1e-9)
+
+    print('%s (%s, %d games): standard: %.2f games/s, fast: %.2f games/s (%.2fx)' % (
+        name, layoutName, options.numGames, standardRate, fastRate, fastRate / standardRate))
+
+    return standardRate, fastRate
+
+def main(argv):
+    """
+    Entry point for the benchmark.
+    The args are a blind pass of `sys.argv` with the executable stripped.
+    """
+
+    initLogging()
+    options = parseOptions(argv)
+
+    # Games log their results, which would drown out (and slow down) the benchmark.
+    if (options.debug):
+        updateLoggingLevel(logging.DEBUG)
+    else:
+        updateLoggingLevel(logging.WARNING)
+
+    return [benchmarkPacman(options), benchmarkCapture(options)]
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
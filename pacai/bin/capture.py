@@ -9,16 +9,20 @@ import logging
 import os
 import pickle
 import random
+import struct
 import sys
 
 from pacai.agents import keyboard
 from pacai.agents.capture.dummy import DummyAgent
 from pacai.bin.arguments import getParser
+from pacai.core import distanceCalculator
 from pacai.core.actions import Actions
+from pacai.core.agentHost import AgentHost
 from pacai.core.distance import manhattan
 from pacai.core.game import Game
+from pacai.core.game import GameResult
 from pacai.core.gamestate import AbstractGameState
-from pacai.core.grid import Grid
+from pacai.core.grid import ReadOnlyGrid
 from pacai.core.layout import Layout
 from pacai.core.layout import getLayout
 from pacai.ui.capture.null import CaptureNullView
@@ -26,7 +30,9 @@ from pacai.ui.capture.text import CaptureTextView
 from pacai.util import reflection
 from pacai.util.logs import initLogging
 from pacai.util.logs import updateLoggingLevel
+from pacai.util.lruCache import LRUCache
 from pacai.util.mazeGenerator import generateMaze
+from pacai.util.parallel import runInParallel
 from pacai.util.util import nearestPoint
 
 COLLISION_TOLERANCE = 0.7  # How close ghosts must be to Pacman to kill
@@ -43,97 +49,106 @@ class CaptureGameState(AbstractGameState):
     A game state specific to capture.
     """
 
+    __slots__ = (
+        '_timeleft',
+        '_blueTeam',
+        '_redTeam',
+        '_teams',
+        '_redCapsules',
+        '_blueCapsules',
+        '_redFood',
+        '_blueFood',
+        '_numRedFood',
+        '_numBlueFood',
+    )
+
+    _UNDO_FIELDS = AbstractGameState._UNDO_FIELDS + (
+        '_redFood',
+        '_blueFood',
+        '_numRedFood',
+        '_numBlueFood',
+        '_redCapsules',
+        '_blueCapsules',
+        '_timeleft',
+    )
+
+    _BYTES_TYPE = b'C'
+    _BYTES_EXTRA = struct.Struct('<i')
+
     def __init__(self, layout, timeleft):
         super().__init__(layout)
 
         self._timeleft = timeleft
-
-        # The index of agents on each team.
-        self._blueTeam = []
-        self._redTeam = []
-
-        # Matches indexes with getAgentStates().
-        # True if the agent is on the red team, false otherwise.
-        self._teams = []
-
-        for agentIndex in range(self.getNumAgents()):
-            agentState = self.getAgentState(agentIndex)
-            agentIsRed = self.isOnRedSide(agentState.getPosition())
-
-            self._teams.append(agentIsRed)
-
-            if (agentIsRed):
-                self._redTeam.append(agentIndex)
-            else:
-                self._blueTeam.append(agentIndex)
-
-        # Build some denormalized structures for fast access.
-
-        self._redCapsules = []
-        self._blueCapsules = []
-
-        for capsule in self.getCapsules():
-            if (self.isOnRedSide(capsule)):
-                self._redCapsules.append(capsule)
-            else:
-                self._blueCapsules.append(capsule)
-
-        self._redFood = Grid(self._food.getWidth(), self._food.getHeight(), initialValue = False)
-        self._blueFood = Grid(self._food.getWidth(), self._food.getHeight(), initialValue = False)
-
-        for x in range(self._food.getWidth()):
-            for y in range(self._food.getHeight()):
-                if (not self._food[x][y]):
-                    continue
-
-                if (self.isOnRedSide((x, y))):
-                    self._redFood[x][y] = True
-                else:
-                    self._blueFood[x][y] = True
+        self._initTeams()
 
     # Override
-    def generateSuccessor(self, agentIndex, action):
-        # Check that successors exist.
+    def getLegalActions(self, agentIndex = 0):
         if (self.isOver()):
-            raise RuntimeError("Can't generate successors of a terminal state.")
+            return []
 
-        successor = self._initSuccessor()
-        successor._applySuccessorAction(agentIndex, action)
+        return AgentRules.getLegalActions(self, agentIndex)
 
-        return successor
+    # Override
+    def _copyFields(self, other):
+        super()._copyFields(other)
+
+        other._timeleft = self._timeleft
+        other._blueTeam = self._blueTeam
+        other._redTeam = self._redTeam
+        other._teams = self._teams
+        other._redCapsules = self._redCapsules
+        other._blueCapsules = self._blueCapsules
+        other._redFood = self._redFood
+        other._blueFood = self._blueFood
+        other._numRedFood = self._numRedFood
+        other._numBlueFood = self._numBlueFood
 
     # Override
-    def getLegalActions(self, agentIndex = 0):
-        if (self.isOver()):
-            return []
+    def _getBytesFields(self):
+        return (self._timeleft,)
 
-        return AgentRules.getLegalActions(self, agentIndex)
+    # Override
+    def _getSuccessorCacheKey(self, agentIndex, action):
+        # The time left is not part of equality, but it is part of the successor.
+        return (self, agentIndex, action, self._timeleft)
 
     # Override
     def eatCapsule(self, x, y):
-        if (not self._capsulesCopied):
+        # The parent marks the capsules as copied, so check before it does.
+        copied = self._capsulesCopied
+        if (not super().eatCapsule(x, y)):
+            return False
+
+        if (not copied):
             self._redCapsules = self._redCapsules.copy()
             self._blueCapsules = self._blueCapsules.copy()
 
-        super().eatCapsule(x, y)
-
         if (self.isOnRedSide((x, y))):
             self._redCapsules.remove((x, y))
         else:
             self._blueCapsules.remove((x, y))
 
+        return True
+
     # Override
     def eatFood(self, x, y):
-        if (not self._foodCopied):
-            self._redFood = self._redFood.copy()
-            self._blueFood = self._blueFood.copy()
+        # The parent marks the food as copied, so check before it does.
+        copied = self._foodCopied
+        if (not super().eatFood(x, y)):
+            return False
 
-        super().eatFood(x, y)
+        if (not copied):
+            self._redFood = self._redFood.copyOnWrite()
+            self._blueFood = self._blueFood.copyOnWrite()
 
         if (self.isOnRedSide((x, y))):
-            self._redFood[x][y] = False
+            self._redFood.setCell(x, y, False)
+            self._numRedFood -= 1
         else:
-            self._blueFood[x][y] = False
+            self._blueFood.setCell(x, y, False)
+            self._numBlueFood -= 1
+
+        return True
 
     def getBlueCapsules(self):
         """
@@ -148,10 +163,10 @@ class CaptureGameState(AbstractGameState):
         Returns a grid of food that corresponds to the food on the blue team's side.
         For the grid g, g[x][y] = True if there is food in (x, y) that belongs to
         blue (meaning blue is protecting it, red is trying to eat it).
-        The caller should not modify the grid.
+        The grid is a read-only view, call copy() on it to get a grid that can be modified.
         """
 
-        return self._blueFood
+        return ReadOnlyGrid(self._blueFood)
 
     def getBlueTeamIndices(self):
         """
@@ -161,6 +176,22 @@ class CaptureGameState(AbstractGameState):
 
         return self._blueTeam
 
+    def getNumBlueFood(self):
+        """
+        Get the amount of food left on the blue side.
+        This is cheaper than counting the grid from `getBlueFood`.
+        """
+
+        return self._numBlueFood
+
+    def getNumRedFood(self):
+        """
+        Get the amount of food left on the red side.
+        This is cheaper than counting the grid from `getRedFood`.
+        """
+
+        return self._numRedFood
+
     def getRedCapsules(self):
         """
         Get a list of remaining capsules on the red side.
@@ -174,10 +205,10 @@ class CaptureGameState(AbstractGameState):
         Returns a grid of food that corresponds to the food on the red team's side.
         For the grid g, g[x][y] = True if there is food in (x, y) that belongs to
         red (meaning red is protecting it, blue is trying to eat it).
-        The caller should not modify the grid.
+        The grid is a read-only view, call copy() on it to get a grid that can be modified.
         """
 
-        return self._redFood
+        return ReadOnlyGrid(self._redFood)
 
     def getRedTeamIndices(self):
         """
@@ -224,15 +255,15 @@ class CaptureGameState(AbstractGameState):
 
         return self._teams[agentIndex]
 
-    def _applySuccessorAction(self, agentIndex, action):
+    def _applySuccessorAction(self, agentIndex, action, validate = True):
         """
         Apply the action to the context state (self).
         """
 
         # Find appropriate rules for the agent.
-        AgentRules.applyAction(self, action, agentIndex)
+        AgentRules.applyAction(self, action, agentIndex, validate)
         AgentRules.checkDeath(self, agentIndex)
-        AgentRules.decrementTimer(self.getAgentState(agentIndex))
+        AgentRules.decrementTimer(self.getMutableAgentState(agentIndex))
 
         # Book keeping.
         self._lastAgentMoved = agentIndex
@@ -240,23 +271,80 @@ class CaptureGameState(AbstractGameState):
 
         self._hash = None
 
+    def _initTeams(self):
+        """
+        Build the team and per-side structures from the initial agent positions
+        and the current food and capsules.
+        """
+
+        # The index of agents on each team.
+        self._blueTeam = []
+        self._redTeam = []
+
+        # Matches indexes with getAgentStates().
+        # True if the agent is on the red team, false otherwise.
+        self._teams = []
+
+        for agentIndex in range(self.getNumAgents()):
+            agentIsRed = self.isOnRedSide(self.getInitialAgentPosition(agentIndex))
+
+            self._teams.append(agentIsRed)
+
+            if (agentIsRed):
+                self._redTeam.append(agentIndex)
+            else:
+                self._blueTeam.append(agentIndex)
+
+        # Build some denormalized structures for fast access.
+
+        self._redCapsules = []
+        self._blueCapsules = []
+
+        for capsule in self.getCapsules():
+            if (self.isOnRedSide(capsule)):
+                self._redCapsules.append(capsule)
+            else:
+                self._blueCapsules.append(capsule)
+
+        # The red side is the left half of the board, so the food can be split by columns.
+        half = int(self._layout.width / 2)
+        self._redFood = self._food.copyColumns(0, half)
+        self._blueFood = self._food.copyColumns(half, self._food.getWidth())
+
+        self._numRedFood = self._redFood.count()
+        self._numBlueFood = self._blueFood.count()
+
+    # Override
+    def _setBytesFields(self, fields):
+        (self._timeleft,) = fields
+        self._initTeams()
+
 class CaptureRules:
     """
     These game rules manage the control flow of a game, deciding when
     and how the game starts and ends.
     """
 
-    def newGame(self, layout, agents, display, length, catchExceptions):
+    def __init__(self, successorCacheSize = 0):
+        self.successorCacheSize = successorCacheSize
+
+    def newGame(self, layout, agents, display, length, catchExceptions, rng = None):
+        if (rng is None):
+            rng = random
+
         initState = CaptureGameState(layout, length)
-        starter = random.randint(0, 1)
+        if (self.successorCacheSize > 0):
+            initState.setSuccessorCache(LRUCache(self.successorCacheSize))
+
+        starter = rng.randint(0, 1)
         logging.info('%s team starts' % ['Red', 'Blue'][starter])
         game = Game(agents, display, self, startingIndex = starter,
-                catchExceptions = catchExceptions)
+                catchExceptions = catchExceptions, rng = rng)
         game.state = initState
         game.length = length
 
-        self._totalBlueFood = initState.getBlueFood().count()
-        self._totalRedFood = initState.getRedFood().count()
+        self._totalBlueFood = initState.getNumBlueFood()
+        self._totalRedFood = initState.getNumRedFood()
 
         return game
 
@@ -279,10 +367,10 @@ class CaptureRules:
         redWin = False
         blueWin = False
 
-        if (state.getRedFood().count() <= MIN_FOOD):
+        if (state.getNumRedFood() <= MIN_FOOD):
             logging.info("The Blue team ate all but %d of the opponents' dots." % MIN_FOOD)
             blueWin = True
-        elif (state.getBlueFood().count() <= MIN_FOOD):
+        elif (state.getNumBlueFood() <= MIN_FOOD):
             logging.info("The Red team ate all but %d of the opponents' dots." % MIN_FOOD)
             redWin = True
         else:
@@ -346,16 +434,18 @@ class AgentRules:
                 state.getWalls())
 
     @staticmethod
-    def applyAction(state, action, agentIndex):
+    def applyAction(state, action, agentIndex, validate = True):
         """
         Edits the state to reflect the results of the action.
+        Callers that already know the action is legal can skip validation.
         """
 
-        legal = AgentRules.getLegalActions(state, agentIndex)
-        if (action not in legal):
+        agentState = state.getAgentState(agentIndex)
+        if (validate and not Actions.isLegalAction(agentState.getPosition(),
+                agentState.getDirection(), action, state.getWalls())):
             raise ValueError('Illegal action: ' + str(action))
 
-        agentState = state.getAgentState(agentIndex)
+        agentState = state.getMutableAgentState(agentIndex)
 
         # Update position.
         vector = Actions.directionToVector(action, AgentRules.AGENT_SPEED)
@@ -392,8 +482,8 @@ class AgentRules:
             else:
                 state.addScore(-FOOD_POINTS)
 
-            if ((isRed and state.getBlueFood().count() <= MIN_FOOD)
-                    or (not isRed and state.getRedFood().count() <= MIN_FOOD)):
+            if ((isRed and state.getNumBlueFood() <= MIN_FOOD)
+                    or (not isRed and state.getNumRedFood() <= MIN_FOOD)):
                 state.endGame(True)
 
             return
@@ -414,7 +504,7 @@ class AgentRules:
                 otherTeam = state.getRedTeamIndices()
 
             for agentIndex in otherTeam:
-                state.getAgentState(agentIndex).setScaredTimer(SCARED_TIME)
+                state.getMutableAgentState(agentIndex).setScaredTimer(SCARED_TIME)
 
     @staticmethod
     def decrementTimer(agentState):
@@ -455,10 +545,10 @@ class AgentRules:
             # Otherwise, we are being eatten.
             if (agentState.isBraveGhost() or otherAgentState.isScaredGhost()):
                 state.addScore(teamPointModifier * KILL_POINTS)
-                otherAgentState.respawn()
+                state.getMutableAgentState(otherAgentIndex).respawn()
             else:
                 state.addScore(teamPointModifier * -KILL_POINTS)
-                agentState.respawn()
+                state.getMutableAgentState(agentIndex).respawn()
 
 #############################
 # FRAMEWORK TO START A GAME #
@@ -519,6 +609,29 @@ def readCommand(argv):
             help = 'comma separated arguments to be passed to blue team (e.g. \'opt1=val1,opt2\') '
                 + '(default: %(default)s)')
 
+    parser.add_argument('--compressed-distances', dest = 'compressedDistances',
+            action = 'store_true', default = False,
+            help = 'store maze distances only between junctions, which takes about 4x less memory '
+                + 'on most capture layouts (more on layouts with long corridors) '
+                + '(default: %(default)s)')
+
+    parser.add_argument('--distance-cache', dest = 'distanceCache',
+            action = 'store', type = str, default = None,
+            help = 'keep precomputed maze distances in this directory, so later runs can load them '
+                + '(default: %(default)s)')
+
+    parser.add_argument('--lazy-distances', dest = 'lazyDistances',
+            action = 'store', type = float, default = None,
+            help = 'compute maze distances from each cell only when they are first needed, '
+                + 'keeping at most this many megabytes of them (for very large layouts) '
+                + '(default: %(default)s)')
+
+    parser.add_argument('--incremental-distances', dest = 'incrementalDistances',
+            action = 'store_true', default = False,
+            help = 'let agents compute maze distances a little each turn (see timeForComputing) '
+                + 'instead of all at the start, which may make games nondeterministic '
+                + '(default: %(default)s)')
+
     parser.add_argument('--keys0', dest = 'keys0',
             action = 'store_true', default = False,
             help = 'make agent 0 (first red player) a keyboard agent (default: %(default)s)')
@@ -559,6 +672,9 @@ def readCommand(argv):
     elif options.debug:
         updateLoggingLevel(logging.DEBUG)
 
+    if (options.agentProcesses and options.jobs is not None):
+        raise ValueError('Agent processes can not be used with --jobs.')
+
     viewOptions = {
         'gifFPS': options.gifFPS,
         'gifPath': options.gif,
@@ -586,8 +702,21 @@ def readCommand(argv):
     if seed is None:
         seed = random.randint(0, 2**32)
     random.seed(seed)
+    args['seed'] = seed
     logging.debug('Seed value: ' + str(seed))
 
+    if (options.compressedDistances):
+        distanceCalculator.setCompressedDistances(True)
+
+    if (options.distanceCache is not None):
+        distanceCalculator.setDiskCacheDir(options.distanceCache)
+
+    if (options.incrementalDistances):
+        distanceCalculator.setIncrementalDistances(True)
+
+    if (options.lazyDistances is not None):
+        distanceCalculator.setLazyDistances(int(options.lazyDistances * 1024 * 1024))
+
     # Choose a pacman agent.
     redArgs = parseAgentArgs(options.redArgs)
     blueArgs = parseAgentArgs(options.blueArgs)
@@ -608,6 +737,12 @@ def readCommand(argv):
         if (not val):
             continue
 
+        if (options.jobs is not None):
+            raise ValueError('Keyboard agents require graphics.')
+
+        if (options.agentProcesses):
+            raise ValueError('Keyboard agents can not be played from their own process.')
+
         if (numKeyboardAgents == 0):
             agent = keyboard.WASDKeyboardAgent(index, keyboard = args['display'].getKeyboard())
         elif (numKeyboardAgents == 1):
@@ -638,7 +773,10 @@ def readCommand(argv):
     args['numTraining'] = options.numTraining
     args['record'] = options.record
     args['catchExceptions'] = options.catchExceptions
+    args['jobs'] = options.jobs
+    args['agentProcesses'] = options.agentProcesses
     args['replay'] = options.replay
+    args['successorCacheSize'] = options.successorCacheSize
 
     return args
 
@@ -680,16 +818,50 @@ def replayGame(layout, agents, actions, display, length, redTeamName, blueTeamNa
     display.finish()
 
 def runGames(layout, agents, display, length, numGames, record, numTraining,
-        redTeamName, blueTeamName, catchExceptions = False, **kwargs):
-    rules = CaptureRules()
+        redTeamName, blueTeamName, catchExceptions = False, successorCacheSize = 0,
+        jobs = None, agentProcesses = False, seed = None, **kwargs):
+    """
+    Play the training games, and then the evaluation games.
+    Returns the evaluation games.
+
+    If `jobs` is set, then the evaluation games are played in that many processes
+    (see `pacai.util.parallel.runInParallel`) without graphics,
+    and their `pacai.core.game.GameResult`s are returned instead.
+
+    Every game gets its own seed (drawn from a generator seeded with `seed`),
+    which seeds the game's random number generator (see `pacai.core.game.Game`).
+    So, results only depend on `seed` (and not on the number of jobs).
+    The global random module is also seeded with each game's seed,
+    for any code (e.g. a user's agent) that still uses it.
+
+    If `agentProcesses` is set, then each team is played from its own process
+    (see `pacai.core.agentHost.AgentHost`).
+    """
+
+    rules = CaptureRules(successorCacheSize)
     games = []
 
+    # Replays keep the real agents.
+    gameAgents = agents
+
+    hosts = []
+    if (agentProcesses):
+        hosts = [AgentHost(agents[0::2]), AgentHost(agents[1::2])]
+        gameAgents = [hosts[i % 2].getAgents()[i // 2] for i in range(len(agents))]
+
     nullView = None
     if (numTraining > 0):
         logging.info('Playing %d training games.' % numTraining)
         nullView = CaptureNullView()
 
-    for i in range(numGames):
+    numSerialGames = numGames
+    if (jobs is not None):
+        numSerialGames = min(numGames, numTraining)
+
+    seedRNG = random.Random(seed)
+    seeds = [seedRNG.randint(0, 2**32) for i in range(numGames)]
+
+    for i in range(numSerialGames):
         isTraining = (i < numTraining)
 
         if (isTraining):
@@ -698,35 +870,50 @@ def runGames(layout, agents, display, length, numGames, record, numTraining,
         else:
             gameDisplay = display
 
-        g = rules.newGame(layout, agents, gameDisplay, length, catchExceptions)
-        g.run()
+        g = rules.newGame(layout, gameAgents, gameDisplay, length, catchExceptions,
+                _seedGame(seeds[i]))
+
+        if (isTraining):
+            g.simulate(keepHistory = bool(record))
+        else:
+            g.run()
+
+        if (g.state.getSuccessorCache() is not None):
+            logging.debug('Successor cache: %s', g.state.getSuccessorCache())
+
+        for distances in distanceCalculator.lazyDistanceMap.items.values():
+            logging.debug('Lazy distances: %s', distances)
 
         if (not isTraining):
             games.append(g)
 
         g.record = None
         if record:
-            components = {
-                'layout': layout,
-                'agents': [agent.__class__.__name__ for agent in agents],
-                'actions': g.moveHistory,
-                'length': length,
-                'redTeamName': redTeamName,
-                'blueTeamName': blueTeamName
-            }
+            g.record = _recordGame(record, layout, agents, g.moveHistory, length,
+                    redTeamName, blueTeamName)
+
+    results = [GameResult.fromGame(game, game.state.getScore() > 0) for game in games]
+
+    if (numGames > numSerialGames):
+        logging.info('Playing %d games in %d processes.' % (numGames - numSerialGames, jobs))
+
+        context = (layout, agents, rules, length, catchExceptions, bool(record))
+        results = runInParallel(_playGame, context, seeds[numSerialGames:], jobs)
+        games = results
 
-            path = 'replay'
-            if (isinstance(record, str)):
-                path = record
+        if (record):
+            _recordGame(record, layout, agents, results[-1].moveHistory, length,
+                    redTeamName, blueTeamName)
 
-            g.record = pickle.dumps(components)
-            with open(path, 'wb') as file:
-                file.write(g.record)
+    for result in results:
+        logging.debug('Game result: %s', result)
 
-            logging.info("Game recorded to: '%s'." % (path))
+    for host in hosts:
+        logging.debug('Agent host: %s', host)
+        host.close()
 
     if (numGames > 0):
-        scores = [game.state.getScore() for game in games]
+        scores = [result.score for result in results]
         redWinRate = [s > 0 for s in scores].count(True) / float(len(scores))
         blueWinRate = [s < 0 for s in scores].count(True) / float(len(scores))
         logging.info('Average Score:%s', sum(scores) / float(len(scores)))
@@ -740,6 +927,51 @@ def runGames(layout, agents, display, length, numGames, record, numTraining,
 
     return games
 
+def _playGame(context, seed):
+    """
+    Play a single (seeded) game without graphics, see `runGames`.
+    """
+
+    (layout, agents, rules, length, catchExceptions, keepHistory) = context
+
+    game = rules.newGame(layout, agents, None, length, catchExceptions, _seedGame(seed))
+    game.simulate(keepHistory = keepHistory, timeAgents = True)
+
+    return GameResult.fromGame(game, game.state.getScore() > 0, keepHistory)
+
+def _recordGame(record, layout, agents, actions, length, redTeamName, blueTeamName):
+    """
+    Write a game's replay, and return its bytes.
+    """
+
+    components = {
+        'layout': layout,
+        'agents': [agent.__class__.__name__ for agent in agents],
+        'actions': actions,
+        'length': length,
+        'redTeamName': redTeamName,
+        'blueTeamName': blueTeamName
+    }
+
+    path = 'replay'
+    if (isinstance(record, str)):
+        path = record
+
+    data = pickle.dumps(components)
+    with open(path, 'wb') as file:
+        file.write(data)
+
+    logging.info("Game recorded to: '%s'." % (path))
+    return data
+
+def _seedGame(seed):
+    """
+    Get the random number generator for a game.
+    The global random module is also seeded, for any code that still uses it.
+    """
+
+    random.seed(seed)
+    return random.Random(seed)
 
 def main(argv):
     """
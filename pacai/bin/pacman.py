@@ -18,15 +18,19 @@ from pacai.agents.ghost.random import RandomGhost
 from pacai.agents.greedy import GreedyAgent
 from pacai.bin.arguments import getParser
 from pacai.core.actions import Actions
+from pacai.core.agentHost import AgentHost
 from pacai.core.directions import Directions
 from pacai.core.distance import manhattan
 from pacai.core.game import Game
+from pacai.core.game import GameResult
 from pacai.core.gamestate import AbstractGameState
 from pacai.core.layout import getLayout
 from pacai.ui.pacman.null import PacmanNullView
 from pacai.ui.pacman.text import PacmanTextView
 from pacai.util.logs import initLogging
 from pacai.util.logs import updateLoggingLevel
+from pacai.util.lruCache import LRUCache
+from pacai.util.parallel import runInParallel
 from pacai.util.util import nearestPoint
 
 PACMAN_AGENT_INDEX = 0
@@ -46,23 +50,12 @@ class PacmanGameState(AbstractGameState):
     Note that in classic Pacman, Pacman is always agent PACMAN_AGENT_INDEX.
     """
 
-    def __init__(self, layout):
-        super().__init__(layout)
-
-    # Override
-    def generateSuccessor(self, agentIndex, action):
-        """
-        Returns the successor state after the specified agent takes the action.
-        """
-
-        # Check that successors exist.
-        if (self.isOver()):
-            raise RuntimeError("Can't generate successors of a terminal state.")
+    __slots__ = ()
 
-        successor = self._initSuccessor()
-        successor._applySuccessorAction(agentIndex, action)
+    _BYTES_TYPE = b'P'
 
-        return successor
+    def __init__(self, layout):
+        super().__init__(layout)
 
     # Override
     def getLegalActions(self, agentIndex = PACMAN_AGENT_INDEX):
@@ -118,23 +111,23 @@ class PacmanGameState(AbstractGameState):
 
         return self._agentStates[PACMAN_AGENT_INDEX]
 
-    def _applySuccessorAction(self, agentIndex, action):
+    def _applySuccessorAction(self, agentIndex, action, validate = True):
         """
         Apply the action to the context state (self).
         """
 
         # Let the agent's logic deal with its action's effects on the board.
         if (agentIndex == PACMAN_AGENT_INDEX):
-            PacmanRules.applyAction(self, action)
+            PacmanRules.applyAction(self, action, validate)
         else:
-            GhostRules.applyAction(self, action, agentIndex)
+            GhostRules.applyAction(self, action, agentIndex, validate)
 
         # Time passes.
         if (agentIndex == PACMAN_AGENT_INDEX):
             # Penalty for waiting around.
             self.addScore(-TIME_PENALTY)
         else:
-            GhostRules.decrementTimer(self.getAgentState(agentIndex))
+            GhostRules.decrementTimer(self.getMutableAgentState(agentIndex))
 
         # Resolve multi-agent effects.
         GhostRules.checkDeath(self, agentIndex)
@@ -150,13 +143,18 @@ class ClassicGameRules(object):
     and how the game starts and ends.
     """
 
-    def __init__(self, timeout = 30):
+    def __init__(self, timeout = 30, successorCacheSize = 0):
         self.timeout = timeout
+        self.successorCacheSize = successorCacheSize
 
-    def newGame(self, layout, pacmanAgent, ghostAgents, display, catchExceptions = False):
+    def newGame(self, layout, pacmanAgent, ghostAgents, display, catchExceptions = False,
+            rng = None):
         agents = [pacmanAgent] + ghostAgents[:layout.getNumGhosts()]
         initState = PacmanGameState(layout)
-        game = Game(agents, display, self, catchExceptions = catchExceptions)
+        if (self.successorCacheSize > 0):
+            initState.setSuccessorCache(LRUCache(self.successorCacheSize))
+
+        game = Game(agents, display, self, catchExceptions = catchExceptions, rng = rng)
         game.state = initState
 
         self._initialFoodCount = initState.getNumFood()
@@ -221,16 +219,18 @@ class PacmanRules:
                 state.getWalls())
 
     @staticmethod
-    def applyAction(state, action):
+    def applyAction(state, action, validate = True):
         """
         Edits the state to reflect the results of the action.
+        Callers that already know the action is legal can skip validation.
         """
 
-        legal = PacmanRules.getLegalActions(state)
-        if (action not in legal):
+        pacmanState = state.getPacmanState()
+        if (validate and not Actions.isLegalAction(pacmanState.getPosition(),
+                pacmanState.getDirection(), action, state.getWalls())):
             raise ValueError('Illegal pacman action: ' + str(action))
 
-        pacmanState = state.getPacmanState()
+        pacmanState = state.getMutableAgentState(PACMAN_AGENT_INDEX)
 
         # Update position.
         vector = Actions.directionToVector(action, PacmanRules.PACMAN_SPEED)
@@ -260,8 +260,8 @@ class PacmanRules:
             state.eatCapsule(x, y)
 
             # Reset all ghosts' scared timers.
-            for ghostState in state.getGhostStates():
-                ghostState.setScaredTimer(SCARED_TIME)
+            for ghostIndex in state.getGhostIndexes():
+                state.getMutableAgentState(ghostIndex).setScaredTimer(SCARED_TIME)
 
 class GhostRules:
     """
@@ -291,12 +291,11 @@ class GhostRules:
         return possibleActions
 
     @staticmethod
-    def applyAction(state, action, ghostIndex):
-        legal = GhostRules.getLegalActions(state, ghostIndex)
-        if (action not in legal):
+    def applyAction(state, action, ghostIndex, validate = True):
+        if (validate and not GhostRules.isLegalAction(state, action, ghostIndex)):
             raise ValueError('Illegal ghost action: ' + str(action))
 
-        ghostState = state.getGhostState(ghostIndex)
+        ghostState = state.getMutableAgentState(ghostIndex)
         speed = GhostRules.GHOST_SPEED
         if (ghostState.isScared()):
             speed /= 2.0
@@ -304,6 +303,29 @@ class GhostRules:
         vector = Actions.directionToVector(action, speed)
         ghostState.updatePosition(vector)
 
+    @staticmethod
+    def isLegalAction(state, action, ghostIndex):
+        """
+        Check if an action is one of the ghost's legal actions (see `GhostRules.getLegalActions`),
+        without building the list of legal actions.
+        """
+
+        if (action == Directions.STOP):
+            return False
+
+        agentState = state.getGhostState(ghostIndex)
+        direction = agentState.getDirection()
+        if (not Actions.isLegalAction(agentState.getPosition(), direction, action,
+                state.getWalls())):
+            return False
+
+        if (action != Actions.reverseDirection(direction)):
+            return True
+
+        # Turning around is only legal at a dead end.
+        # That is rare, so just build the list.
+        return GhostRules.getLegalActions(state, ghostIndex) == [action]
+
     @staticmethod
     def decrementTimer(agentState):
         if (not agentState.isScared()):
@@ -341,7 +363,7 @@ class GhostRules:
         if (ghostState.isScared()):
             # Pacman ate a ghost.
             state.addScore(GHOST_POINTS)
-            ghostState.respawn()
+            state.getMutableAgentState(agentIndex).respawn()
         elif (not state.isOver()):
             # A ghost ate pacman.
             state.addScore(LOSE_POINTS)
@@ -435,6 +457,7 @@ def readCommand(argv):
     if seed is None:
         seed = random.randint(0, 2**32)
     random.seed(seed)
+    args['seed'] = seed
     logging.debug('Seed value: ' + str(seed))
 
     # Choose a layout.
@@ -444,9 +467,15 @@ def readCommand(argv):
 
     # Choose a Pacman agent.
     noKeyboard = (options.replay is None and (options.textGraphics or options.nullGraphics))
-    if (noKeyboard and ('KeyboardAgent' in options.pacman)):
+    if ((noKeyboard or options.jobs is not None) and ('KeyboardAgent' in options.pacman)):
         raise ValueError('Keyboard agents require graphics.')
 
+    if (options.agentProcesses and 'KeyboardAgent' in options.pacman):
+        raise ValueError('Keyboard agents can not be played from their own process.')
+
+    if (options.agentProcesses and options.jobs is not None):
+        raise ValueError('Agent processes can not be used with --jobs.')
+
     agentOpts = parseAgentArgs(options.agentArgs)
     if options.numTraining > 0:
         args['numTraining'] = options.numTraining
@@ -480,11 +509,14 @@ def readCommand(argv):
 
     args['catchExceptions'] = options.catchExceptions
     args['gameToReplay'] = options.replay
+    args['jobs'] = options.jobs
+    args['agentProcesses'] = options.agentProcesses
     args['ghosts'] = [BaseAgent.loadAgent(options.ghost, i + 1) for i in range(options.numGhosts)]
     args['numGames'] = options.numGames
     args['pacman'] = BaseAgent.loadAgent(options.pacman, PACMAN_AGENT_INDEX, agentOpts)
     args['record'] = options.record
     args['timeout'] = options.timeout
+    args['successorCacheSize'] = options.successorCacheSize
 
     return args
 
@@ -512,16 +544,48 @@ def replayGame(layout, actions, display):
     display.finish()
 
 def runGames(layout, pacman, ghosts, display, numGames, record = None, numTraining = 0,
-        catchExceptions = False, timeout = 30, **kwargs):
-    rules = ClassicGameRules(timeout)
+        catchExceptions = False, timeout = 30, successorCacheSize = 0, jobs = None,
+        agentProcesses = False, seed = None, **kwargs):
+    """
+    Play the training games, and then the evaluation games.
+    Returns the evaluation games.
+
+    If `jobs` is set, then the evaluation games are played in that many processes
+    (see `pacai.util.parallel.runInParallel`) without graphics,
+    and their `pacai.core.game.GameResult`s are returned instead.
+
+    Every game gets its own seed (drawn from a generator seeded with `seed`),
+    which seeds the game's random number generator (see `pacai.core.game.Game`).
+    So, results only depend on `seed` (and not on the number of jobs).
+    The global random module is also seeded with each game's seed,
+    for any code (e.g. a user's agent) that still uses it.
+
+    If `agentProcesses` is set, then pacman and the ghosts are each played from their own process
+    (see `pacai.core.agentHost.AgentHost`).
+    """
+
+    rules = ClassicGameRules(timeout, successorCacheSize)
     games = []
 
+    hosts = []
+    if (agentProcesses):
+        hosts = [AgentHost([pacman]), AgentHost(ghosts)]
+        pacman = hosts[0].getAgents()[0]
+        ghosts = hosts[1].getAgents()
+
     nullView = None
     if (numTraining > 0):
         logging.info('Playing %d training games.' % numTraining)
         nullView = PacmanNullView()
 
-    for i in range(numGames):
+    numSerialGames = numGames
+    if (jobs is not None):
+        numSerialGames = min(numGames, numTraining)
+
+    seedRNG = random.Random(seed)
+    seeds = [seedRNG.randint(0, 2**32) for i in range(numGames)]
+
+    for i in range(numSerialGames):
         isTraining = (i < numTraining)
 
         if (isTraining):
@@ -530,8 +594,16 @@ def runGames(layout, pacman, ghosts, display, numGames, record = None, numTraini
         else:
             gameDisplay = display
 
-        game = rules.newGame(layout, pacman, ghosts, gameDisplay, catchExceptions)
-        game.run()
+        game = rules.newGame(layout, pacman, ghosts, gameDisplay, catchExceptions,
+                _seedGame(seeds[i]))
+
+        if (isTraining):
+            game.simulate(keepHistory = bool(record))
+        else:
+            game.run()
+
+        if (game.state.getSuccessorCache() is not None):
+            logging.debug('Successor cache: %s', game.state.getSuccessorCache())
 
         if (not isTraining):
             games.append(game)
@@ -545,9 +617,34 @@ def runGames(layout, pacman, ghosts, display, numGames, record = None, numTraini
             with open(path, 'wb') as file:
                 pickle.dump(components, file)
 
+    results = [GameResult.fromGame(game, game.state.isWin()) for game in games]
+
+    if (numGames > numSerialGames):
+        logging.info('Playing %d games in %d processes.' % (numGames - numSerialGames, jobs))
+
+        context = (layout, pacman, ghosts, rules, catchExceptions, bool(record))
+        results = runInParallel(_playGame, context, seeds[numSerialGames:], jobs)
+        games = results
+
+        if (record):
+            path = 'pacman.replay'
+            if (isinstance(record, str)):
+                path = record
+
+            components = {'layout': layout, 'actions': results[-1].moveHistory}
+            with open(path, 'wb') as file:
+                pickle.dump(components, file)
+
+    for result in results:
+        logging.debug('Game result: %s', result)
+
+    for host in hosts:
+        logging.debug('Agent host: %s', host)
+        host.close()
+
     if ((numGames - numTraining) > 0):
-        scores = [game.state.getScore() for game in games]
-        wins = [game.state.isWin() for game in games]
+        scores = [result.score for result in results]
+        wins = [result.win for result in results]
         winRate = wins.count(True) / float(len(wins))
         logging.info('Average Score: %s', sum(scores) / float(len(scores)))
         logging.info('Scores:        %s', ', '.join([str(score) for score in scores]))
@@ -556,6 +653,27 @@ def runGames(layout, pacman, ghosts, display, numGames, record = None, numTraini
 
     return games
 
+def _playGame(context, seed):
+    """
+    Play a single (seeded) game without graphics, see `runGames`.
+    """
+
+    (layout, pacman, ghosts, rules, catchExceptions, keepHistory) = context
+
+    game = rules.newGame(layout, pacman, ghosts, None, catchExceptions, _seedGame(seed))
+    game.simulate(keepHistory = keepHistory, timeAgents = True)
+
+    return GameResult.fromGame(game, game.state.isWin(), keepHistory)
+
+def _seedGame(seed):
+    """
+    Get the random number generator for a game.
+    The global random module is also seeded, for any code that still uses it.
+    """
+
+    random.seed(seed)
+    return random.Random(seed)
+
 def main(argv):
     """
     Entry point for a pacman game.
@@ -1,5 +1,11 @@
+import weakref
+
 from pacai.core.directions import Directions
 
+# Legal move tables keyed by the id of the walls grid they were built from.
+# {id(walls): ActionTable, ...}
+_actionTables = {}
+
 class Actions:
     """
     A collection of static methods for manipulating move actions.
@@ -51,6 +57,25 @@ class Actions:
         dx, dy = Actions._directions[direction]
         return (dx * speed, dy * speed)
 
+    @staticmethod
+    def getActionTable(walls):
+        """
+        Get the table of legal moves for the given walls.
+        The table is built the first time a walls grid is seen,
+        and lives as long as that grid does.
+        Walls must not be modified after a table has been built for them.
+        """
+
+        key = id(walls)
+
+        table = _actionTables.get(key)
+        if (table is None):
+            table = ActionTable(walls)
+            _actionTables[key] = table
+            weakref.finalize(walls, _actionTables.pop, key, None)
+
+        return table
+
     @staticmethod
     def getPossibleActions(position, direction, walls):
         x, y = position
@@ -60,40 +85,80 @@ class Actions:
         if (abs(x - x_int) + abs(y - y_int) > Actions.TOLERANCE):
             return [direction]
 
-        possible = []
-        for dir, vec in Actions._directionsAsList:
-            dx, dy = vec
-            next_y = y_int + dy
-            next_x = x_int + dx
-
-            if (not walls[next_x][next_y]):
-                possible.append(dir)
-
-        return possible
+        return list(Actions.getActionTable(walls).getActions(x_int, y_int))
 
     @staticmethod
-    def getLegalNeighbors(position, walls):
+    def isLegalAction(position, direction, action, walls):
+        """
+        Check if an action is one of the possible actions (see `Actions.getPossibleActions`),
+        without building the list of possible actions.
+        """
+
         x, y = position
         x_int, y_int = int(x + 0.5), int(y + 0.5)
 
-        neighbors = []
-        for dir, vec in Actions._directionsAsList:
-            dx, dy = vec
-            next_x = x_int + dx
-            if (next_x < 0 or next_x == walls.getWidth()):
-                continue
+        if (abs(x - x_int) + abs(y - y_int) > Actions.TOLERANCE):
+            return action == direction
 
-            next_y = y_int + dy
-            if (next_y < 0 or next_y == walls.getHeight()):
-                continue
+        return action in Actions.getActionTable(walls).getActions(x_int, y_int)
 
-            if (not walls[next_x][next_y]):
-                neighbors.append((next_x, next_y))
+    @staticmethod
+    def getLegalNeighbors(position, walls):
+        x, y = position
+        x_int, y_int = int(x + 0.5), int(y + 0.5)
 
-        return neighbors
+        return list(Actions.getActionTable(walls).getNeighbors(x_int, y_int))
 
     @staticmethod
     def getSuccessor(position, action):
         dx, dy = Actions.directionToVector(action)
         x, y = position
         return (x + dx, y + dy)
+
+class ActionTable(object):
+    """
+    The legal actions and neighbors of every cell in a walls grid, computed once.
+    Cells are indexed as (x * height + y).
+    """
+
+    def __init__(self, walls):
+        self._width = walls.getWidth()
+        self._height = walls.getHeight()
+
+        self._actions = []
+        self._neighbors = []
+
+        for x in range(self._width):
+            for y in range(self._height):
+                actions = []
+                neighbors = []
+
+                for direction, (dx, dy) in Actions._directionsAsList:
+                    nextX = x + dx
+                    nextY = y + dy
+
+                    if (nextX < 0 or nextX >= self._width or nextY < 0 or nextY >= self._height):
+                        continue
+
+                    if (walls[nextX][nextY]):
+                        continue
+
+                    actions.append(direction)
+                    neighbors.append((nextX, nextY))
+
+                self._actions.append(tuple(actions))
+                self._neighbors.append(tuple(neighbors))
+
+    def getActions(self, x, y):
+        """
+        Get a tuple of the legal actions from (x, y).
+        """
+
+        return self._actions[x * self._height + y]
+
+    def getNeighbors(self, x, y):
+        """
+        Get a tuple of the open cells adjacent to (x, y) (including (x, y) itself).
+        """
+
+        return self._neighbors[x * self._height + y]
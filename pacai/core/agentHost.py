@@ -0,0 +1,301 @@
+"""
+Playing agents from their own processes.
+
+An `AgentHost` plays one or more agents (e.g. a team) in a worker process,
+and gives the game `RemoteAgent`s that stand in for them.
+So, an agent can not stall (or crash) the game's process,
+can use a core of its own, and can be measured or killed on its own.
+
+Whole states are only sent when a game starts and ends
+(packed with `pacai.core.gamestate.AbstractGameState.toBytes`).
+During a game, the worker keeps a mirror of the game's state,
+and each request only carries the moves (agent index and action) made since the last request.
+The worker replays those moves on its mirror (the same rules make the same state),
+and hands the mirror to its agents.
+
+Each agent's random number generator is seeded once when a game starts,
+with the same seed the game would give it in its own process (see `pacai.core.game.Game`),
+so hosting agents does not change how a seeded game plays out.
+
+Requests can be given a time limit.
+A worker that does not answer in time is killed on the spot
+(and a `pacai.util.watchdog.DeadlineExceeded` is raised),
+so a stuck agent can not hold up the game or keep using a core.
+"""
+
+import multiprocessing
+import random
+import time
+import traceback
+
+from pacai.agents.base import BaseAgent
+from pacai.util.watchdog import DeadlineExceeded
+
+# How long to wait (in seconds) for a worker to exit on its own before killing it.
+CLOSE_WAIT_SECONDS = 5
+
+class AgentHost(object):
+    """
+    A worker process that plays some agents.
+
+    Give a game the agents from `AgentHost.getAgents`,
+    and the game will keep this host up to date with its moves (see `AgentHost.addMove`).
+    A host can be used for any number of games (one at a time),
+    and should be closed with `AgentHost.close` when done.
+    If a host is dropped without being closed, its worker exits when it notices.
+    If the worker dies (or is killed), it is restarted with fresh agents when the next game starts.
+
+    If `checkStates` is set, the game's state is also sent with each request
+    and the worker makes sure that its mirror matches it (this is only meant for debugging).
+    """
+
+    def __init__(self, agents, checkStates = False):
+        self._workerAgents = agents
+        self._indexes = [agent.index for agent in agents]
+        self._checkStates = checkStates
+        self._moves = []
+
+        self.numRequests = 0
+        self.numRestarts = 0
+        self.cpuTime = 0.0
+
+        self._connection = None
+        self._process = None
+        self._startWorker()
+
+        self._agents = [RemoteAgent(index, self) for index in self._indexes]
+
+    def addMove(self, agentIndex, action):
+        """
+        Note a move made in the game.
+        Moves are sent to the worker along with the next request.
+        """
+
+        self._moves.append((agentIndex, action))
+
+    def close(self):
+        """
+        Stop the worker.
+        """
+
+        try:
+            self._connection.send(('close',))
+        except OSError:
+            # The worker is already gone.
+            pass
+
+        self._process.join(CLOSE_WAIT_SECONDS)
+        if (self._process.is_alive()):
+            self._process.kill()
+            self._process.join()
+
+        self._connection.close()
+
+    def final(self, agentIndex, state):
+        """
+        Tell an agent about the final state of the game.
+        The final state is sent whole, since the rules may have changed it outside of a move.
+        """
+
+        self._moves = []
+        self._request(('final', agentIndex, state.toBytes()))
+
+    def getAction(self, agentIndex, state, timeLimit = None):
+        """
+        Get an agent's action for the game's current state.
+        If `timeLimit` (seconds) is given and runs out, a `DeadlineExceeded` is raised.
+        """
+
+        check = None
+        if (self._checkStates):
+            check = state.toBytes()
+
+        moves = self._moves
+        self._moves = []
+
+        return self._request(('getAction', agentIndex, moves, check), timeLimit)
+
+    def getAgents(self):
+        """
+        Get the agents (in the same order that this host was given them) to give a game.
+        """
+
+        return self._agents
+
+    def getCPUTime(self):
+        """
+        Get the CPU time (in seconds) used by the workers so far.
+        """
+
+        return self.cpuTime
+
+    def isAlive(self):
+        return self._process.is_alive()
+
+    def kill(self):
+        """
+        Kill the worker right away (e.g. if an agent is stuck).
+        Requests fail until the next game starts.
+        """
+
+        self._process.kill()
+        self._process.join()
+
+    def registerInitialState(self, agentIndex, state, timeLimit = None):
+        """
+        Let an agent inspect the starting state.
+        The worker already has the state from `AgentHost.startGame`.
+        If `timeLimit` (seconds) is given and runs out, a `DeadlineExceeded` is raised.
+        """
+
+        self._request(('registerInitialState', agentIndex), timeLimit)
+
+    def startGame(self, state, agentSeeds):
+        """
+        Send the starting state of a new game to the worker.
+        `agentSeeds` has the seed for each agent's random number generator (by agent index).
+        """
+
+        self._moves = []
+
+        if (not self._process.is_alive()):
+            self._connection.close()
+            self._startWorker()
+            self.numRestarts += 1
+
+        # The layout is only sent when it changes.
+        layout = state.getInitialLayout()
+        if (layout.getContentHash() == self._layoutHash):
+            layout = None
+        else:
+            self._layoutHash = layout.getContentHash()
+
+        # A host may have more agents than the game uses (e.g. ghosts on a small layout).
+        seeds = {index: agentSeeds[index] for index in self._indexes if index < len(agentSeeds)}
+        self._request(('startGame', type(state), layout, state.toBytes(), seeds))
+
+    def _request(self, message, timeLimit = None):
+        try:
+            self._connection.send(message)
+
+            timedOut = (timeLimit is not None
+                    and not self._connection.poll(max(0.0, timeLimit)))
+
+            if (not timedOut):
+                (error, result, cpuTime) = self._connection.recv()
+        except (EOFError, OSError) as ex:
+            raise RuntimeError('The process for agents %s has stopped.' % (self._indexes)) from ex
+
+        if (timedOut):
+            self.kill()
+            raise DeadlineExceeded('The process for agents %s did not answer within %.2f seconds.'
+                    % (self._indexes, timeLimit))
+
+        self.numRequests += 1
+        self.cpuTime += cpuTime - self._workerCPUTime
+        self._workerCPUTime = cpuTime
+
+        if (error is not None):
+            raise RuntimeError('Error in the process for agents %s:\n%s' % (self._indexes, error))
+
+        return result
+
+    def _startWorker(self):
+        (self._connection, workerConnection) = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(target = _runWorker,
+                args = (workerConnection, self._workerAgents), daemon = True)
+        self._process.start()
+        workerConnection.close()
+
+        self._layoutHash = None
+        self._workerCPUTime = 0.0
+
+    def __str__(self):
+        return 'AgentHost(agents: %s, requests: %d, restarts: %d, CPU time: %.2f)' % (
+            self._indexes, self.numRequests, self.numRestarts, self.cpuTime)
+
+class RemoteAgent(BaseAgent):
+    """
+    Stands in (in the game's process) for an agent that is played by an `AgentHost`.
+    """
+
+    def __init__(self, index, host, **kwargs):
+        super().__init__(index, **kwargs)
+
+        self._host = host
+
+    # Override
+    def final(self, state):
+        self._host.final(self.index, state)
+
+    # Override
+    def getAction(self, state):
+        return self._host.getAction(self.index, state)
+
+    def getHost(self):
+        return self._host
+
+    # Override
+    def registerInitialState(self, state):
+        self._host.registerInitialState(self.index, state)
+
+class _Worker(object):
+    """
+    The agents and mirrored state in a worker process.
+    Each request is a call to the method of the same name.
+    """
+
+    def __init__(self, agents):
+        self._agents = {agent.index: agent for agent in agents}
+        self._layout = None
+        self._state = None
+
+    def final(self, agentIndex, data):
+        self._state = self._state.fromBytes(self._layout, data)
+        self._agents[agentIndex].final(self._state)
+
+    def getAction(self, agentIndex, moves, check):
+        for (moverIndex, action) in moves:
+            self._state = self._state.generateSuccessor(moverIndex, action, useCache = False)
+
+        if (check is not None and check != self._state.toBytes()):
+            raise RuntimeError('The mirrored state does not match the game state.')
+
+        agent = self._agents[agentIndex]
+        agent.observationFunction(self._state)
+        return agent.getAction(self._state)
+
+    def registerInitialState(self, agentIndex):
+        self._agents[agentIndex].registerInitialState(self._state)
+
+    def startGame(self, stateClass, layout, data, seeds):
+        if (layout is not None):
+            self._layout = layout
+
+        self._state = stateClass.fromBytes(self._layout, data)
+
+        for (index, seed) in seeds.items():
+            self._agents[index].setRNG(random.Random(seed))
+
+def _runWorker(connection, agents):
+    worker = _Worker(agents)
+
+    while (True):
+        try:
+            message = connection.recv()
+        except EOFError:
+            # The host is gone.
+            return
+
+        if (message[0] == 'close'):
+            return
+
+        error = None
+        result = None
+
+        try:
+            result = getattr(worker, message[0])(*message[1:])
+        except Exception:
+            error = traceback.format_exc()
+
+        connection.send((error, result, time.process_time()))
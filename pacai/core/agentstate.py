@@ -11,6 +11,17 @@ class AgentState:
     Therefore, north is the direction of increasing y, or (0, 1).
     """
 
+    # Search trees can hold a lot of agent states, so skip the per-instance dict.
+    __slots__ = (
+        '_startPosition',
+        '_startDirection',
+        '_startIsPacman',
+        '_position',
+        '_direction',
+        '_isPacman',
+        '_scaredTimer',
+    )
+
     def __init__(self, position, direction, isPacman):
         # Save the starting information for later use.
         self._startPosition = position
@@ -24,8 +35,11 @@ class AgentState:
         self._scaredTimer = 0
 
     def copy(self):
-        state = AgentState(self._startPosition, self._startDirection, self._startIsPacman)
+        state = AgentState.__new__(AgentState)
 
+        state._startPosition = self._startPosition
+        state._startDirection = self._startDirection
+        state._startIsPacman = self._startIsPacman
         state._isPacman = self._isPacman
         state._position = self._position
         state._direction = self._direction
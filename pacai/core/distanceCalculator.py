@@ -1,7 +1,16 @@
+import array
+import hashlib
+import heapq
+import logging
+import mmap
+import os
+import struct
 import sys
+import tempfile
+import time
 
 from pacai.core.distance import manhattan
-from pacai.util import priorityQueue
+from pacai.util.lruCache import LRUCache
 
 DEFAULT_DISTANCE = 10000
 
@@ -14,14 +23,86 @@ class Distancer(object):
     distancer = Distancer(gameState.getInitialLayout())
     distancer.getDistance((1, 1), (10, 10))
     ```
+
+    By default, the distances between all pairs of cells are computed up front.
+    For mazes too large for that, a lazy Distancer only computes distances from the cells
+    that are actually asked about (see `LazyMazeDistances`),
+    keeping at most `memoryBudget` bytes of them.
+    When `lazy` is None, the mode set by `setLazyDistances` is used.
+
+    A compressed Distancer stores exact distances in much less memory
+    by collapsing the maze's corridors (see `JunctionMazeDistances`).
+    When `compressed` is None, the mode set by `setCompressedDistances` is used.
+
+    An incremental Distancer computes its distances a slice at a time
+    (see `Distancer.computeMazeDistances`), so agents do not have to wait for all of them.
+    Until a distance is known, the manhattan distance is used instead.
+    Since how much gets done in a slice depends on the clock, agents may play differently
+    from run to run, so this is off unless asked for (or turned on by `setIncrementalDistances`).
     """
 
-    def __init__(self, layout):
+    def __init__(self, layout, lazy = None, memoryBudget = None, incremental = None,
+            compressed = None):
+        if (lazy is None):
+            lazy = (_lazyMemoryBudget is not None)
+
+        if (compressed is None):
+            compressed = _compressed
+
+        if (incremental is None):
+            incremental = _incremental
+
+        if (memoryBudget is None):
+            memoryBudget = _lazyMemoryBudget or DEFAULT_MEMORY_BUDGET
+
+        self._compressed = compressed
         self._distances = None
+        self._incremental = incremental
+        self._lazy = lazy
+        self._memoryBudget = memoryBudget
         self.dc = DistanceCalculator(layout, self)
 
-    def getMazeDistances(self):
-        self.dc.run()
+    def computeMazeDistances(self, timeLimit = None):
+        """
+        Keep computing the distances of an incremental Distancer
+        for at most `timeLimit` seconds (None to finish them).
+        Returns True once all the distances are known.
+        """
+
+        return self.dc.step(timeLimit)
+
+    def distancesTo(self, pos, targets):
+        """
+        Get the distance from a position to each of the targets (in the same order).
+        This gives the same distances as calling `Distancer.getDistance` for each target,
+        but is faster since the position is only looked up once.
+        """
+
+        if (self._distances is None):
+            return [manhattan(pos, target) for target in targets]
+
+        if (not isInt(pos) or not all([isInt(target) for target in targets])):
+            return [self.getDistance(pos, target) for target in targets]
+
+        distances = self._distances.getDistances(pos, targets)
+        if (None in distances):
+            raise Exception("Position not in grid: " + str((pos, targets[distances.index(None)])))
+
+        return distances
+
+    def getMazeDistances(self, timeLimit = None):
+        """
+        Get the distances ready.
+        An incremental Distancer only spends up to `timeLimit` seconds on them here
+        (and should be given more time with `Distancer.computeMazeDistances`),
+        all other Distancers compute (or load) everything they need.
+        """
+
+        if (self._incremental and not (self._lazy or self._compressed)):
+            self.dc.start()
+            self.dc.step(timeLimit)
+        else:
+            self.dc.run()
 
     def getDistance(self, pos1, pos2):
         """
@@ -48,15 +129,58 @@ class Distancer(object):
         return bestDistance
 
     def getDistanceOnGrid(self, pos1, pos2):
-        key = (pos1, pos2)
-        if key in self._distances:
-            return self._distances[key]
+        distance = self._distances.getDistance(pos1, pos2)
+        if (distance is None):
+            raise Exception("Position not in grid: " + str((pos1, pos2)))
 
-        raise Exception("Position not in grid: " + str(key))
+        return distance
+
+    def getMemoryBudget(self):
+        return self._memoryBudget
+
+    def getStats(self):
+        """
+        Get a description of how the distances are being stored (and for lazy distances,
+        how often queries found their distances already computed).
+        """
+
+        return str(self._distances)
+
+    def hasAllDistances(self):
+        """
+        Check if every distance is known (instead of falling back to the manhattan distance).
+        """
+
+        return (self._distances is not None and self._distances.isComplete())
+
+    def isCompressed(self):
+        return self._compressed
+
+    def isIncremental(self):
+        return self._incremental
+
+    def isLazy(self):
+        return self._lazy
 
     def isReadyForMazeDistance(self):
         return (self._distances is not None)
 
+    def nearest(self, pos, targets):
+        """
+        Find the target closest to a position.
+        Returns (distance, target), or (None, None) if there are no targets.
+        Ties go to the target that comes first.
+        """
+
+        targets = list(targets)
+        if (len(targets) == 0):
+            return (None, None)
+
+        distances = self.distancesTo(pos, targets)
+        index = min(range(len(distances)), key = distances.__getitem__)
+
+        return (distances[index], targets[index])
+
 def isInt(pos):
     x, y = pos
     return x == int(x) and y == int(y)
@@ -78,79 +202,990 @@ def getGrids1D(x):
 # MACHINERY FOR COMPUTING MAZE DISTANCES #
 ##########################################
 
-distanceMap = {}
+# Distances are stored as unsigned ints, with the largest value meaning "unreachable".
+# Most grids fit in 16 bits, and larger ones use 32 bits (see `getDistanceType`).
+UNREACHABLE = 2 ** 16 - 1
+UNREACHABLE_32 = 2 ** 32 - 1
+
+# How many walls grids each of the process-wide caches below keeps distances for.
+# A long run over many layouts (e.g. RANDOM<n> capture layouts) only keeps the recent ones,
+# while Distancers keep the distances they are using.
+MAX_CACHED_WALLS = 16
+
+# The distances for the walls grids recently seen by this process, keyed by `getWallsKey`.
+# {key: MazeDistances, ...}
+distanceMap = LRUCache(MAX_CACHED_WALLS)
+
+# The lazy distances for the walls grids recently seen by this process,
+# keyed by `getWallsKey` and the memory budget.
+# {(key, memoryBudget): LazyMazeDistances, ...}
+lazyDistanceMap = LRUCache(MAX_CACHED_WALLS)
+
+# The compressed distances for the walls grids recently seen by this process,
+# keyed by `getWallsKey`.
+# {key: JunctionMazeDistances, ...}
+junctionDistanceMap = LRUCache(MAX_CACHED_WALLS)
+
+# The default number of bytes that `LazyMazeDistances` will keep rows in.
+DEFAULT_MEMORY_BUDGET = 64 * 1024 * 1024
+
+# The header of a distance file in the disk cache:
+# magic, version, is little endian, number of positions.
+# The distances (in native byte order) directly follow the header.
+DISK_MAGIC = b'PDST'
+DISK_VERSION = 1
+DISK_HEADER = struct.Struct('<4sB?xxI')
+
+# Where to keep distance files (None to not use a disk cache), see `setDiskCacheDir`.
+_diskCacheDir = None
+
+# The memory budget for Distancers that do not pick a mode (None for full tables),
+# see `setLazyDistances`.
+_lazyMemoryBudget = None
+
+# Whether Distancers that do not pick a mode are compressed, see `setCompressedDistances`.
+_compressed = False
+
+# Whether Distancers that do not pick a mode are incremental, see `setIncrementalDistances`.
+_incremental = False
+
+# Incremental distances that are still being computed, keyed by `getWallsKey`.
+# Everything in the process that uses the same walls shares the progress.
+# {key: IncrementalMazeDistances, ...}
+_pendingDistances = LRUCache(MAX_CACHED_WALLS)
 
 class DistanceCalculator:
     def __init__(self, layout, distancer):
         self.layout = layout
         self.distancer = distancer
-        self.cache = {}
 
-    def run(self):
-        if self.layout.walls not in self.cache:
-            self.cache[self.layout.walls] = computeDistances(self.layout)
+    def start(self):
+        """
+        Start computing the distances incrementally (see `DistanceCalculator.step`).
+        """
 
-        self.distancer._distances = self.cache[self.layout.walls]
+        self.distancer._distances = startMazeDistances(self.layout.walls)
 
-def computeDistances(layout):
+    def step(self, timeLimit = None):
+        """
+        Continue computing incremental distances for at most `timeLimit` seconds.
+        Returns True once all the distances are known.
+        """
+
+        distances = self.distancer._distances
+        if (distances is None):
+            return False
+
+        if (distances.isComplete()):
+            return True
+
+        if (distances.compute(timeLimit)):
+            self.distancer._distances = finishMazeDistances(self.layout.walls, distances)
+
+        return self.distancer._distances.isComplete()
+
+    def run(self):
+        if (self.distancer.isLazy()):
+            self.distancer._distances = getLazyMazeDistances(self.layout.walls,
+                    self.distancer.getMemoryBudget())
+        elif (self.distancer.isCompressed()):
+            self.distancer._distances = getJunctionMazeDistances(self.layout.walls)
+        else:
+            self.distancer._distances = getMazeDistances(self.layout.walls)
+
+class MazeDistances(object):
     """
-    Runs UCS to all other positions from each position.
+    The maze distance between every pair of open cells in a walls grid.
+
+    Every open cell gets an id (see `MazeDistances.getId`),
+    and the distances are packed into a single array of unsigned ints
+    (16-bit unless the grid is too big, see `getDistanceType`).
+    Since distances are symmetric, only the lower triangle is stored:
+    the distance between ids i >= j is at index (i * (i + 1) / 2 + j).
     """
 
-    distances = {}
-    allNodes = layout.walls.asList(False)
+    def __init__(self, walls, distances = None):
+        """
+        Precomputed distances (e.g. from the disk cache) can be passed in,
+        as any sequence of ints in the order described above.
+        """
+
+        self._initPositions(walls)
+
+        if (distances is None):
+            distances = self._computeDistances()
+        elif (len(distances) != len(self._positions) * (len(self._positions) + 1) // 2):
+            raise ValueError('Expected distances for %d positions.' % (len(self._positions)))
+
+        self._distances = distances
+
+    def getDistance(self, pos1, pos2):
+        """
+        Get the maze distance between two open (integer) positions.
+        Returns None if either position is not an open cell,
+        and sys.maxsize if there is no path between them.
+        """
+
+        id1 = self.getId(pos1)
+        id2 = self.getId(pos2)
+        if (id1 is None or id2 is None):
+            return None
 
-    for source in allNodes:
-        dist = {}
-        closed = {}
+        if (id1 < id2):
+            id1, id2 = id2, id1
 
-        for node in allNodes:
-            dist[node] = sys.maxsize
+        distance = self._distances[id1 * (id1 + 1) // 2 + id2]
+        if (distance == self._unreachable):
+            return sys.maxsize
 
-        queue = priorityQueue.PriorityQueue()
-        queue.push(source, 0)
-        dist[source] = 0
+        return distance
 
-        while not queue.isEmpty():
-            node = queue.pop()
-            if node in closed:
+    def getDistances(self, source, targets):
+        """
+        Get the maze distances from one position to each of the targets (in the same order).
+        Like `MazeDistances.getDistance`, pairs with a position that is not an open cell get None.
+        This only looks up the source once, and then reads its row of the table.
+        """
+
+        sourceId = self.getId(source)
+        if (sourceId is None):
+            return [None for target in targets]
+
+        distances = self._distances
+        rowStart = sourceId * (sourceId + 1) // 2
+
+        results = []
+        for target in targets:
+            id = self.getId(target)
+            if (id is None):
+                results.append(None)
                 continue
 
-            closed[node] = True
-            nodeDist = dist[node]
+            # The source's row only holds the smaller ids, the rest are in the targets' rows.
+            if (id <= sourceId):
+                distance = distances[rowStart + id]
+            else:
+                distance = distances[id * (id + 1) // 2 + sourceId]
+
+            if (distance == self._unreachable):
+                distance = sys.maxsize
+
+            results.append(distance)
+
+        return results
+
+    def getId(self, position):
+        """
+        Get the id of an open cell, or None if the position is not an open cell.
+        """
+
+        (x, y) = position
+        if (x < 0 or y < 0 or x >= self._width or y >= self._height):
+            return None
+
+        id = self._ids[int(x) * self._height + int(y)]
+        if (id == self._unreachable):
+            return None
+
+        return id
+
+    def getMemoryUsage(self):
+        """
+        Get the (approximate) number of bytes used by the distance table and position index.
+        """
+
+        return (self._distances.itemsize * len(self._distances)
+            + self._ids.itemsize * len(self._ids))
+
+    def getNumPositions(self):
+        return len(self._positions)
+
+    def getPositions(self):
+        """
+        Get all the open cells, ordered by id.
+        The caller should not modify the list.
+        """
+
+        return self._positions
+
+    def hasFullTable(self):
+        """
+        Check if these distances are kept in a full table (see `MazeDistances.toBytes`),
+        which is what the disk cache stores.
+        """
+
+        return True
+
+    def isComplete(self):
+        """
+        Check if every distance is known.
+        """
+
+        return True
+
+    def toBytes(self):
+        """
+        Get the raw distance table (in native byte order).
+        """
+
+        return bytes(self._distances)
+
+    def __str__(self):
+        return 'MazeDistances(positions: %d, bytes: %d)' % (len(self._positions),
+            self.getMemoryUsage())
+
+    def _computeDistances(self):
+        """
+        Run a BFS from every open cell.
+        """
+
+        numPositions = len(self._positions)
+        neighbors = self._getNeighbors()
+
+        distances = (array.array(self._typecode, [self._unreachable])
+            * (numPositions * (numPositions + 1) // 2))
+
+        for source in range(numPositions):
+            # Only the distances to ids <= source are kept (they are the source's row).
+            row = self._computeRow(source, neighbors)
+
+            rowStart = source * (source + 1) // 2
+            distances[rowStart:(rowStart + source + 1)] = row[:(source + 1)]
+
+        return distances
+
+    def _computeRow(self, source, neighbors):
+        """
+        Get the distances from one id to every id (as an array of unsigned ints).
+        Since every move costs one, a BFS finds the same distances as UCS without a heap.
+        """
+
+        # Lists are faster to update than arrays.
+        unreachable = self._unreachable
+        row = [unreachable] * len(self._positions)
+        row[source] = 0
+
+        frontier = [source]
+        distance = 0
+
+        while (frontier):
+            distance += 1
+            nextFrontier = []
+
+            for node in frontier:
+                for other in neighbors[node]:
+                    if (row[other] == unreachable):
+                        row[other] = distance
+                        nextFrontier.append(other)
+
+            frontier = nextFrontier
+
+        return array.array(self._typecode, row)
+
+    def _getNeighbors(self):
+        """
+        Get the ids of the open cells next to each open cell, indexed by id.
+        """
+
+        neighbors = []
+        for (x, y) in self._positions:
             adjacent = []
-            x, y = node
+            for (nextX, nextY) in [(x, y + 1), (x, y - 1), (x + 1, y), (x - 1, y)]:
+                id = self.getId((nextX, nextY))
+                if (id is not None):
+                    adjacent.append(id)
+
+            neighbors.append(adjacent)
+
+        return neighbors
+
+    def _initPositions(self, walls):
+        self._width = walls.getWidth()
+        self._height = walls.getHeight()
+
+        # Open cells are numbered in the order of walls.asList(False).
+        self._positions = walls.asList(False)
+        (self._typecode, self._unreachable) = getDistanceType(len(self._positions))
+
+        # Map a cell index (x * height + y) to an id (or the unreachable value for walls).
+        self._ids = array.array(self._typecode, [self._unreachable]) * (self._width * self._height)
+        for (id, (x, y)) in enumerate(self._positions):
+            self._ids[x * self._height + y] = id
+
+class LazyMazeDistances(MazeDistances):
+    """
+    Maze distances that are computed one source at a time, as they are asked for.
+    For very large mazes, storing the distance between every pair of cells is infeasible
+    (the table grows quadratically), while agents usually only ask for distances
+    from the few cells they (and their opponents) are standing on.
+
+    The first query from a cell runs a single BFS from it, and that cell's row of distances
+    is kept in an `pacai.util.lruCache.LRUCache`.
+    Rows are evicted once they take up more than `memoryBudget` bytes.
+    Since distances are symmetric, a query is answered from either position's row.
+    """
+
+    def __init__(self, walls, memoryBudget = DEFAULT_MEMORY_BUDGET):
+        self._initPositions(walls)
+        self._neighbors = self._getNeighbors()
+
+        rowSize = max(1, len(self._positions)) * array.array(self._typecode).itemsize
+        self._rows = LRUCache(max(1, memoryBudget // rowSize))
+
+    # Override
+    def getDistance(self, pos1, pos2):
+        id1 = self.getId(pos1)
+        id2 = self.getId(pos2)
+        if (id1 is None or id2 is None):
+            return None
+
+        # Prefer a row that is already there.
+        if (id1 not in self._rows and id2 in self._rows):
+            id1, id2 = id2, id1
+
+        distance = self._getRow(id1)[id2]
+        if (distance == self._unreachable):
+            return sys.maxsize
+
+        return distance
 
-            if not layout.isWall((x, y + 1)):
-                adjacent.append((x, y + 1))
+    # Override
+    def getDistances(self, source, targets):
+        sourceId = self.getId(source)
+        if (sourceId is None):
+            return [None for target in targets]
 
-            if not layout.isWall((x, y - 1)):
-                adjacent.append((x, y - 1))
+        row = self._getRow(sourceId)
 
-            if not layout.isWall((x + 1, y)):
-                adjacent.append((x + 1, y))
+        results = []
+        for target in targets:
+            id = self.getId(target)
+            if (id is None):
+                results.append(None)
+            elif (row[id] == self._unreachable):
+                results.append(sys.maxsize)
+            else:
+                results.append(row[id])
+
+        return results
+
+    def getHitRate(self):
+        """
+        Get the fraction of queries that were answered by a row that was already computed.
+        """
+
+        total = self._rows.hits + self._rows.misses
+        if (total == 0):
+            return 0.0
+
+        return self._rows.hits / total
+
+    # Override
+    def getMemoryUsage(self):
+        return (len(self._rows) * len(self._positions) * array.array(self._typecode).itemsize
+            + self._ids.itemsize * len(self._ids))
+
+    def getRowCache(self):
+        return self._rows
+
+    # Override
+    def hasFullTable(self):
+        return False
+
+    # Override
+    def toBytes(self):
+        raise NotImplementedError('Lazy distances do not have a full table.')
+
+    def __str__(self):
+        return 'LazyMazeDistances(positions: %d, %s, hit rate: %.3f)' % (len(self._positions),
+            self._rows, self.getHitRate())
+
+    def _getRow(self, id):
+        row = self._rows.get(id)
+        if (row is None):
+            row = self._computeRow(id, self._neighbors)
+            self._rows.put(id, row)
+
+        return row
+
+class IncrementalMazeDistances(MazeDistances):
+    """
+    A full table of maze distances that is filled in a bit at a time
+    (see `IncrementalMazeDistances.compute`).
+    Rows of the table (see `MazeDistances`) are computed in id order,
+    and the distance between two ids is known once the larger id's row is done.
+    Until then, the manhattan distance is returned instead.
+    """
+
+    def __init__(self, walls):
+        self._initPositions(walls)
+        self._neighbors = self._getNeighbors()
+
+        numPositions = len(self._positions)
+        self._distances = (array.array(self._typecode, [self._unreachable])
+            * (numPositions * (numPositions + 1) // 2))
+        self._numRows = 0
+
+    def compute(self, timeLimit = None, maxRows = None):
+        """
+        Compute rows until `timeLimit` seconds have passed or `maxRows` rows are done
+        (None for no limit).
+        At least one row is always computed (if there are any left).
+        Returns True once all the rows are done.
+        """
 
-            if not layout.isWall((x - 1, y)):
-                adjacent.append((x - 1, y))
+        numPositions = len(self._positions)
+        endTime = None
+        if (timeLimit is not None):
+            endTime = time.time() + timeLimit
 
-            for other in adjacent:
-                if other not in dist:
+        numComputed = 0
+        while (self._numRows < numPositions):
+            source = self._numRows
+            row = self._computeRow(source, self._neighbors)
+
+            rowStart = source * (source + 1) // 2
+            self._distances[rowStart:(rowStart + source + 1)] = row[:(source + 1)]
+
+            self._numRows += 1
+            numComputed += 1
+
+            if (maxRows is not None and numComputed >= maxRows):
+                break
+
+            if (endTime is not None and time.time() >= endTime):
+                break
+
+        return self.isComplete()
+
+    # Override
+    def getDistance(self, pos1, pos2):
+        id1 = self.getId(pos1)
+        id2 = self.getId(pos2)
+        if (id1 is None or id2 is None):
+            return None
+
+        if (id1 < id2):
+            id1, id2 = id2, id1
+
+        if (id1 >= self._numRows):
+            return manhattan(pos1, pos2)
+
+        distance = self._distances[id1 * (id1 + 1) // 2 + id2]
+        if (distance == self._unreachable):
+            return sys.maxsize
+
+        return distance
+
+    # Override
+    def getDistances(self, source, targets):
+        if (self.isComplete()):
+            return super().getDistances(source, targets)
+
+        return [self.getDistance(source, target) for target in targets]
+
+    def getNumComputedRows(self):
+        return self._numRows
+
+    # Override
+    def isComplete(self):
+        return self._numRows == len(self._positions)
+
+    # Override
+    def __str__(self):
+        return 'IncrementalMazeDistances(positions: %d, rows done: %d, bytes: %d)' % (
+            len(self._positions), self._numRows, self.getMemoryUsage())
+
+class JunctionMazeDistances(MazeDistances):
+    """
+    Maze distances that are compressed by collapsing corridors.
+
+    Most open cells are on corridors (they have exactly two open neighbors).
+    Every other cell (and one cell on each loop with no other exits) is a junction.
+    A corridor is a run of corridor cells between two (possibly the same) junctions.
+    Distances are only stored between pairs of junctions (in a triangle, like `MazeDistances`).
+    A cell on a corridor is some offset from the corridor's start and end,
+    so the distance between two cells is the best way out of the first cell's corridor,
+    to a junction, to the second cell's corridor (or just along the corridor they share).
+
+    How much memory this saves depends on how much of the maze is corridors.
+    Classic layouts and mazes take about 7-16x less memory than `MazeDistances`,
+    but most capture layouts have open areas full of junctions
+    and only take about 3.5-4.5x less (e.g. 4.2x on defaultCapture).
+    """
+
+    def __init__(self, walls):
+        self._initPositions(walls)
+        neighbors = self._getNeighbors()
+        numPositions = len(self._positions)
+
+        # There are fewer junctions and corridors than open cells,
+        # so all of these fit in the same (narrow) type as distances,
+        # and the unreachable value marks a missing junction or corridor.
+        none = self._unreachable
+
+        # The junction index of each id (or none for corridor cells).
+        self._junctions = array.array(self._typecode, [none]) * numPositions
+        numJunctions = 0
+        for id in range(numPositions):
+            if (len(neighbors[id]) != 2):
+                self._junctions[id] = numJunctions
+                numJunctions += 1
+
+        # The corridor index of each id (or none for junctions), and the distance from its start.
+        self._corridors = array.array(self._typecode, [none]) * numPositions
+        self._offsets = array.array(self._typecode, [0]) * numPositions
+
+        # The start junction, end junction, and length of each corridor.
+        self._corridorStarts = array.array(self._typecode)
+        self._corridorEnds = array.array(self._typecode)
+        self._corridorLengths = array.array(self._typecode)
+
+        # {junction: {junction: distance, ...}, ...}
+        edges = [{} for i in range(numJunctions)]
+
+        for id in range(numPositions):
+            if (self._junctions[id] != none):
+                self._walkCorridors(id, neighbors, edges)
+
+        # Whatever is left are loops without any junctions, so make one.
+        for id in range(numPositions):
+            if (self._junctions[id] == none and self._corridors[id] == none):
+                self._junctions[id] = len(edges)
+                edges.append({})
+                self._walkCorridors(id, neighbors, edges)
+
+        self._numJunctions = len(edges)
+        self._distances = self._computeJunctionDistances(edges)
+
+    # Override
+    def getDistance(self, pos1, pos2):
+        id1 = self.getId(pos1)
+        id2 = self.getId(pos2)
+        if (id1 is None or id2 is None):
+            return None
+
+        return self._getDistance(id1, self._getExits(id1), id2)
+
+    # Override
+    def getDistances(self, source, targets):
+        sourceId = self.getId(source)
+        if (sourceId is None):
+            return [None for target in targets]
+
+        exits = self._getExits(sourceId)
+
+        results = []
+        for target in targets:
+            id = self.getId(target)
+            if (id is None):
+                results.append(None)
+            else:
+                results.append(self._getDistance(sourceId, exits, id))
+
+        return results
+
+    # Override
+    def getMemoryUsage(self):
+        arrays = [self._distances, self._ids, self._junctions, self._corridors, self._offsets,
+                self._corridorStarts, self._corridorEnds, self._corridorLengths]
+
+        return sum([values.itemsize * len(values) for values in arrays])
+
+    def getNumJunctions(self):
+        return self._numJunctions
+
+    # Override
+    def hasFullTable(self):
+        return False
+
+    # Override
+    def toBytes(self):
+        raise NotImplementedError('Junction distances do not have a full table.')
+
+    # Override
+    def __str__(self):
+        return 'JunctionMazeDistances(positions: %d, junctions: %d, bytes: %d)' % (
+            len(self._positions), self._numJunctions, self.getMemoryUsage())
+
+    def _computeJunctionDistances(self, edges):
+        """
+        Run Dijkstra's algorithm from every junction over the (weighted) junction graph.
+        """
+
+        numJunctions = len(edges)
+        distances = (array.array(self._typecode, [self._unreachable])
+            * (numJunctions * (numJunctions + 1) // 2))
+
+        for source in range(numJunctions):
+            best = {source: 0}
+            heap = [(0, source)]
+
+            while (heap):
+                (distance, junction) = heapq.heappop(heap)
+                if (distance > best[junction]):
                     continue
 
-                oldDist = dist[other]
-                newDist = nodeDist + 1
-                if newDist < oldDist:
-                    dist[other] = newDist
-                    queue.push(other, newDist)
+                for (other, length) in edges[junction].items():
+                    if (distance + length < best.get(other, self._unreachable)):
+                        best[other] = distance + length
+                        heapq.heappush(heap, (distance + length, other))
+
+            rowStart = source * (source + 1) // 2
+            for (junction, distance) in best.items():
+                if (junction <= source):
+                    distances[rowStart + junction] = distance
+
+        return distances
+
+    def _getDistance(self, id1, exits1, id2):
+        """
+        Get the distance between two ids, given the exits of the first one.
+        """
+
+        unreachable = self._unreachable
+        best = unreachable
+
+        corridor = self._corridors[id1]
+        if (corridor != unreachable and corridor == self._corridors[id2]):
+            best = abs(self._offsets[id1] - self._offsets[id2])
+
+        for (junction1, offset1) in exits1:
+            for (junction2, offset2) in self._getExits(id2):
+                if (junction1 < junction2):
+                    index = junction2 * (junction2 + 1) // 2 + junction1
+                else:
+                    index = junction1 * (junction1 + 1) // 2 + junction2
+
+                distance = self._distances[index]
+                if (distance != unreachable and distance + offset1 + offset2 < best):
+                    best = distance + offset1 + offset2
+
+        if (best == unreachable):
+            return sys.maxsize
+
+        return best
+
+    def _getExits(self, id):
+        """
+        Get the junctions that a cell can reach without passing another junction,
+        as [(junction, distance), ...].
+        """
+
+        junction = self._junctions[id]
+        if (junction != self._unreachable):
+            return [(junction, 0)]
+
+        corridor = self._corridors[id]
+        offset = self._offsets[id]
+
+        return [
+            (self._corridorStarts[corridor], offset),
+            (self._corridorEnds[corridor], self._corridorLengths[corridor] - offset),
+        ]
+
+    def _walkCorridors(self, start, neighbors, edges):
+        """
+        Follow every corridor leaving a junction that has not been walked yet,
+        and add an edge to the junction at its end.
+        """
+
+        none = self._unreachable
+        startJunction = self._junctions[start]
+
+        for next in neighbors[start]:
+            # Junctions right next to each other do not have a corridor between them.
+            if (self._junctions[next] != none):
+                edges[startJunction][self._junctions[next]] = 1
+                continue
+
+            if (self._corridors[next] != none):
+                continue
+
+            corridor = len(self._corridorLengths)
+            previous = start
+            current = next
+            length = 1
+
+            while (self._junctions[current] == none):
+                self._corridors[current] = corridor
+                self._offsets[current] = length
+
+                (first, second) = neighbors[current]
+                if (first == previous):
+                    (previous, current) = (current, second)
+                else:
+                    (previous, current) = (current, first)
+
+                length += 1
+
+            endJunction = self._junctions[current]
+
+            self._corridorStarts.append(startJunction)
+            self._corridorEnds.append(endJunction)
+            self._corridorLengths.append(length)
+
+            if (length < edges[startJunction].get(endJunction, self._unreachable)):
+                edges[startJunction][endJunction] = length
+                edges[endJunction][startJunction] = length
+
+def computeDistances(layout):
+    """
+    Compute the maze distances between all the open cells in the layout.
+    Returns a `MazeDistances`.
+    """
+
+    return MazeDistances(layout.walls)
+
+def finishMazeDistances(walls, distances):
+    """
+    Share (and save to the disk cache) incremental distances that have all been computed,
+    just like the distances from `getMazeDistances`.
+    Returns the distances that everything in the process should use.
+    """
 
-        for target in allNodes:
-            distances[(target, source)] = dist[target]
+    key = getWallsKey(walls)
+    _pendingDistances.pop(key)
+
+    sharedDistances = distanceMap.get(key)
+    if (sharedDistances is not None):
+        return sharedDistances
+
+    logging.debug('Finished computing maze distances between %d positions.'
+            % (distances.getNumPositions()))
+
+    distanceMap.put(key, distances)
+    _saveDistances(key, distances)
 
     return distances
 
 def getDistanceOnGrid(distances, pos1, pos2):
-    key = (pos1, pos2)
-    if key in distances:
-        return distances[key]
+    distance = distances.getDistance(pos1, pos2)
+    if (distance is None):
+        return DEFAULT_DISTANCE
+
+    return distance
+
+def getDistanceType(numPositions):
+    """
+    Get the array typecode and "unreachable" value for the distances in a walls grid
+    with this many open cells.
+    No path is longer than the number of open cells, so 16 bits are enough for most grids.
+    """
+
+    if (numPositions < UNREACHABLE):
+        return ('H', UNREACHABLE)
+
+    return ('I', UNREACHABLE_32)
+
+def getMazeDistances(walls):
+    """
+    Get the `MazeDistances` for a walls grid.
+    Distances are shared by everything in this process that uses the same walls,
+    and are also loaded from/saved to the disk cache if one is set (see `setDiskCacheDir`).
+    """
+
+    key = getWallsKey(walls)
+    distances = distanceMap.get(key)
+    if (distances is not None):
+        return distances
+
+    # Finish up distances that were being computed incrementally.
+    distances = _pendingDistances.get(key)
+    if (distances is not None):
+        distances.compute()
+        return finishMazeDistances(walls, distances)
+
+    distances = _loadDistances(key, walls)
+    if (distances is None):
+        startTime = time.time()
+        distances = MazeDistances(walls)
+        logging.debug('Computed maze distances between %d positions in %.3f seconds (%d bytes).'
+                % (distances.getNumPositions(), time.time() - startTime,
+                    distances.getMemoryUsage()))
+
+        _saveDistances(key, distances)
+
+    distanceMap.put(key, distances)
+    return distances
+
+def getJunctionMazeDistances(walls):
+    """
+    Get the `JunctionMazeDistances` for a walls grid.
+    Like `getMazeDistances`, these are shared by everything in this process
+    that uses the same walls, but they are never put in the disk cache.
+    """
+
+    key = getWallsKey(walls)
+    distances = junctionDistanceMap.get(key)
+    if (distances is None):
+        startTime = time.time()
+        distances = JunctionMazeDistances(walls)
+        logging.debug(('Computed maze distances between %d positions (%d junctions) '
+                + 'in %.3f seconds (%d bytes).') % (distances.getNumPositions(),
+                    distances.getNumJunctions(), time.time() - startTime,
+                    distances.getMemoryUsage()))
+
+        junctionDistanceMap.put(key, distances)
+
+    return distances
+
+def getLazyMazeDistances(walls, memoryBudget = DEFAULT_MEMORY_BUDGET):
+    """
+    Get the `LazyMazeDistances` for a walls grid.
+    Like `getMazeDistances`, these are shared by everything in this process
+    that uses the same walls (and memory budget), but they are never put in the disk cache.
+    """
+
+    key = (getWallsKey(walls), memoryBudget)
+    distances = lazyDistanceMap.get(key)
+    if (distances is None):
+        distances = LazyMazeDistances(walls, memoryBudget)
+        lazyDistanceMap.put(key, distances)
+
+    return distances
+
+def getWallsKey(walls):
+    """
+    Get a key (a hex string) for the content of a walls grid.
+    Grids with the same size and walls get the same key, whatever their type.
+    """
+
+    width = walls.getWidth()
+    height = walls.getHeight()
+    bits = walls.asBits().to_bytes((width * height + 7) // 8, 'little')
+
+    digest = hashlib.blake2b(digest_size = 16)
+    digest.update(struct.pack('<II', width, height))
+    digest.update(bits)
+
+    return digest.hexdigest()
+
+def setCompressedDistances(compressed):
+    """
+    Make Distancers use compressed (junction graph) distances by default.
+    """
+
+    global _compressed
+    _compressed = compressed
+
+def setDiskCacheDir(path):
+    """
+    Keep computed distances in files in the given directory (None to turn off the disk cache).
+    Distance files are memory-mapped when they are loaded,
+    so processes using the same layout share the same pages.
+    """
+
+    global _diskCacheDir
+    _diskCacheDir = path
+
+    if (path is not None):
+        os.makedirs(path, exist_ok = True)
+
+def setIncrementalDistances(incremental):
+    """
+    Make Distancers compute their distances incrementally by default
+    (see `Distancer.computeMazeDistances`).
+    """
+
+    global _incremental
+    _incremental = incremental
+
+def setLazyDistances(memoryBudget):
+    """
+    Make Distancers compute their distances lazily by default,
+    keeping at most `memoryBudget` bytes of distances (None to go back to full tables).
+    """
+
+    global _lazyMemoryBudget
+    _lazyMemoryBudget = memoryBudget
+
+def startMazeDistances(walls):
+    """
+    Get the distances for a walls grid without computing them all.
+    If the distances are already known (in this process or in the disk cache),
+    they are returned as-is.
+    Otherwise, an `IncrementalMazeDistances` (shared by everything in the process
+    that uses the same walls) is returned.
+    """
+
+    key = getWallsKey(walls)
+    distances = distanceMap.get(key)
+    if (distances is not None):
+        return distances
+
+    distances = _loadDistances(key, walls)
+    if (distances is not None):
+        distanceMap.put(key, distances)
+        return distances
+
+    distances = _pendingDistances.get(key)
+    if (distances is None):
+        distances = IncrementalMazeDistances(walls)
+        _pendingDistances.put(key, distances)
+
+    return distances
+
+def _getDistancesPath(key):
+    return os.path.join(_diskCacheDir, 'distances-%s.bin' % (key))
+
+def _loadDistances(key, walls):
+    """
+    Load distances from the disk cache, or return None if they are not there (or not usable).
+    """
+
+    if (_diskCacheDir is None):
+        return None
+
+    path = _getDistancesPath(key)
+    if (not os.path.isfile(path)):
+        return None
+
+    try:
+        with open(path, 'rb') as file:
+            # The map stays open after the file is closed.
+            data = mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_READ)
+    except (OSError, ValueError) as ex:
+        logging.warning("Could not read the distance file '%s': %s." % (path, ex))
+        return None
+
+    if (len(data) < DISK_HEADER.size):
+        return None
+
+    (magic, version, isLittleEndian, numPositions) = DISK_HEADER.unpack_from(data, 0)
+    numDistances = numPositions * (numPositions + 1) // 2
+    typecode = getDistanceType(numPositions)[0]
+
+    if (magic != DISK_MAGIC or version != DISK_VERSION
+            or isLittleEndian != (sys.byteorder == 'little')
+            or len(data) != DISK_HEADER.size + numDistances * array.array(typecode).itemsize):
+        logging.warning("Ignoring the unusable distance file '%s'." % (path))
+        return None
+
+    distances = memoryview(data)[DISK_HEADER.size:].cast(typecode)
+    logging.debug("Loaded maze distances between %d positions from '%s'." % (numPositions, path))
+
+    return MazeDistances(walls, distances)
+
+def _saveDistances(key, distances):
+    if (_diskCacheDir is None):
+        return
+
+    # Only full (and complete) tables go in the disk cache.
+    if (not distances.hasFullTable() or not distances.isComplete()):
+        return
+
+    path = _getDistancesPath(key)
+    header = DISK_HEADER.pack(DISK_MAGIC, DISK_VERSION, sys.byteorder == 'little',
+            distances.getNumPositions())
+
+    # Write to a temp file first, so other processes never see a partial file.
+    try:
+        (handle, tempPath) = tempfile.mkstemp(dir = _diskCacheDir)
+        with os.fdopen(handle, 'wb') as file:
+            file.write(header)
+            file.write(distances.toBytes())
 
-    return DEFAULT_DISTANCE
+        os.replace(tempPath, path)
+    except OSError as ex:
+        logging.warning("Could not write the distance file '%s': %s." % (path, ex))
@@ -3,14 +3,41 @@ The core of a pacman-style game.
 """
 
 import logging
+import random
 import time
 
+from pacai.agents.base import BaseAgent
+from pacai.core.agentHost import RemoteAgent
+from pacai.util.watchdog import DeadlineExceeded
+from pacai.util.watchdog import Watchdog
+
 class Game:
     """
     The Game manages the control flow, soliciting actions from agents.
+
+    Each game has its own random number generator (a `random.Random`).
+    When the game starts, each agent gets its own generator seeded from it
+    (see `pacai.agents.base.BaseAgent.setRNG`),
+    so an agent's choices do not depend on what other agents (or processes) drew.
+    Without one, the global `random` module is used to draw the seeds.
+
+    When timeouts are enforced, every call to an agent has a hard limit:
+    the startup or move limit, or whatever is left of the agent's total time (if that is less).
+    Agents in this process are stopped by a `pacai.util.watchdog.Watchdog`
+    (if the game is played from the main thread, otherwise they are judged once they finish),
+    and agents played from their own process (see `pacai.core.agentHost`)
+    are cut off (and their process killed).
+
+    Agents may also be played from other processes (see `pacai.core.agentHost`),
+    in which case the game keeps their hosts up to date with its moves.
     """
 
-    def __init__(self, agents, display, rules, startingIndex = 0, catchExceptions = False):
+    def __init__(self, agents, display, rules, startingIndex = 0, catchExceptions = False,
+            rng = None):
+        if (rng is None):
+            rng = random
+
+        self.rng = rng
         self.agentCrashed = False
         self.agents = agents
         self.display = display
@@ -25,6 +52,11 @@ class Game:
         self.enforceTimeouts = catchExceptions
         self.catchExceptions = catchExceptions
 
+        self._agentHosts = []
+        for agent in agents:
+            if (isinstance(agent, RemoteAgent) and agent.getHost() not in self._agentHosts):
+                self._agentHosts.append(agent.getHost())
+
     def run(self):
         """
         Main control loop for game play.
@@ -44,16 +76,15 @@ class Game:
         self.display.update(self.state)
 
         while (not self.gameOver):
-            # Fetch the next agent
-            agent = self.agents[agentIndex]
-
             action = None
             startTime = time.time()
 
             # Get an action from the agent.
             try:
-                agent.observationFunction(self.state)
-                action = agent.getAction(self.state)
+                action = self._getAgentAction(agentIndex, self.state, True)
+            except DeadlineExceeded:
+                self._agentOutOfTime(agentIndex, time.time() - startTime)
+                return False
             except Exception as ex:
                 if (not self.catchExceptions):
                     raise ex
@@ -70,7 +101,8 @@ class Game:
             # Execute the action.
             self.moveHistory.append((agentIndex, action))
             try:
-                self.state = self.state.generateSuccessor(agentIndex, action)
+                # The game's own states are not cached, since the rules may modify them.
+                self.state = self.state.generateSuccessor(agentIndex, action, useCache = False)
             except Exception as ex:
                 if (not self.catchExceptions):
                     raise ex
@@ -78,6 +110,9 @@ class Game:
                 self._agentCrash(agentIndex, ex)
                 return False
 
+            for host in self._agentHosts:
+                host.addMove(agentIndex, action)
+
             # Update the display.
             self.display.update(self.state)
 
@@ -85,8 +120,7 @@ class Game:
             self.rules.process(self.state, self)
 
             # Track progress.
-            if (agentIndex == numAgents + 1):
-                self.numMoves += 1
+            self.numMoves += 1
 
             # Next agent.
             agentIndex = (agentIndex + 1) % numAgents
@@ -96,18 +130,123 @@ class Game:
 
         self.display.finish()
 
+    def simulate(self, keepHistory = False, timeAgents = False):
+        """
+        Play the game as fast as possible, e.g. for training or large evaluations.
+        The game plays out exactly like it would with `Game.run`,
+        but the work that is only needed to show or study a game is skipped:
+         - The display is never used (so it can be None).
+         - Moves are only kept in `Game.moveHistory` if `keepHistory` is set.
+         - Agents are only timed if `timeAgents` is set (or timeouts are enforced).
+         - Agents that do not override `pacai.agents.base.BaseAgent.observationFunction`
+           are not asked to observe.
+        """
+
+        self.numMoves = 0
+
+        if (not self._registerInitialState()):
+            return False
+
+        agents = self.agents
+        numAgents = len(agents)
+        process = self.rules.process
+        moveHistory = self.moveHistory
+        hosts = self._agentHosts
+        enforceTimeouts = self.enforceTimeouts
+        timeAgents = timeAgents or enforceTimeouts
+
+        observers = [type(agent).observationFunction is not BaseAgent.observationFunction
+                for agent in agents]
+
+        state = self.state
+        agentIndex = self.startingIndex
+
+        while (not self.gameOver):
+            agent = agents[agentIndex]
+
+            if (timeAgents):
+                startTime = time.time()
+
+            try:
+                if (enforceTimeouts):
+                    action = self._getAgentAction(agentIndex, state, observers[agentIndex])
+                else:
+                    if (observers[agentIndex]):
+                        agent.observationFunction(state)
+
+                    action = agent.getAction(state)
+            except DeadlineExceeded:
+                self._agentOutOfTime(agentIndex, time.time() - startTime)
+                return False
+            except Exception as ex:
+                if (not self.catchExceptions):
+                    raise ex
+
+                self._agentCrash(agentIndex, ex)
+                return False
+
+            if (timeAgents):
+                timeTaken = time.time() - startTime
+                self.totalAgentTimes[agentIndex] += timeTaken
+
+                if (self._checkForTimeouts(agentIndex, timeTaken)):
+                    return False
+
+            if (keepHistory):
+                moveHistory.append((agentIndex, action))
+
+            try:
+                state = state.generateSuccessor(agentIndex, action, useCache = False)
+            except Exception as ex:
+                if (not self.catchExceptions):
+                    raise ex
+
+                self._agentCrash(agentIndex, ex)
+                return False
+
+            self.state = state
+
+            for host in hosts:
+                host.addMove(agentIndex, action)
+
+            process(state, self)
+
+            self.numMoves += 1
+            agentIndex = (agentIndex + 1) % numAgents
+
+        if (not self._registerFinalState()):
+            return False
+
     def _agentCrash(self, agentIndex, exception = None):
         """
         Helper method for handling agent crashes.
         """
 
-        logging.warning('Agent %d crashedtimed out on a single move!' % agentIndex,
-                exc_info = exception)
+        # Timeouts have already been logged.
+        if (not self.agentTimeout):
+            logging.warning('Agent %d crashed!' % agentIndex, exc_info = exception)
 
         self.gameOver = True
         self.agentCrashed = True
         self.rules.agentCrash(self, agentIndex)
 
+    def _agentOutOfTime(self, agentIndex, timeTaken):
+        """
+        Handle an agent that was cut off (see `pacai.util.watchdog.DeadlineExceeded`).
+        The agent's call (or its process) has already been stopped,
+        and the agent is never called again this game.
+        """
+
+        self.totalAgentTimes[agentIndex] += timeTaken
+
+        # Agents are only given until the move or total time limit, so this should catch it.
+        if (self._checkForTimeouts(agentIndex, timeTaken)):
+            return
+
+        logging.warning('Agent %d timed out on a single move!' % agentIndex)
+        self.agentTimeout = True
+        self._agentCrash(agentIndex)
+
     def _checkForTimeouts(self, agentIndex, timeTaken):
         """
         Check if an agent timed out.
@@ -156,6 +295,18 @@ class Game:
         Inform agents of the game start.
         """
 
+        agentSeeds = [self.rng.getrandbits(64) for agent in self.agents]
+
+        for host in self._agentHosts:
+            try:
+                host.startGame(self.state, agentSeeds)
+            except Exception as ex:
+                if (not self.catchExceptions):
+                    raise ex
+
+                self._agentCrash(host.getAgents()[0].index, ex)
+                return False
+
         for agentIndex in range(len(self.agents)):
             agent = self.agents[agentIndex]
 
@@ -164,11 +315,26 @@ class Game:
                 self._agentCrash(agentIndex)
                 return False
 
-            maxStartupTime = int(self.rules.getMaxStartupTime(agentIndex))
+            agent.setRNG(random.Random(agentSeeds[agentIndex]))
+
+            maxStartupTime = self.rules.getMaxStartupTime(agentIndex)
             startTime = time.time()
 
             try:
-                agent.registerInitialState(self.state)
+                if (not self.enforceTimeouts):
+                    agent.registerInitialState(self.state)
+                elif (isinstance(agent, RemoteAgent)):
+                    agent.getHost().registerInitialState(agentIndex, self.state,
+                            self._getTimeLimit(agentIndex, maxStartupTime))
+                else:
+                    with Watchdog(self._getTimeLimit(agentIndex, maxStartupTime)):
+                        agent.registerInitialState(self.state)
+            except DeadlineExceeded:
+                self.totalAgentTimes[agentIndex] += time.time() - startTime
+                logging.warning('Agent %d ran out of time on startup!' % agentIndex)
+                self.agentTimeout = True
+                self._agentCrash(agentIndex)
+                return False
             except Exception as ex:
                 if (not self.catchExceptions):
                     raise ex
@@ -187,6 +353,40 @@ class Game:
 
         return True
 
+    def _getAgentAction(self, agentIndex, state, observe):
+        """
+        Get an agent's next action.
+        When timeouts are enforced, the agent is only given until its time limit.
+        """
+
+        agent = self.agents[agentIndex]
+
+        if (not self.enforceTimeouts):
+            if (observe):
+                agent.observationFunction(state)
+
+            return agent.getAction(state)
+
+        timeLimit = self._getTimeLimit(agentIndex, self.rules.getMoveTimeout(agentIndex))
+
+        if (isinstance(agent, RemoteAgent)):
+            return agent.getHost().getAction(agentIndex, state, timeLimit)
+
+        with Watchdog(timeLimit):
+            if (observe):
+                agent.observationFunction(state)
+
+            return agent.getAction(state)
+
+    def _getTimeLimit(self, agentIndex, timeLimit):
+        """
+        Get how long an agent has for its next call.
+        This is the given (startup or move) limit, or whatever is left of the agent's total time.
+        """
+
+        remainingTime = self.rules.getMaxTotalTime(agentIndex) - self.totalAgentTimes[agentIndex]
+        return min(timeLimit, remainingTime)
+
     def _registerFinalState(self):
         # Inform a learning agent of the game's result.
         for agent in self.agents:
@@ -200,3 +400,35 @@ class Game:
                 return False
 
         return True
+
+class GameResult(object):
+    """
+    A compact (and picklable) summary of a finished game,
+    e.g. for sending back from another process.
+
+     - score: the final score.
+     - win: if the game was won (for capture, if the red team won).
+     - numMoves: the number of moves made by all the agents.
+     - agentTimes: the total time (in seconds) each agent spent computing.
+     - moveHistory: the (agentIndex, action) moves of the game (None if they were not kept).
+    """
+
+    def __init__(self, score, win, numMoves, agentTimes, moveHistory = None):
+        self.score = score
+        self.win = win
+        self.numMoves = numMoves
+        self.agentTimes = agentTimes
+        self.moveHistory = moveHistory
+
+    @classmethod
+    def fromGame(cls, game, win, keepHistory = False):
+        moveHistory = None
+        if (keepHistory):
+            moveHistory = list(game.moveHistory)
+
+        return cls(game.state.getScore(), win, game.numMoves, list(game.totalAgentTimes),
+                moveHistory)
+
+    def __str__(self):
+        return 'GameResult(score: %s, win: %s, moves: %d, agent times: %s)' % (self.score,
+            self.win, self.numMoves, ', '.join(['%.3f' % (time) for time in self.agentTimes]))
@@ -1,10 +1,41 @@
 import abc
-import copy
+import struct
 
+from pacai.core import zobrist
 from pacai.core.agentstate import AgentState
 from pacai.core.directions import Directions
+from pacai.core.grid import ReadOnlyGrid
+from pacai.core.layout import CONTENT_HASH_SIZE
+from pacai.core.statedelta import StateDelta
 from pacai.util import util
 
+# The format of `AbstractGameState.toBytes` (all little-endian):
+#  - header: magic, version, state type, layout content hash,
+#    gameover, win, score, last agent moved (-1 for none), number of agents, number of capsules
+#  - the state type's extra fields (see `AbstractGameState._BYTES_EXTRA`)
+#  - per agent: x, y, direction, is pacman, scared timer
+#  - per capsule: x, y
+#  - the food grid as a bitmap, cell (x, y) is bit (x * height + y)
+BYTES_MAGIC = b'PACS'
+BYTES_VERSION = 1
+BYTES_HEADER = struct.Struct('<4sBc%ds??qbBH' % (CONTENT_HASH_SIZE))
+BYTES_AGENT = struct.Struct('<ddB?H')
+BYTES_CAPSULE = struct.Struct('<HH')
+
+# Directions are stored as their index in this list.
+BYTES_DIRECTIONS = [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST,
+        Directions.STOP]
+
+def _asNumber(value):
+    """
+    Get an int for whole floats, so positions unpacked from bytes can index grids again.
+    """
+
+    if (value.is_integer()):
+        return int(value)
+
+    return value
+
 class AbstractGameState(abc.ABC):
     """
     A game state specifies the status of a game, including the food, capsules, agents, and score.
@@ -15,6 +46,59 @@ class AbstractGameState(abc.ABC):
     Only use the accessor methods to get data about the game state.
     """
 
+    # Search trees can hold a lot of states, so skip the per-instance dict.
+    # Children should declare their own fields in their own __slots__
+    # (and copy them in `AbstractGameState._copyFields`).
+    __slots__ = (
+        '_lastAgentMoved',
+        '_gameover',
+        '_win',
+        '_layout',
+        '_hash',
+        '_zobristTable',
+        '_zobristKey',
+        '_foodCopied',
+        '_food',
+        '_numFood',
+        '_lastFoodEaten',
+        '_capsulesCopied',
+        '_capsules',
+        '_lastCapsuleEaten',
+        '_highlightLocations',
+        '_agentStates',
+        '_copiedAgentStates',
+        '_score',
+        '_successorCache',
+    )
+
+    # A one byte tag for this type of state in `AbstractGameState.toBytes`.
+    _BYTES_TYPE = b'?'
+
+    # The format of the fields that children add in `AbstractGameState.toBytes`.
+    # Children with more fields should override this and `_getBytesFields`/`_setBytesFields`.
+    _BYTES_EXTRA = struct.Struct('<')
+
+    # The fields that a move may change.
+    # Saving and restoring these is enough to undo a move (see `AbstractGameState.undoMove`).
+    # Children that add more per-move fields should extend this.
+    _UNDO_FIELDS = (
+        '_agentStates',
+        '_copiedAgentStates',
+        '_food',
+        '_foodCopied',
+        '_numFood',
+        '_capsules',
+        '_capsulesCopied',
+        '_score',
+        '_gameover',
+        '_win',
+        '_lastAgentMoved',
+        '_lastFoodEaten',
+        '_lastCapsuleEaten',
+        '_hash',
+        '_zobristKey',
+    )
+
     def __init__(self, layout):
         self._lastAgentMoved = None
         self._gameover = False
@@ -26,13 +110,24 @@ class AbstractGameState(abc.ABC):
         # Any children should be sure to clear the hash when modifications are made.
         self._hash = None
 
+        # The food and capsules are hashed incrementally (see `pacai.core.zobrist`).
+        # Eating something XORs that item's key out of the running key,
+        # so hashing a state never has to look at the whole board.
+        self._zobristTable = zobrist.getTable(layout.width, layout.height)
+        self._zobristKey = self._zobristTable.hashBoard(layout.food, layout.capsules)
+
         # For food and capsules, we will only copy on write (if we eat one of them).
         # This avoid additional copies on successors that don't eat.
+        # Food is further shared column-by-column (see `pacai.core.grid.Grid.copyOnWrite`),
+        # so a successor that does eat only copies the column it ate from.
 
         self._foodCopied = False
         self._food = layout.food.copy()
         self._lastFoodEaten = None
 
+        # Keep a count of the food, so checking for an empty board does not need to scan it.
+        self._numFood = self._food.count()
+
         self._capsulesCopied = False
         self._capsules = layout.capsules.copy()
         self._lastCapsuleEaten = None
@@ -45,16 +140,85 @@ class AbstractGameState(abc.ABC):
         for (isPacman, position) in layout.agentPositions:
             self._agentStates.append(AgentState(position, Directions.STOP, isPacman))
 
+        # Agent states are also copied on write.
+        # Successors share agent states with their parent until a rule changes one
+        # (see `AbstractGameState.getMutableAgentState`).
+        # This is a bitmask of the agent states that this state owns (and can modify in place).
+        self._copiedAgentStates = (1 << len(self._agentStates)) - 1
+
         self._score = 0
 
-    @abc.abstractmethod
-    def generateSuccessor(self, agentIndex, action):
+        # An optional `pacai.util.lruCache.LRUCache` of successors (see `setSuccessorCache`).
+        self._successorCache = None
+
+    def generateSuccessor(self, agentIndex, action, useCache = True):
         """
         Returns the successor state after the specified agent takes the action.
         Treat the returned state as a SHALLOW copy that has been modified.
+
+        If this state has a successor cache and useCache is true,
+        then the successor may be a state that was already returned (for an equal state),
+        see `AbstractGameState._getCachedSuccessor`.
         """
 
-        pass
+        # Check that successors exist.
+        if (self.isOver()):
+            raise RuntimeError("Can't generate successors of a terminal state.")
+
+        cache = self._successorCache
+        if (not useCache or cache is None):
+            successor = self._initSuccessor()
+            successor._applySuccessorAction(agentIndex, action)
+            return successor
+
+        key = self._getSuccessorCacheKey(agentIndex, action)
+        successor = self._getCachedSuccessor(key)
+        if (successor is None):
+            successor = self._initSuccessor()
+            successor._applySuccessorAction(agentIndex, action)
+            cache.put(key, successor)
+
+        return successor
+
+    def generateAllSuccessors(self, agentIndex):
+        """
+        Get the successors for every legal action of the given agent,
+        as a list of (action, successor) pairs (in the same order as `getLegalActions`).
+
+        This is cheaper than calling `generateSuccessor` for each action,
+        since the legal actions are only computed once and the moves are not re-validated.
+        """
+
+        return list(self.iterSuccessors(agentIndex))
+
+    def iterSuccessors(self, agentIndex):
+        """
+        A lazy version of `AbstractGameState.generateAllSuccessors`.
+        Each successor is only generated when it is reached,
+        so searches that prune (e.g. alpha-beta) do not pay for children they never look at.
+        """
+
+        # Check that successors exist.
+        if (self.isOver()):
+            raise RuntimeError("Can't generate successors of a terminal state.")
+
+        cache = self._successorCache
+
+        for action in self.getLegalActions(agentIndex):
+            if (cache is None):
+                successor = self._initSuccessor()
+                successor._applySuccessorAction(agentIndex, action, validate = False)
+                yield (action, successor)
+                continue
+
+            key = self._getSuccessorCacheKey(agentIndex, action)
+            successor = self._getCachedSuccessor(key)
+            if (successor is None):
+                successor = self._initSuccessor()
+                successor._applySuccessorAction(agentIndex, action, validate = False)
+                cache.put(key, successor)
+
+            yield (action, successor)
 
     @abc.abstractmethod
     def getLegalActions(self, agentIndex = 0):
@@ -64,10 +228,66 @@ class AbstractGameState(abc.ABC):
 
         pass
 
+    def applyMove(self, agentIndex, action):
+        """
+        Apply the action to this state in place, instead of creating a successor.
+        Returns an undo record that can be passed to `AbstractGameState.undoMove`
+        to restore this state to exactly how it was before the move.
+
+        This lets a tree search walk (and back out of) moves on a single state.
+        Moves must be undone in the reverse order they were applied.
+        Any state or agent state that was retrieved before the move is not affected by it.
+
+        Don't apply moves to states that came from (or were passed through) a successor cache,
+        since other callers may be holding on to the same state.
+        """
+
+        # Check that successors exist.
+        if (self.isOver()):
+            raise RuntimeError("Can't apply a move to a terminal state.")
+
+        record = tuple(getattr(self, field) for field in self._UNDO_FIELDS)
+
+        # The record holds on to the current food, capsules, and agents.
+        # So, treat them the same as a successor would: copy them before writing.
+        self._foodCopied = False
+        self._capsulesCopied = False
+        self._agentStates = self._agentStates.copy()
+        self._copiedAgentStates = 0
+
+        self._applySuccessorAction(agentIndex, action)
+
+        return record
+
     def addScore(self, score):
         self._hash = None
         self._score += score
 
+    def deltaFrom(self, parent):
+        """
+        Get a `pacai.core.statedelta.StateDelta` that describes what changed from
+        the given parent to this state.
+        This is meant for a parent and its direct successor (one move apart),
+        where it only costs as much as the agents that changed.
+        States further apart work too, but eaten food then costs a full scan of the board.
+        """
+
+        foodEaten = []
+        numEaten = parent._numFood - self._numFood
+        if (numEaten == 1 and self._lastFoodEaten is not None):
+            foodEaten.append(self._lastFoodEaten)
+        elif (numEaten > 0):
+            foodEaten = sorted(set(parent._food.asList()) - set(self._food.asList()))
+
+        capsulesEaten = []
+        numEaten = len(parent._capsules) - len(self._capsules)
+        if (numEaten == 1 and self._lastCapsuleEaten is not None):
+            capsulesEaten.append(self._lastCapsuleEaten)
+        elif (numEaten > 0):
+            capsulesEaten = sorted(set(parent._capsules) - set(self._capsules))
+
+        return StateDelta(parent, self, foodEaten, capsulesEaten)
+
     def eatCapsule(self, x, y):
         """
         Mark the capsule at the given location as eaten.
@@ -82,6 +302,7 @@ class AbstractGameState(abc.ABC):
 
         self._capsules.remove((x, y))
         self._lastCapsuleEaten = (x, y)
+        self._zobristKey ^= self._zobristTable.capsuleKey(x, y)
 
         self._hash = None
         return True
@@ -95,11 +316,13 @@ class AbstractGameState(abc.ABC):
             return False
 
         if (not self._foodCopied):
-            self._food = self._food.copy()
+            self._food = self._food.copyOnWrite()
             self._foodCopied = True
 
-        self._food[x][y] = False
+        self._food.setCell(x, y, False)
+        self._numFood -= 1
         self._lastFoodEaten = (x, y)
+        self._zobristKey ^= self._zobristTable.foodKey(x, y)
 
         self._hash = None
         return True
@@ -110,6 +333,81 @@ class AbstractGameState(abc.ABC):
 
         self._hash = None
 
+    @classmethod
+    def fromBytes(cls, layout, data):
+        """
+        Rebuild a state that was packed with `AbstractGameState.toBytes`.
+        The layout must be the same one (by content) that the state was played on.
+
+        The rebuilt state is equal to the packed one,
+        but it does not remember the last food/capsule eaten or any highlights.
+        """
+
+        header = BYTES_HEADER.unpack_from(data, 0)
+        (magic, version, stateType, layoutHash, gameover, win, score, lastAgentMoved,
+            numAgents, numCapsules) = header
+        offset = BYTES_HEADER.size
+
+        if (magic != BYTES_MAGIC or version != BYTES_VERSION):
+            raise ValueError('Data is not a packed game state (version %d).' % (BYTES_VERSION))
+
+        if (stateType != cls._BYTES_TYPE):
+            raise ValueError("Data is for a different type of game state ('%s')." % (stateType))
+
+        if (layoutHash != layout.getContentHash()):
+            raise ValueError('Data is for a different layout.')
+
+        if (numAgents != len(layout.agentPositions)):
+            raise ValueError('Data has %d agents, but the layout has %d.'
+                    % (numAgents, len(layout.agentPositions)))
+
+        # Start from the initial state of the layout (without running any child constructors).
+        state = cls.__new__(cls)
+        AbstractGameState.__init__(state, layout)
+
+        state._gameover = gameover
+        state._win = win
+        state._score = score
+        if (lastAgentMoved >= 0):
+            state._lastAgentMoved = lastAgentMoved
+
+        extraFields = cls._BYTES_EXTRA.unpack_from(data, offset)
+        offset += cls._BYTES_EXTRA.size
+
+        for agentState in state._agentStates:
+            (x, y, direction, isPacman, scaredTimer) = BYTES_AGENT.unpack_from(data, offset)
+            offset += BYTES_AGENT.size
+
+            # Positions are usually whole numbers (and used as grid indexes).
+            agentState._position = (_asNumber(x), _asNumber(y))
+            agentState._direction = BYTES_DIRECTIONS[direction]
+            agentState._isPacman = isPacman
+            agentState._scaredTimer = scaredTimer
+
+        capsules = []
+        for i in range(numCapsules):
+            capsules.append(BYTES_CAPSULE.unpack_from(data, offset))
+            offset += BYTES_CAPSULE.size
+
+        bits = int.from_bytes(data[offset:], 'little')
+
+        # Food and capsules are never added, so just remove whatever has been eaten.
+        height = layout.height
+        for (x, y) in layout.food.asList():
+            if (not (bits >> (x * height + y)) & 1):
+                state._food.setCell(x, y, False)
+                state._numFood -= 1
+                state._zobristKey ^= state._zobristTable.foodKey(x, y)
+
+        for (x, y) in layout.capsules:
+            if ((x, y) not in capsules):
+                state._capsules.remove((x, y))
+                state._zobristKey ^= state._zobristTable.capsuleKey(x, y)
+
+        state._setBytesFields(extraFields)
+
+        return state
+
     def getAgentPosition(self, index):
         """
         Returns a location tuple of the agent with the given index.
@@ -125,6 +423,11 @@ class AbstractGameState(abc.ABC):
         return tuple(int(pos) for pos in position)
 
     def getAgentState(self, index):
+        """
+        Get the state of an agent.
+        Agent states may be shared with other game states, so the caller should not modify it.
+        """
+
         return self._agentStates[index]
 
     def getAgentStates(self):
@@ -144,10 +447,11 @@ class AbstractGameState(abc.ABC):
         Grids can be accessed via list notation.
         So to check if there is food at (x, y), just do something like: food[x][y].
 
-        Callers should favor hasFood() over this, since this will make a copy of the grid.
+        The grid is a read-only view (see `pacai.core.grid.ReadOnlyGrid`), so it is cheap to get.
+        Call copy() on it to get a grid that can be modified.
         """
 
-        return self._food.copy()
+        return ReadOnlyGrid(self._food)
 
     def getHighlightLocations(self):
         return self._highlightLocations
@@ -173,6 +477,21 @@ class AbstractGameState(abc.ABC):
     def getLastFoodEaten(self):
         return self._lastFoodEaten
 
+    def getMutableAgentState(self, index):
+        """
+        Get the state of an agent that the caller is allowed to modify.
+        Agent states are shared between a state and its successors until a rule changes one,
+        so rules should use this (instead of `AbstractGameState.getAgentState`)
+        to get an agent state they are about to change.
+        """
+
+        if (not (self._copiedAgentStates >> index) & 1):
+            self._agentStates[index] = self._agentStates[index].copy()
+            self._copiedAgentStates |= (1 << index)
+            self._hash = None
+
+        return self._agentStates[index]
+
     def getNumAgents(self):
         return len(self._agentStates)
 
@@ -188,11 +507,14 @@ class AbstractGameState(abc.ABC):
         Get the amount of food left on the board.
         """
 
-        return self._food.count()
+        return self._numFood
 
     def getScore(self):
         return self._score
 
+    def getSuccessorCache(self):
+        return self._successorCache
+
     def getWalls(self):
         """
         Returns a Grid of boolean wall indicator variables.
@@ -217,7 +539,7 @@ class AbstractGameState(abc.ABC):
         Returns true if the location (x, y) has food.
         """
 
-        return self._food[x][y]
+        return self._food.getCell(x, y)
 
     def hasWall(self, x, y):
         """
@@ -242,6 +564,148 @@ class AbstractGameState(abc.ABC):
         self._score = score
         self._hash = None
 
+    def setSuccessorCache(self, cache):
+        """
+        Have this state (and all the states generated from it) look up successors in
+        the given `pacai.util.lruCache.LRUCache` (or None to turn caching off).
+
+        Searches often reach the same state along different paths (e.g. ghosts walking in a loop),
+        so caching lets them skip regenerating its successors.
+        States are only treated as the same if they are equal (see `AbstractGameState.__eq__`).
+        """
+
+        self._successorCache = cache
+
+    def toBytes(self):
+        """
+        Pack this state into a compact bytes representation
+        (see the format at the top of this file).
+        The layout is not included, only a digest of it (see `pacai.core.layout.Layout`).
+        Use `AbstractGameState.fromBytes` (with the same layout) to get the state back.
+        """
+
+        lastAgentMoved = self._lastAgentMoved
+        if (lastAgentMoved is None):
+            lastAgentMoved = -1
+
+        parts = [
+            BYTES_HEADER.pack(BYTES_MAGIC, BYTES_VERSION, self._BYTES_TYPE,
+                self._layout.getContentHash(), self._gameover, self._win, self._score,
+                lastAgentMoved, len(self._agentStates), len(self._capsules)),
+            self._BYTES_EXTRA.pack(*self._getBytesFields()),
+        ]
+
+        for agentState in self._agentStates:
+            (x, y) = agentState.getPosition()
+            parts.append(BYTES_AGENT.pack(x, y,
+                BYTES_DIRECTIONS.index(agentState.getDirection()),
+                agentState.isPacman(), agentState.getScaredTimer()))
+
+        for (x, y) in self._capsules:
+            parts.append(BYTES_CAPSULE.pack(x, y))
+
+        numCells = self._food.getWidth() * self._food.getHeight()
+        parts.append(self._food.asBits().to_bytes((numCells + 7) // 8, 'little'))
+
+        return b''.join(parts)
+
+    def undoMove(self, record):
+        """
+        Undo a move made with `AbstractGameState.applyMove`.
+        """
+
+        for (field, value) in zip(self._UNDO_FIELDS, record):
+            setattr(self, field, value)
+
+    @abc.abstractmethod
+    def _applySuccessorAction(self, agentIndex, action, validate = True):
+        """
+        Apply the action to the context state (self).
+        If validate is false, then the action is already known to be legal.
+        """
+
+        pass
+
+    def _copyFields(self, other):
+        """
+        Shallow copy all of this state's fields into another state.
+        Children that declare their own fields must extend this.
+
+        Fields are assigned one by one (instead of a generic copy)
+        because this is the hottest part of generating a successor.
+        """
+
+        other._lastAgentMoved = self._lastAgentMoved
+        other._gameover = self._gameover
+        other._win = self._win
+        other._layout = self._layout
+        other._hash = self._hash
+        other._zobristTable = self._zobristTable
+        other._zobristKey = self._zobristKey
+        other._foodCopied = self._foodCopied
+        other._food = self._food
+        other._numFood = self._numFood
+        other._lastFoodEaten = self._lastFoodEaten
+        other._capsulesCopied = self._capsulesCopied
+        other._capsules = self._capsules
+        other._lastCapsuleEaten = self._lastCapsuleEaten
+        other._highlightLocations = self._highlightLocations
+        other._agentStates = self._agentStates
+        other._copiedAgentStates = self._copiedAgentStates
+        other._score = self._score
+        other._successorCache = self._successorCache
+
+    def _getBytesFields(self):
+        """
+        Get the values of the fields in `_BYTES_EXTRA`.
+        """
+
+        return ()
+
+    def _getCachedSuccessor(self, key):
+        """
+        Get a successor of this state from the successor cache (or None).
+
+        The cached successor may have been generated from a different (but equal) state,
+        and the last food/capsule eaten are not part of equality.
+        A move that did not eat keeps its parent's last eaten food/capsule,
+        so if those do not match this state's, a shallow copy with this state's is returned.
+        (Food and capsules are only ever removed, so a move ate iff their count changed.)
+        """
+
+        successor = self._successorCache.get(key)
+        if (successor is None):
+            return None
+
+        lastFoodEaten = successor._lastFoodEaten
+        if (successor._numFood == self._numFood):
+            lastFoodEaten = self._lastFoodEaten
+
+        lastCapsuleEaten = successor._lastCapsuleEaten
+        if (len(successor._capsules) == len(self._capsules)):
+            lastCapsuleEaten = self._lastCapsuleEaten
+
+        if (lastFoodEaten == successor._lastFoodEaten
+                and lastCapsuleEaten == successor._lastCapsuleEaten):
+            return successor
+
+        # The last eaten fields are not part of the hash, so it can be kept.
+        hash = successor._hash
+        successor = successor._initSuccessor()
+        successor._hash = hash
+        successor._lastFoodEaten = lastFoodEaten
+        successor._lastCapsuleEaten = lastCapsuleEaten
+
+        return successor
+
+    def _getSuccessorCacheKey(self, agentIndex, action):
+        """
+        Get the key to look up a successor in the successor cache.
+        Children with fields that change successors but not equality should extend this.
+        """
+
+        return (self, agentIndex, action)
+
     def _initSuccessor(self):
         """
         Get a state that will eventually serve as a successor.
@@ -249,18 +713,28 @@ class AbstractGameState(abc.ABC):
         """
 
         # Start with a shallow copy.
-        successor = copy.copy(self)
+        successor = self.__class__.__new__(self.__class__)
+        self._copyFields(successor)
+
         successor._hash = None
 
         # Leave food and capsules as a shallow copy, but mark them to be copied on write.
         successor._foodCopied = False
         successor._capsulesCopied = False
 
-        # Agent states need to be deep copied.
-        successor._agentStates = [agentState.copy() for agentState in self._agentStates]
+        # Agent states are shared until a rule modifies them.
+        successor._agentStates = self._agentStates.copy()
+        successor._copiedAgentStates = 0
 
         return successor
 
+    def _setBytesFields(self, fields):
+        """
+        Set the fields in `_BYTES_EXTRA` on a state being rebuilt by `fromBytes`.
+        """
+
+        pass
+
     def __eq__(self, other):
         if (other is None):
             return False
@@ -272,6 +746,10 @@ class AbstractGameState(abc.ABC):
         if (type(self) != type(other)):
             return False
 
+        # Hashes are cheap (and usually cached), so use them to rule out most states.
+        if (hash(self) != hash(other)):
+            return False
+
         # Note that not all fields are being used because we are checking if two states are equal,
         # not is they got to this confiruation in the same way.
 
@@ -289,7 +767,7 @@ class AbstractGameState(abc.ABC):
 
     def __hash__(self):
         if (self._hash is None):
-            self._hash = util.buildHash(self._score, self._gameover, self._win, *self._capsules,
-                self._food, *self._agentStates, self._layout)
+            self._hash = util.buildHash(self._score, self._gameover, self._win,
+                self._zobristKey, *self._agentStates, self._layout)
 
         return self._hash
@@ -1,3 +1,5 @@
+import sys
+
 class Grid:
     """
     A 2-dimensional array of objects backed by a list of lists.
@@ -13,6 +15,26 @@ class Grid:
         self._height = height
         self._data = [[initialValue for y in range(height)] for x in range(width)]
 
+        # The columns this grid may write to in place.
+        # None means that all columns are owned (no copy-on-write sharing is happening).
+        self._ownedColumns = None
+
+    def asBits(self):
+        """
+        Pack this grid into an int, where cell (x, y) is bit (x * height + y).
+        """
+
+        bits = 0
+        base = 1
+
+        for row in self._data:
+            for value in row:
+                if (value):
+                    bits += base
+                base *= 2
+
+        return bits
+
     def asList(self, key = True):
         values = []
 
@@ -24,8 +46,52 @@ class Grid:
         return values
 
     def copy(self):
-        grid = Grid(self._width, self._height)
+        grid = Grid.__new__(Grid)
+        grid._width = self._width
+        grid._height = self._height
         grid._data = [row.copy() for row in self._data]
+        grid._ownedColumns = None
+        return grid
+
+    def copyColumns(self, start, end):
+        """
+        Get a copy of this grid that only keeps the cells in columns [start, end),
+        every other cell is False.
+        """
+
+        grid = Grid.__new__(Grid)
+        grid._width = self._width
+        grid._height = self._height
+        grid._data = []
+        grid._ownedColumns = None
+
+        for x in range(self._width):
+            if (start <= x < end):
+                grid._data.append(self._data[x].copy())
+            else:
+                grid._data.append([False] * self._height)
+
+        return grid
+
+    def copyOnWrite(self):
+        """
+        Get a copy of this grid that shares all of its columns with this grid.
+        A column is only copied when one of the grids writes to it through `Grid.setCell`,
+        so a copy that changes a single cell only pays for a single column.
+
+        While columns are shared, writes must go through `Grid.setCell`
+        (writing through grid[x][y] would be seen by both grids).
+        """
+
+        grid = Grid.__new__(Grid)
+        grid._width = self._width
+        grid._height = self._height
+        grid._data = list(self._data)
+
+        # Neither grid owns any of the columns anymore.
+        grid._ownedColumns = set()
+        self._ownedColumns = set()
+
         return grid
 
     def count(self, item =True):
@@ -34,6 +100,9 @@ class Grid:
     def deepCopy(self):
         return self.copy()
 
+    def getCell(self, x, y):
+        return self._data[x][y]
+
     def getHeight(self):
         return self._height
 
@@ -41,16 +110,38 @@ class Grid:
         return self._width
 
     def shallowCopy(self):
-        grid = Grid(self._width, self._height)
+        grid = Grid.__new__(Grid)
+        grid._width = self._width
+        grid._height = self._height
         grid._data = self._data
+        grid._ownedColumns = self._ownedColumns
         return grid
 
+    def setCell(self, x, y, value):
+        """
+        Set a single cell, copying its column first if it is shared with another grid.
+        """
+
+        if (self._ownedColumns is not None and x not in self._ownedColumns):
+            self._data[x] = self._data[x].copy()
+            self._ownedColumns.add(x)
+
+        self._data[x][y] = value
+
     def _cellIndexToPosition(self, index):
         x = index / self._height
         y = index % self._height
 
         return x, y
 
+    def __contains__(self, position):
+        """
+        Check if the cell at an (x, y) position is True.
+        """
+
+        (x, y) = position
+        return self.getCell(x, y)
+
     def __eq__(self, other):
         if (other is None):
             return False
@@ -61,16 +152,7 @@ class Grid:
         return self._data[i]
 
     def __hash__(self):
-        hashcode = 0
-        base = 1
-
-        for row in self._data:
-            for value in row:
-                if (value):
-                    hashcode += base
-                base *= 2
-
-        return hash(hashcode)
+        return hash(self.asBits())
 
     def __lt__(self, other):
         return self.__hash__() < other.__hash__()
@@ -78,7 +160,586 @@ class Grid:
     def __setitem__(self, key, item):
         self._data[key] = item
 
+        if (self._ownedColumns is not None):
+            self._ownedColumns.add(key % self._width)
+
     def __str__(self):
         out = [[str(self._data[x][y])[0] for x in range(self._width)] for y in range(self._height)]
         out.reverse()
         return '\n'.join([''.join(x) for x in out])
+
+# Python hashes non-negative ints as (value mod HASH_MODULUS),
+# and 2 ** HASH_PERIOD == 1 under that modulus.
+# This lets BitGrid keep its hash up-to-date one bit at a time.
+HASH_MODULUS = sys.hash_info.modulus
+HASH_PERIOD = HASH_MODULUS.bit_length()
+
+class BitGrid(Grid):
+    """
+    A drop-in replacement for `Grid` that packs all of its booleans into the bits of a single int.
+    Cell (x, y) is stored in bit (x * height + y), the same packing `Grid.__hash__` uses,
+    so a BitGrid hashes the same as the equivalent `Grid`.
+
+    Since ints are immutable, copies share storage and cost O(1).
+    The hash is maintained on every write, so hashing is O(1)
+    and equality checks can bail out on a hash mismatch.
+    """
+
+    def __init__(self, width, height, initialValue = False):
+        if (not isinstance(initialValue, bool)):
+            raise ValueError('Grids can only contain booleans')
+
+        self._width = width
+        self._height = height
+
+        self._bits = 0
+        if (initialValue):
+            self._bits = (1 << (width * height)) - 1
+
+        self._hash = hash(self._bits)
+
+        # Column views are built on demand.
+        self._columns = None
+
+    # Override
+    def asBits(self):
+        return self._bits
+
+    # Override
+    def asList(self, key = True):
+        bits = self._bits
+        if (not key):
+            bits = ~bits & ((1 << (self._width * self._height)) - 1)
+
+        values = []
+        while (bits):
+            lowBit = bits & -bits
+            values.append(divmod(lowBit.bit_length() - 1, self._height))
+            bits ^= lowBit
+
+        return values
+
+    # Override
+    def copy(self):
+        grid = BitGrid.__new__(BitGrid)
+
+        grid._width = self._width
+        grid._height = self._height
+        grid._bits = self._bits
+        grid._hash = self._hash
+        grid._columns = None
+
+        return grid
+
+    # Override
+    def copyColumns(self, start, end):
+        start = max(0, start)
+        end = min(self._width, end)
+
+        grid = self.copy()
+        grid._bits = 0
+        if (start < end):
+            mask = ((1 << ((end - start) * self._height)) - 1) << (start * self._height)
+            grid._bits = self._bits & mask
+
+        grid._hash = hash(grid._bits)
+
+        return grid
+
+    # Override
+    def copyOnWrite(self):
+        """
+        The bits are immutable, so every copy is already copy-on-write.
+        """
+
+        return self.copy()
+
+    # Override
+    def count(self, item = True):
+        setCount = bin(self._bits).count('1')
+
+        if (item):
+            return setCount
+
+        return self._width * self._height - setCount
+
+    # Override
+    def shallowCopy(self):
+        """
+        The bits are immutable, so there is no storage to share beyond what copy() shares.
+        """
+
+        return self.copy()
+
+    def getCell(self, x, y):
+        return ((self._bits >> (x * self._height + y)) & 1) == 1
+
+    def setCell(self, x, y, value):
+        index = x * self._height + y
+        bit = 1 << index
+        isSet = (self._bits & bit) != 0
+
+        if (value == isSet):
+            return
+
+        delta = 1 << (index % HASH_PERIOD)
+        if (value):
+            self._bits |= bit
+            self._hash = (self._hash + delta) % HASH_MODULUS
+        else:
+            self._bits &= ~bit
+            self._hash = (self._hash - delta) % HASH_MODULUS
+
+    def _checkIndex(self, index, size):
+        if (index < 0):
+            index += size
+
+        if (index < 0 or index >= size):
+            raise IndexError('Grid index out of range: %d' % (index))
+
+        return index
+
+    # Override
+    def __eq__(self, other):
+        if (other is None):
+            return False
+
+        if (not isinstance(other, Grid)):
+            return NotImplemented
+
+        if (self._width != other._width or self._height != other._height):
+            return False
+
+        if (self._hash != hash(other)):
+            return False
+
+        return self._bits == other.asBits()
+
+    # Override
+    def __getitem__(self, x):
+        x = self._checkIndex(x, self._width)
+
+        if (self._columns is None):
+            self._columns = [_BitGridColumn(self, i) for i in range(self._width)]
+
+        return self._columns[x]
+
+    # Override
+    def __hash__(self):
+        return self._hash
+
+    # Override
+    def __setitem__(self, x, column):
+        x = self._checkIndex(x, self._width)
+
+        if (len(column) != self._height):
+            raise ValueError('Grid columns must have a length of %d.' % (self._height))
+
+        for y in range(self._height):
+            self.setCell(x, y, bool(column[y]))
+
+    # Override
+    def __str__(self):
+        out = [[str(self.getCell(x, y))[0] for x in range(self._width)]
+            for y in range(self._height)]
+        out.reverse()
+        return '\n'.join([''.join(x) for x in out])
+
+class _BitGridColumn(object):
+    """
+    A view of a single column in a BitGrid, so that grid[x][y] indexing keeps working.
+    """
+
+    def __init__(self, grid, x):
+        self._grid = grid
+        self._x = x
+
+    def count(self, item = True):
+        return [self[y] for y in range(len(self))].count(item)
+
+    def __getitem__(self, y):
+        y = self._grid._checkIndex(y, self._grid._height)
+        return self._grid.getCell(self._x, y)
+
+    def __iter__(self):
+        for y in range(self._grid._height):
+            yield self._grid.getCell(self._x, y)
+
+    def __len__(self):
+        return self._grid._height
+
+    def __setitem__(self, y, value):
+        if (not isinstance(value, bool)):
+            raise ValueError('Grids can only contain booleans')
+
+        y = self._grid._checkIndex(y, self._grid._height)
+        self._grid.setCell(self._x, y, value)
+
+class SparseGrid(Grid):
+    """
+    A drop-in replacement for `Grid` that only stores the positions that are True,
+    as one set of y values per column.
+    This suits grids that are mostly False, like the food late in a game:
+    `SparseGrid.asList` is O(number of True cells), and `SparseGrid.count` and membership are O(1).
+
+    Like `Grid`, columns can be shared copy-on-write (see `Grid.copyOnWrite`).
+    Like `BitGrid`, the hash is maintained on every write and matches the equivalent `Grid`.
+    """
+
+    def __init__(self, width, height, initialValue = False):
+        if (not isinstance(initialValue, bool)):
+            raise ValueError('Grids can only contain booleans')
+
+        self._width = width
+        self._height = height
+
+        if (initialValue):
+            self._columns = [set(range(height)) for x in range(width)]
+            self._count = width * height
+        else:
+            self._columns = [set() for x in range(width)]
+            self._count = 0
+
+        self._ownedColumns = None
+        self._hash = hash(self.asBits())
+
+        # Column views are built on demand.
+        self._views = None
+
+    # Override
+    def asBits(self):
+        bits = 0
+        for x in range(self._width):
+            for y in self._columns[x]:
+                bits |= 1 << (x * self._height + y)
+
+        return bits
+
+    # Override
+    def asList(self, key = True):
+        if (not key):
+            return super().asList(key)
+
+        values = []
+        for x in range(self._width):
+            for y in sorted(self._columns[x]):
+                values.append((x, y))
+
+        return values
+
+    # Override
+    def copy(self):
+        grid = self._copyInfo()
+        grid._columns = [column.copy() for column in self._columns]
+        grid._ownedColumns = None
+
+        return grid
+
+    # Override
+    def copyColumns(self, start, end):
+        grid = self._copyInfo()
+        grid._columns = []
+        grid._ownedColumns = None
+        grid._count = 0
+
+        for x in range(self._width):
+            if (start <= x < end):
+                grid._columns.append(self._columns[x].copy())
+                grid._count += len(self._columns[x])
+            else:
+                grid._columns.append(set())
+
+        grid._hash = hash(grid.asBits())
+
+        return grid
+
+    # Override
+    def copyOnWrite(self):
+        grid = self._copyInfo()
+        grid._columns = list(self._columns)
+
+        grid._ownedColumns = set()
+        self._ownedColumns = set()
+
+        return grid
+
+    # Override
+    def count(self, item = True):
+        if (item):
+            return self._count
+
+        return self._width * self._height - self._count
+
+    # Override
+    def getCell(self, x, y):
+        return y in self._columns[x]
+
+    # Override
+    def shallowCopy(self):
+        grid = self._copyInfo()
+        grid._columns = self._columns
+        grid._ownedColumns = self._ownedColumns
+
+        return grid
+
+    # Override
+    def setCell(self, x, y, value):
+        column = self._columns[x]
+        if (value == (y in column)):
+            return
+
+        if (self._ownedColumns is not None and x not in self._ownedColumns):
+            column = column.copy()
+            self._columns[x] = column
+            self._ownedColumns.add(x)
+
+        delta = 1 << ((x * self._height + y) % HASH_PERIOD)
+        if (value):
+            column.add(y)
+            self._count += 1
+            self._hash = (self._hash + delta) % HASH_MODULUS
+        else:
+            column.remove(y)
+            self._count -= 1
+            self._hash = (self._hash - delta) % HASH_MODULUS
+
+    def _copyInfo(self):
+        """
+        Get a new grid with everything but the columns copied from this one.
+        """
+
+        grid = SparseGrid.__new__(SparseGrid)
+        grid._width = self._width
+        grid._height = self._height
+        grid._count = self._count
+        grid._hash = self._hash
+        grid._views = None
+
+        return grid
+
+    # Override
+    def __contains__(self, position):
+        (x, y) = position
+        return y in self._columns[x]
+
+    # Override
+    def __eq__(self, other):
+        if (other is None):
+            return False
+
+        if (not isinstance(other, Grid)):
+            return NotImplemented
+
+        if (self._width != other.getWidth() or self._height != other.getHeight()):
+            return False
+
+        if (self._hash != hash(other)):
+            return False
+
+        if (isinstance(other, SparseGrid)):
+            return self._columns == other._columns
+
+        return self.asBits() == other.asBits()
+
+    # Override
+    def __getitem__(self, x):
+        if (self._views is None):
+            self._views = [_SparseGridColumn(self, i) for i in range(self._width)]
+
+        return self._views[x]
+
+    # Override
+    def __hash__(self):
+        return self._hash
+
+    # Override
+    def __setitem__(self, x, column):
+        if (len(column) != self._height):
+            raise ValueError('Grid columns must have a length of %d.' % (self._height))
+
+        if (x < 0):
+            x += self._width
+
+        for y in range(self._height):
+            self.setCell(x, y, bool(column[y]))
+
+    # Override
+    def __str__(self):
+        out = [[str(self.getCell(x, y))[0] for x in range(self._width)]
+            for y in range(self._height)]
+        out.reverse()
+        return '\n'.join([''.join(x) for x in out])
+
+class _SparseGridColumn(object):
+    """
+    A view of a single column in a SparseGrid, so that grid[x][y] indexing keeps working.
+    """
+
+    def __init__(self, grid, x):
+        self._grid = grid
+        self._x = x
+
+    def count(self, item = True):
+        return list(self).count(item)
+
+    def __getitem__(self, y):
+        if (y < 0):
+            y += self._grid._height
+
+        if (y < 0 or y >= self._grid._height):
+            raise IndexError('Grid index out of range: %d' % (y))
+
+        return y in self._grid._columns[self._x]
+
+    def __iter__(self):
+        column = self._grid._columns[self._x]
+        for y in range(self._grid._height):
+            yield y in column
+
+    def __len__(self):
+        return self._grid._height
+
+    def __setitem__(self, y, value):
+        if (not isinstance(value, bool)):
+            raise ValueError('Grids can only contain booleans')
+
+        if (y < 0):
+            y += self._grid._height
+
+        self._grid.setCell(self._x, y, value)
+
+class ReadOnlyGrid(Grid):
+    """
+    A read-only view of another grid.
+    The view shares storage with the grid it wraps (so it costs O(1) to make),
+    and any attempt to modify it raises a TypeError.
+    Use `ReadOnlyGrid.copy` to get a mutable copy.
+
+    Game states hand these out for their food,
+    since they never modify a grid after it has been shared with another state.
+
+    Nothing is copied: view[x] is a read-only proxy over the wrapped grid's live column.
+    For a plain `Grid`, the proxy indexes the grid's list of columns directly,
+    so view[x][y] only costs one more Python call than grid[x][y].
+    """
+
+    def __init__(self, grid):
+        self._grid = grid
+        self._width = grid.getWidth()
+        self._height = grid.getHeight()
+
+        # Where column views get their (live) columns from.
+        # Plain grids skip their own __getitem__ and go straight to their list of columns.
+        self._columnSource = grid
+        if (type(grid) is Grid):
+            self._columnSource = grid._data
+
+        # Column views are built on demand.
+        self._columns = None
+
+    # Override
+    def asBits(self):
+        return self._grid.asBits()
+
+    # Override
+    def asList(self, key = True):
+        return self._grid.asList(key)
+
+    # Override
+    def copy(self):
+        """
+        Get a mutable copy of the wrapped grid.
+        """
+
+        return self._grid.copy()
+
+    # Override
+    def copyColumns(self, start, end):
+        return self._grid.copyColumns(start, end)
+
+    # Override
+    def copyOnWrite(self):
+        return self._grid.copyOnWrite()
+
+    # Override
+    def count(self, item = True):
+        return self._grid.count(item)
+
+    # Override
+    def deepCopy(self):
+        return self._grid.copy()
+
+    # Override
+    def getCell(self, x, y):
+        return self._grid.getCell(x, y)
+
+    # Override
+    def shallowCopy(self):
+        """
+        A shallow copy would share (mutable) storage, so this is just a full copy.
+        """
+
+        return self._grid.copy()
+
+    # Override
+    def setCell(self, x, y, value):
+        raise TypeError('Read-only grids cannot be modified, make a copy() first.')
+
+    # Override
+    def __eq__(self, other):
+        if (isinstance(other, ReadOnlyGrid)):
+            other = other._grid
+
+        return self._grid == other
+
+    # Override
+    def __getitem__(self, x):
+        if (self._columns is None):
+            self._columns = [None] * self._width
+
+        column = self._columns[x]
+        if (column is None):
+            column = _ReadOnlyGridColumn(self._columnSource, x % self._width)
+            self._columns[x] = column
+
+        return column
+
+    # Override
+    def __hash__(self):
+        return hash(self._grid)
+
+    # Override
+    def __setitem__(self, x, column):
+        raise TypeError('Read-only grids cannot be modified, make a copy() first.')
+
+    # Override
+    def __str__(self):
+        return str(self._grid)
+
+class _ReadOnlyGridColumn(object):
+    """
+    A read-only view of a single (live) column in a grid.
+    `columnSource` is anything that gives column x when indexed (a grid or its list of columns).
+    """
+
+    # Slots make the attribute lookups on every read a little cheaper.
+    __slots__ = ('_columnSource', '_x')
+
+    def __init__(self, columnSource, x):
+        self._columnSource = columnSource
+        self._x = x
+
+    def count(self, item = True):
+        return self._columnSource[self._x].count(item)
+
+    def __getitem__(self, y):
+        return self._columnSource[self._x][y]
+
+    def __iter__(self):
+        return iter(self._columnSource[self._x])
+
+    def __len__(self):
+        return len(self._columnSource[self._x])
+
+    def __setitem__(self, y, value):
+        raise TypeError('Read-only grids cannot be modified, make a copy() first.')
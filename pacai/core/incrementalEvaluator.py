@@ -0,0 +1,91 @@
+"""
+A framework for evaluation functions that update features from a parent's features,
+instead of recomputing them from scratch for every successor.
+"""
+
+import abc
+
+from pacai.util.lruCache import LRUCache
+
+DEFAULT_CACHE_SIZE = 10000
+
+class IncrementalEvaluator(abc.ABC):
+    """
+    Evaluates states as a linear combination of features and weights (like the reflex agents),
+    but keeps the features of recently evaluated states around.
+    When a state's parent has already been evaluated,
+    the parent's features are updated using `pacai.core.gamestate.AbstractGameState.deltaFrom`
+    (see `IncrementalEvaluator.updateFeatures`).
+
+    Features are cached by state equality (see `pacai.core.gamestate.AbstractGameState.__eq__`),
+    so they should only depend on what makes states equal.
+    """
+
+    def __init__(self, cacheSize = DEFAULT_CACHE_SIZE):
+        self._cache = LRUCache(cacheSize)
+
+    @abc.abstractmethod
+    def computeFeatures(self, state):
+        """
+        Compute the features (a dict) for a state from scratch.
+        """
+
+        pass
+
+    @abc.abstractmethod
+    def getWeights(self):
+        """
+        Returns a dict of weights.
+        The keys match up with the features.
+        """
+
+        pass
+
+    def evaluate(self, state, parent = None):
+        """
+        Computes a linear combination of the state's features and the weights.
+        If a parent is given, then its features may be used to get this state's features.
+        """
+
+        features = self.getFeatures(state, parent)
+        weights = self.getWeights()
+
+        return sum(features[feature] * weights.get(feature, 0) for feature in features)
+
+    def getCache(self):
+        return self._cache
+
+    def getFeatures(self, state, parent = None):
+        """
+        Get the features for a state, using the cache or the parent's features when possible.
+        The returned dict is shared with the cache and should not be modified.
+        """
+
+        features = self._cache.get(state)
+        if (features is not None):
+            return features
+
+        parentFeatures = None
+        if (parent is not None):
+            parentFeatures = self._cache.get(parent)
+
+        if (parentFeatures is None):
+            features = self.computeFeatures(state)
+        else:
+            features = self.updateFeatures(dict(parentFeatures), state.deltaFrom(parent), state)
+
+        self._cache.put(state, features)
+        return features
+
+    def updateFeatures(self, features, delta, state):
+        """
+        Update a copy of the parent's features (which is free to modify and return)
+        using a `pacai.core.statedelta.StateDelta` to get the features for the given state.
+
+        By default, this just computes the features from scratch.
+        Children should override this for the features they can update cheaply,
+        and can fall back to `IncrementalEvaluator.computeFeatures` for deltas they can't handle
+        (e.g. respawns).
+        """
+
+        return self.computeFeatures(state)
@@ -1,3 +1,4 @@
+import hashlib
 import os
 import random
 
@@ -9,23 +10,43 @@ DEFAULT_LAYOUT_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), '
 
 GHOST_NUMS = ['1', '2', '3', '4']
 
+# The size (in bytes) of `Layout.getContentHash`.
+CONTENT_HASH_SIZE = 16
+
 class Layout(object):
     """
     A Layout manages the static information about the game board.
+
+    The grid classes used for the walls and food can be chosen,
+    e.g. `pacai.core.grid.BitGrid` for cheap hashing and copying,
+    or `pacai.core.grid.SparseGrid` for food that is listed and counted often.
     """
 
-    def __init__(self, layoutText, maxGhosts = None):
+    def __init__(self, layoutText, maxGhosts = None, wallGridClass = Grid, foodGridClass = Grid):
         self.width = len(layoutText[0])
         self.height = len(layoutText)
-        self.walls = Grid(self.width, self.height, initialValue = False)
-        self.food = Grid(self.width, self.height, initialValue = False)
+        self.walls = wallGridClass(self.width, self.height, initialValue = False)
+        self.food = foodGridClass(self.width, self.height, initialValue = False)
         self.capsules = []
         self.agentPositions = []
         self.numGhosts = 0
         self.layoutText = layoutText
+        self._contentHash = None
 
         self.processLayoutText(layoutText, maxGhosts)
 
+    def getContentHash(self):
+        """
+        Get a digest (bytes) of this layout's text.
+        Layouts with the same text (and therefore the same board) have the same digest.
+        """
+
+        if (self._contentHash is None):
+            text = "\n".join(self.layoutText).encode('utf-8')
+            self._contentHash = hashlib.blake2b(text, digest_size = CONTENT_HASH_SIZE).digest()
+
+        return self._contentHash
+
     def getNumGhosts(self):
         return self.numGhosts
 
@@ -39,15 +60,21 @@ class Layout(object):
     def getWidth(self):
         return self.width
 
-    def getRandomLegalPosition(self):
-        x = random.choice(list(range(self.width)))
-        y = random.choice(list(range(self.height)))
+    def getRandomLegalPosition(self, rng = None):
+        if (rng is None):
+            rng = random
+
+        x = rng.choice(list(range(self.width)))
+        y = rng.choice(list(range(self.height)))
         while self.isWall((x, y)):
-            x = random.choice(list(range(self.width)))
-            y = random.choice(list(range(self.height)))
+            x = rng.choice(list(range(self.width)))
+            y = rng.choice(list(range(self.height)))
         return (x, y)
 
-    def getRandomCorner(self):
+    def getRandomCorner(self, rng = None):
+        if (rng is None):
+            rng = random
+
         poses = [
             (1, 1),
             (1, self.height - 2),
@@ -55,7 +82,7 @@ class Layout(object):
             (self.width - 2, self.height - 2)
         ]
 
-        return random.choice(poses)
+        return rng.choice(poses)
 
     def getFurthestCorner(self, pacPos):
         poses = [
@@ -76,7 +103,8 @@ class Layout(object):
         return "\n".join(self.layoutText)
 
     def deepCopy(self):
-        return Layout(self.layoutText[:])
+        return Layout(self.layoutText[:], wallGridClass = type(self.walls),
+                foodGridClass = type(self.food))
 
     def processLayoutText(self, layoutText, maxGhosts):
         """
@@ -118,7 +146,8 @@ class Layout(object):
             self.agentPositions.append((int(layoutChar), (x, y)))
             self.numGhosts += 1
 
-def getLayout(name, layout_dir = DEFAULT_LAYOUT_DIR, maxGhosts = None):
+def getLayout(name, layout_dir = DEFAULT_LAYOUT_DIR, maxGhosts = None,
+        wallGridClass = Grid, foodGridClass = Grid):
     if (not name.endswith('.lay')):
         name += '.lay'
 
@@ -133,4 +162,4 @@ def getLayout(name, layout_dir = DEFAULT_LAYOUT_DIR, maxGhosts = None):
             if (line != ''):
                 rows.append(line)
 
-    return Layout(rows, maxGhosts)
+    return Layout(rows, maxGhosts, wallGridClass = wallGridClass, foodGridClass = foodGridClass)
@@ -0,0 +1,68 @@
+"""
+Descriptions of what changed between a game state and one of its successors.
+"""
+
+from pacai.core.distance import manhattan
+
+class StateDelta(object):
+    """
+    The difference between a parent state and a state generated from it
+    (see `pacai.core.gamestate.AbstractGameState.deltaFrom`).
+
+    All positions are (x, y) tuples and all agents are referenced by index:
+     - agentIndex: the agent that moved last (None if no agent has moved).
+     - oldPosition / newPosition: that agent's position in the parent / this state.
+     - foodEaten: the positions of food that were eaten (usually zero or one).
+     - capsulesEaten: the positions of capsules that were eaten (usually zero or one).
+     - scoreChange: how much the score changed.
+     - respawned: the agents that were killed and sent back to their start.
+     - scaredTimers: {agentIndex: (oldTimer, newTimer), ...} for agents whose timer changed.
+     - changedAgents: all the agents whose state changed in any way.
+    """
+
+    def __init__(self, parent, state, foodEaten, capsulesEaten):
+        self.agentIndex = state.getLastAgentMoved()
+        self.oldPosition = None
+        self.newPosition = None
+
+        if (self.agentIndex is not None):
+            self.oldPosition = parent.getAgentPosition(self.agentIndex)
+            self.newPosition = state.getAgentPosition(self.agentIndex)
+
+        self.foodEaten = foodEaten
+        self.capsulesEaten = capsulesEaten
+        self.scoreChange = state.getScore() - parent.getScore()
+
+        self.respawned = []
+        self.scaredTimers = {}
+        self.changedAgents = []
+
+        for agentIndex in range(state.getNumAgents()):
+            oldAgentState = parent.getAgentState(agentIndex)
+            newAgentState = state.getAgentState(agentIndex)
+
+            # Agent states are shared until they change, so most agents are skipped here.
+            if (oldAgentState is newAgentState):
+                continue
+
+            self.changedAgents.append(agentIndex)
+
+            oldPosition = oldAgentState.getPosition()
+            newPosition = newAgentState.getPosition()
+
+            # A single move covers at most one cell, and only the mover moves.
+            # So, any other jump must have been a respawn.
+            if (oldPosition != newPosition
+                    and (agentIndex != self.agentIndex or manhattan(oldPosition, newPosition) > 1)):
+                self.respawned.append(agentIndex)
+
+            oldTimer = oldAgentState.getScaredTimer()
+            newTimer = newAgentState.getScaredTimer()
+            if (oldTimer != newTimer):
+                self.scaredTimers[agentIndex] = (oldTimer, newTimer)
+
+    def __str__(self):
+        return ('StateDelta(agent: %s, %s -> %s, food: %s, capsules: %s, score: %+d, '
+                + 'respawned: %s, scared timers: %s)') % (self.agentIndex,
+            self.oldPosition, self.newPosition, self.foodEaten, self.capsulesEaten,
+            self.scoreChange, self.respawned, self.scaredTimers)
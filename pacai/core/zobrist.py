@@ -0,0 +1,63 @@
+"""
+Zobrist keys for incrementally hashing the contents of a board.
+
+Every (cell, item) pair gets a random key,
+and the key for a whole board is the XOR of the keys for everything on it.
+Adding or removing an item is then just an XOR with that item's key.
+"""
+
+import random
+
+KEY_BITS = 64
+
+# A fixed seed keeps keys (and therefore hashes) stable between runs,
+# and keeps us from touching the global random stream.
+SEED = 140
+
+# {(width, height): ZobristTable, ...}
+_tables = {}
+
+class ZobristTable(object):
+    """
+    The random keys for food and capsules on a board of a specific size.
+    """
+
+    def __init__(self, width, height):
+        self._height = height
+
+        rng = random.Random(SEED)
+        self._foodKeys = [rng.getrandbits(KEY_BITS) for i in range(width * height)]
+        self._capsuleKeys = [rng.getrandbits(KEY_BITS) for i in range(width * height)]
+
+    def capsuleKey(self, x, y):
+        return self._capsuleKeys[int(x) * self._height + int(y)]
+
+    def foodKey(self, x, y):
+        return self._foodKeys[int(x) * self._height + int(y)]
+
+    def hashBoard(self, food, capsules):
+        """
+        Compute the full key for a food grid and list of capsule positions.
+        This is O(food + capsules), and should only be used to get an initial key.
+        """
+
+        key = 0
+
+        for (x, y) in food.asList():
+            key ^= self.foodKey(x, y)
+
+        for (x, y) in capsules:
+            key ^= self.capsuleKey(x, y)
+
+        return key
+
+def getTable(width, height):
+    """
+    Get the (shared) table for a board of the given size.
+    """
+
+    size = (width, height)
+    if (size not in _tables):
+        _tables[size] = ZobristTable(width, height)
+
+    return _tables[size]
@@ -1,5 +1,3 @@
-import random
-
 from pacai.agents.base import BaseAgent
 from pacai.agents.search.multiagent import MultiAgentSearchAgent
 
@@ -36,7 +34,7 @@ class ReflexAgent(BaseAgent):
         scores = [self.evaluationFunction(gameState, action) for action in legalMoves]
         bestScore = max(scores)
         bestIndices = [index for index in range(len(scores)) if scores[index] == bestScore]
-        chosenIndex = random.choice(bestIndices)  # Pick randomly among the best.
+        chosenIndex = self.rng.choice(bestIndices)  # Pick randomly among the best.
 
         return legalMoves[chosenIndex]
 
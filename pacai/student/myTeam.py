@@ -43,8 +43,7 @@ class myOffensiveReflexAgent(ReflexCaptureAgent):
         # This should always be True, but better safe than sorry.
         if (len(foodList) > 0):
             foodList += self.getCapsules(currentGameState)
-            minDistance = min([self.getMazeDistance(mySuccessorPos, food) for food in foodList])
-            features['distanceToFood'] = minDistance
+            features['distanceToFood'] = self.getNearest(mySuccessorPos, foodList)[0]
 
         currentOppoentsGhostStates = [currentGameState.getAgentStates()[i]
                                       for i in self.getOpponents(currentGameState)
@@ -63,14 +62,11 @@ class myOffensiveReflexAgent(ReflexCaptureAgent):
             features['reverse'] = 1
 
         if(len(currentOppoentsGhostStates) > 0):
-            if len([self.getMazeDistance(mySuccessorPos,
-                                         oppoentsGhostState.getPosition())
-                    for oppoentsGhostState in currentOppoentsGhostStates
-                    if not oppoentsGhostState.isScared()]) > 0:
-                minDistance = min([self.getMazeDistance(mySuccessorPos,
-                                                        oppoentsGhostState.getPosition())
-                                   for oppoentsGhostState in currentOppoentsGhostStates
-                                   if not oppoentsGhostState.isScared()])
+            ghostPositions = [oppoentsGhostState.getPosition()
+                              for oppoentsGhostState in currentOppoentsGhostStates
+                              if not oppoentsGhostState.isScared()]
+            if len(ghostPositions) > 0:
+                minDistance = self.getNearest(mySuccessorPos, ghostPositions)[0]
                 if minDistance <= self.safeDistance and \
                         currentGameState.getAgentState(self.index).isPacman():
                     features['distanceToOpponentGhost'] = minDistance
@@ -78,15 +74,14 @@ class myOffensiveReflexAgent(ReflexCaptureAgent):
                     features['distanceToOpponentGhost'] = self.safeDistance
 
         if(len(currentCapsules) > 0):
-            minDistance = min([self.getMazeDistance(mySuccessorPos, currentCapsule)
-                               for currentCapsule in currentCapsules])
+            minDistance = self.getNearest(mySuccessorPos, currentCapsules)[0]
             if minDistance <= self.capsuleDistance:
                 features['distanceToCapsule'] = 1 / (minDistance + 1)
 
         if(len(successorOppoentsPacmanStates) > 0):
-            minDistance = min([self.getMazeDistance(mySuccessorPos,
-                                                    oppoentsPacmanState.getPosition())
-                               for oppoentsPacmanState in successorOppoentsPacmanStates])
+            minDistance = self.getNearest(mySuccessorPos,
+                    [oppoentsPacmanState.getPosition()
+                     for oppoentsPacmanState in successorOppoentsPacmanStates])[0]
             if minDistance <= self.btwDistance:
                 features['distanceToOpponentPacman'] = minDistance
             else:
@@ -132,8 +127,8 @@ class myDefensiveReflexAgent(ReflexCaptureAgent):
         features['numInvaders'] = len(invaders)
 
         if (len(invaders) > 0):
-            dists = [self.getMazeDistance(myPos, a.getPosition()) for a in invaders]
-            features['invaderDistance'] = min(dists)
+            invaderPositions = [a.getPosition() for a in invaders]
+            features['invaderDistance'] = self.getNearest(myPos, invaderPositions)[0]
         else:
             width = gameState.getWalls()._width
             height = gameState.getWalls()._height
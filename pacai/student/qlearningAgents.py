@@ -2,7 +2,6 @@ from pacai.agents.learning.reinforcement import ReinforcementAgent
 from pacai.util import reflection
 from pacai.util import probability
 from collections import defaultdict
-import random
 
 class QLearningAgent(ReinforcementAgent):
     """
@@ -25,8 +24,8 @@ class QLearningAgent(ReinforcementAgent):
     `pacai.util.probability.flipCoin`:
     Flip a coin (get a binary value) with some probability.
 
-    `random.choice`:
-    Pick randomly from a list.
+    `pacai.agents.base.BaseAgent.rng`:
+    The agent's random number generator, e.g. `self.rng.choice` picks randomly from a list.
 
     Additional methods to implement:
 
@@ -109,9 +108,9 @@ class QLearningAgent(ReinforcementAgent):
 
     def getAction(self, state):
         leagalMoves = self.getLegalActions(state)
-        explore = probability.flipCoin(self.getEpsilon())
+        explore = probability.flipCoin(self.getEpsilon(), self.rng)
         if explore:
-            return random.choice(leagalMoves)
+            return self.rng.choice(leagalMoves)
         else:
             return self.getPolicy(state)
 
@@ -189,7 +189,7 @@ class ClosestDotSearchAgent(SearchAgent):
 
         currentState = state
 
-        while (currentState.getFood().count() > 0):
+        while (currentState.getNumFood() > 0):
             nextPathSegment = self.findPathToClosestDot(currentState)  # The missing piece
             self._actions += nextPathSegment
 
@@ -0,0 +1,74 @@
+"""
+A bounded cache container.
+"""
+
+import collections
+
+class LRUCache(object):
+    """
+    A mapping that holds at most `maxSize` items.
+    When full, inserting a new item evicts the least recently used one.
+
+    The cache counts its hits, misses, and evictions,
+    so callers can tell if it is actually paying for itself.
+    """
+
+    def __init__(self, maxSize):
+        if (maxSize <= 0):
+            raise ValueError('Cache size must be positive, got %d.' % (maxSize))
+
+        self.maxSize = maxSize
+        self.items = collections.OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default = None):
+        """
+        Get the value for a key (marking it as recently used),
+        or the default if the key is not in the cache.
+        """
+
+        try:
+            value = self.items[key]
+        except KeyError:
+            self.misses += 1
+            return default
+
+        self.hits += 1
+        self.items.move_to_end(key)
+        return value
+
+    def pop(self, key, default = None):
+        """
+        Remove an item from the cache, and return its value (or the default if it was not there).
+        """
+
+        return self.items.pop(key, default)
+
+    def put(self, key, value):
+        """
+        Add an item to the cache, evicting the least recently used item if the cache is full.
+        """
+
+        if (key in self.items):
+            self.items.move_to_end(key)
+        elif (len(self.items) >= self.maxSize):
+            self.items.popitem(last = False)
+            self.evictions += 1
+
+        self.items[key] = value
+
+    def clear(self):
+        self.items.clear()
+
+    def __contains__(self, key):
+        return key in self.items
+
+    def __len__(self):
+        return len(self.items)
+
+    def __str__(self):
+        return 'LRUCache(size: %d/%d, hits: %d, misses: %d, evictions: %d)' % (len(self.items),
+            self.maxSize, self.hits, self.misses, self.evictions)
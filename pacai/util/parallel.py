@@ -0,0 +1,36 @@
+"""
+Running independent jobs in a pool of processes.
+"""
+
+import multiprocessing
+
+# The function and context for the jobs handled by this (worker) process.
+_worker = None
+
+def runInParallel(function, context, tasks, numProcesses):
+    """
+    Call `function(context, task)` for each task, spread over `numProcesses` processes,
+    and return the results in the same order as the tasks.
+
+    The context (e.g. agents and layouts) is handed to the worker processes as they start,
+    and is never sent back.
+    Every task gets a fresh process, so tasks can not leak state into each other
+    (e.g. from agents that remember things between games).
+    On systems that fork, the context is not even copied (and so does not need to be picklable).
+    The function, tasks, and results do always need to be picklable.
+    """
+
+    if (numProcesses <= 0):
+        raise ValueError('The number of processes must be positive, got %d.' % (numProcesses))
+
+    with multiprocessing.Pool(numProcesses, _initWorker, (function, context),
+            maxtasksperchild = 1) as pool:
+        return pool.map(_runTask, tasks, chunksize = 1)
+
+def _initWorker(function, context):
+    global _worker
+    _worker = (function, context)
+
+def _runTask(task):
+    (function, context) = _worker
+    return function(context, task)
@@ -1,5 +1,8 @@
 """
 Various utilities for working with probabilities and distributions.
+
+Functions that need randomness take an optional `rng` (a `random.Random`),
+and fall back to the global `random` module when one is not given.
 """
 
 import math
@@ -31,11 +34,14 @@ def normalize(listOrDict):
 
         return [val / total for val in listOrDict]
 
-def nSample(distribution, values, n):
+def nSample(distribution, values, n, rng = None):
+    if (rng is None):
+        rng = random
+
     if not math.isclose(sum(distribution), 1):
         distribution = normalize(distribution)
 
-    rand = [random.random() for i in range(n)]
+    rand = [rng.random() for i in range(n)]
     rand.sort()
     samples = []
     samplePos, distPos, cdf = 0, 0, distribution[0]
@@ -49,7 +55,10 @@ def nSample(distribution, values, n):
 
     return samples
 
-def sample(distribution, values = None):
+def sample(distribution, values = None, rng = None):
+    if (rng is None):
+        rng = random
+
     if isinstance(distribution, dict):
         items = sorted(distribution.items())
         distribution = [i[1] for i in items]
@@ -67,7 +76,7 @@ def sample(distribution, values = None):
     if len(distribution) != len(values):
         raise ValueError("When sampling list, distribution and values must be the same size.")
 
-    choice = random.random()
+    choice = rng.random()
     i = 0
     total = distribution[0]
 
@@ -90,6 +99,9 @@ def getProbability(value, distribution, values):
 
     return total
 
-def flipCoin(p):
-    r = random.random()
+def flipCoin(p, rng = None):
+    if (rng is None):
+        rng = random
+
+    r = rng.random()
     return r < p
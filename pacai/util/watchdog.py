@@ -0,0 +1,71 @@
+"""
+Stopping calls that run past their time limit.
+"""
+
+import signal
+import threading
+
+# Once a call is past its deadline, it is interrupted again this often (in seconds),
+# in case it caught (and ignored) the first interruption.
+REPEAT_SECONDS = 0.05
+
+class DeadlineExceeded(TimeoutError):
+    """
+    Raised when a call does not finish within its time limit.
+    """
+
+    pass
+
+class Watchdog(object):
+    """
+    A context manager that stops the code inside it with a `DeadlineExceeded`
+    once `timeLimit` seconds have passed.
+
+    The code is interrupted by a real-time timer signal (SIGALRM),
+    which also cuts short sleeps and other blocking calls.
+    Signals only reach the main thread, so anywhere else (or on platforms without SIGALRM)
+    the watchdog does nothing (see `canWatch`) and callers have to judge the time afterwards.
+    Code that must always be stopped should run in its own process
+    (see `pacai.core.agentHost.AgentHost`).
+    """
+
+    def __init__(self, timeLimit):
+        self._timeLimit = timeLimit
+        self._oldHandler = None
+        self._armed = False
+
+    def isArmed(self):
+        return self._armed
+
+    def _expire(self, signalNumber, frame):
+        raise DeadlineExceeded('Call did not finish within %.2f seconds.' % (self._timeLimit))
+
+    def __enter__(self):
+        if (not canWatch()):
+            return self
+
+        self._oldHandler = signal.signal(signal.SIGALRM, self._expire)
+        self._armed = True
+
+        # A zero timer would disarm it, so an already spent limit gets the smallest wait instead.
+        signal.setitimer(signal.ITIMER_REAL, max(1e-6, self._timeLimit), REPEAT_SECONDS)
+
+        return self
+
+    def __exit__(self, exceptionType, exception, traceback):
+        if (not self._armed):
+            return False
+
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, self._oldHandler)
+        self._armed = False
+
+        return False
+
+def canWatch():
+    """
+    Check if a `Watchdog` can stop code running in the current thread.
+    """
+
+    return (hasattr(signal, 'setitimer')
+            and threading.current_thread() is threading.main_thread())
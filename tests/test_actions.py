@@ -0,0 +1,67 @@
+import random
+import unittest
+
+from pacai.bin.pacman import GhostRules
+from pacai.bin.pacman import PacmanGameState
+from pacai.core.actions import Actions
+from pacai.core.directions import Directions
+from pacai.core.layout import getLayout
+
+"""
+Test the precomputed legal move tables.
+"""
+class ActionsTest(unittest.TestCase):
+    def test_action_table(self):
+        walls = getLayout('mediumClassic').walls
+
+        for (x, y) in walls.asList(False):
+            expected = []
+            for direction in sorted(Actions._directions):
+                (nextX, nextY) = Actions.getSuccessor((x, y), direction)
+                if (not walls[int(nextX)][int(nextY)]):
+                    expected.append(direction)
+
+            for direction in Directions.CARDINAL:
+                self.assertEqual(expected, Actions.getPossibleActions((x, y), direction, walls))
+
+            for action in Actions._directions:
+                self.assertEqual(action in expected,
+                        Actions.isLegalAction((x, y), Directions.STOP, action, walls))
+
+            expectedNeighbors = [Actions.getSuccessor((x, y), action) for action in expected]
+            self.assertEqual(expectedNeighbors, Actions.getLegalNeighbors((x, y), walls))
+
+        # The table is built once per walls grid.
+        self.assertIs(Actions.getActionTable(walls), Actions.getActionTable(walls))
+
+    def test_between_cells(self):
+        walls = getLayout('mediumClassic').walls
+
+        position = (1.5, 1)
+        self.assertEqual([Directions.EAST],
+                Actions.getPossibleActions(position, Directions.EAST, walls))
+        self.assertTrue(Actions.isLegalAction(position, Directions.EAST, Directions.EAST, walls))
+        self.assertFalse(Actions.isLegalAction(position, Directions.EAST, Directions.WEST, walls))
+
+    def test_ghost_legal_actions(self):
+        rng = random.Random(0)
+        state = PacmanGameState(getLayout('mediumClassic'))
+
+        # Scared ghosts move at half speed, so they also spend time between cells.
+        state.getMutableAgentState(1).setScaredTimer(1000)
+
+        for i in range(200):
+            for ghostIndex in state.getGhostIndexes():
+                legalActions = GhostRules.getLegalActions(state, ghostIndex)
+                for action in sorted(Actions._directions):
+                    self.assertEqual(action in legalActions,
+                            GhostRules.isLegalAction(state, action, ghostIndex))
+
+            agentIndex = i % state.getNumAgents()
+            state = state.generateSuccessor(agentIndex,
+                    rng.choice(state.getLegalActions(agentIndex)))
+            if (state.isOver()):
+                break
+
+if __name__ == '__main__':
+    unittest.main()
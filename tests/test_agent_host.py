@@ -0,0 +1,201 @@
+import random
+import time
+import unittest
+
+from pacai.agents.base import BaseAgent
+from pacai.agents.capture.dummy import DummyAgent
+from pacai.agents.ghost.random import RandomGhost
+from pacai.agents.greedy import GreedyAgent
+from pacai.agents.random import RandomAgent
+from pacai.agents.timeout import TimeoutAgent
+from pacai.bin.capture import CaptureRules
+from pacai.bin.pacman import ClassicGameRules
+from pacai.core.agentHost import AgentHost
+from pacai.core.layout import getLayout
+from pacai.ui.pacman.null import PacmanNullView
+
+class CrashAgent(BaseAgent):
+    def getAction(self, state):
+        raise ValueError('Crash!')
+
+class SlowStartAgent(GreedyAgent):
+    def registerInitialState(self, state):
+        time.sleep(10)
+
+class TotalTimeRules(ClassicGameRules):
+    def getMaxTotalTime(self, agentIndex):
+        return 0.3
+
+"""
+Test playing agents from their own processes.
+"""
+class AgentHostTest(unittest.TestCase):
+    def test_capture_teams(self):
+        agents = [DummyAgent(i) for i in range(4)]
+        hosts = [AgentHost(agents[0::2], checkStates = True),
+                AgentHost(agents[1::2], checkStates = True)]
+        remoteAgents = [hosts[i % 2].getAgents()[i // 2] for i in range(4)]
+
+        try:
+            # The same hosts can play several games.
+            for seed in range(2):
+                game = CaptureRules().newGame(getLayout('defaultCapture'), remoteAgents, None,
+                        100, False, random.Random(seed))
+                game.simulate()
+
+                # The workers replayed every move (and checked the state after them).
+                self.assertTrue(game.state.isOver())
+                self.assertEqual(100, game.numMoves)
+
+            # One request to start each game, and then two per agent, plus one per move.
+            self.assertEqual(2 * (1 + 2 * 2 + 50), hosts[0].numRequests)
+        finally:
+            for host in hosts:
+                host.close()
+
+        self.assertFalse(hosts[0].isAlive())
+
+    def test_pacman(self):
+        host = AgentHost([GreedyAgent(0)], checkStates = True)
+        ghosts = [RandomGhost(1), RandomGhost(2)]
+
+        try:
+            game = ClassicGameRules().newGame(getLayout('smallClassic'), host.getAgents()[0],
+                    ghosts, None, rng = random.Random(0))
+            game.simulate()
+        finally:
+            host.close()
+
+        self.assertTrue(game.state.isOver())
+        self.assertIn('CPU time', str(host))
+
+    def test_same_game(self):
+        # Hosted agents are seeded just like local ones,
+        # so hosting some agents does not change how a seeded game plays out.
+        histories = []
+        for hosted in [False, True]:
+            agents = [RandomAgent(0), RandomGhost(1), RandomGhost(2)]
+            hosts = []
+            if (hosted):
+                hosts = [AgentHost(agents[0:1]), AgentHost(agents[2:3])]
+                agents = [hosts[0].getAgents()[0], agents[1], hosts[1].getAgents()[0]]
+
+            try:
+                game = ClassicGameRules().newGame(getLayout('smallClassic'), agents[0],
+                        agents[1:], None, rng = random.Random(0))
+                game.simulate(keepHistory = True)
+            finally:
+                for host in hosts:
+                    host.close()
+
+            histories.append((game.moveHistory, game.state.getScore()))
+
+        self.assertTrue(len(histories[0][0]) > 10)
+        self.assertEqual(histories[0], histories[1])
+
+    def test_agent_errors(self):
+        host = AgentHost([CrashAgent(0)])
+        ghosts = [RandomGhost(1), RandomGhost(2)]
+
+        try:
+            game = ClassicGameRules().newGame(getLayout('smallClassic'), host.getAgents()[0],
+                    ghosts, None, catchExceptions = True)
+            game.simulate()
+            self.assertTrue(game.agentCrashed)
+
+            # Without catching, the agent's exception (from the other process) comes through.
+            game = ClassicGameRules().newGame(getLayout('smallClassic'), host.getAgents()[0],
+                    ghosts, None)
+            with self.assertRaisesRegex(RuntimeError, 'Crash!'):
+                game.simulate()
+
+            # A killed worker can not play.
+            host.kill()
+            self.assertFalse(host.isAlive())
+
+            with self.assertRaises(RuntimeError):
+                host.getAction(0, game.state)
+        finally:
+            host.close()
+
+    def test_move_deadline(self):
+        for fast in [False, True]:
+            host = AgentHost([TimeoutAgent(0, timeout = 10)])
+
+            try:
+                game = self._newGame(host, ClassicGameRules(timeout = 0.2))
+
+                startTime = time.time()
+                if (fast):
+                    game.simulate()
+                else:
+                    game.run()
+
+                # The agent is stopped as soon as it is out of time, not when it finishes.
+                self.assertTrue(time.time() - startTime < 2)
+                self.assertTrue(game.agentTimeout)
+                self.assertTrue(game.agentCrashed)
+                self.assertEqual(0, game.numMoves)
+                self.assertFalse(host.isAlive())
+            finally:
+                host.close()
+
+    def test_total_deadline(self):
+        host = AgentHost([TimeoutAgent(0, timeout = 0.05)])
+
+        try:
+            game = self._newGame(host, TotalTimeRules())
+
+            startTime = time.time()
+            game.simulate()
+
+            self.assertTrue(time.time() - startTime < 2)
+            self.assertTrue(game.agentTimeout)
+            self.assertTrue(game.numMoves > 0)
+            self.assertTrue(game.totalAgentTimes[0] < 0.5)
+        finally:
+            host.close()
+
+    def test_startup_deadline(self):
+        host = AgentHost([SlowStartAgent(0)])
+
+        try:
+            game = self._newGame(host, ClassicGameRules(timeout = 0.2))
+
+            startTime = time.time()
+            game.simulate()
+
+            self.assertTrue(time.time() - startTime < 2)
+            self.assertTrue(game.agentTimeout)
+            self.assertEqual(0, game.numMoves)
+            self.assertFalse(host.isAlive())
+
+            # The worker is back for the next game.
+            host.startGame(game.state, [0])
+            self.assertTrue(host.isAlive())
+            self.assertEqual(1, host.numRestarts)
+        finally:
+            host.close()
+
+    def test_local_timeouts(self):
+        # Agents in the game's process are stopped by a watchdog, just like hosted ones.
+        rules = [ClassicGameRules(timeout = 0.2), ClassicGameRules(timeout = 0.2), TotalTimeRules()]
+        agents = [TimeoutAgent(0, timeout = 10), SlowStartAgent(0), TimeoutAgent(0, timeout = 0.05)]
+
+        for (gameRules, agent) in zip(rules, agents):
+            game = gameRules.newGame(getLayout('smallClassic'), agent,
+                    [RandomGhost(1), RandomGhost(2)], PacmanNullView(), catchExceptions = True)
+
+            startTime = time.time()
+            game.run()
+
+            self.assertTrue(time.time() - startTime < 2)
+            self.assertTrue(game.agentTimeout)
+            self.assertTrue(game.totalAgentTimes[0] < 0.5)
+
+    def _newGame(self, host, rules):
+        return rules.newGame(getLayout('smallClassic'), host.getAgents()[0],
+                [RandomGhost(1), RandomGhost(2)], PacmanNullView(), catchExceptions = True)
+
+if __name__ == '__main__':
+    unittest.main()
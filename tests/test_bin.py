@@ -1,8 +1,15 @@
+import random
+import threading
 import unittest
 
+from pacai.agents.ghost.random import RandomGhost
+from pacai.agents.greedy import GreedyAgent
+from pacai.bin import benchmark
 from pacai.bin import capture
 from pacai.bin import gridworld
 from pacai.bin import pacman
+from pacai.core.layout import getLayout
+from pacai.ui.pacman.null import PacmanNullView
 
 """
 This is a test class to assess the executables of this project.
@@ -67,5 +74,96 @@ class BinTest(unittest.TestCase):
         # Run game of capture with random generated map with seed value.
         capture.main(['--null-graphics', '--layout', 'RANDOM94'])
 
+    def test_parallel_games(self):
+        # Games get their own seeds, so the number of jobs does not change the results.
+        args = ['-p', 'GreedyAgent', '--null-graphics', '--seed', '1234', '-n', '3']
+        serial = pacman.main(args + ['--jobs', '1'])
+        parallel = pacman.main(args + ['--jobs', '3'])
+
+        self.assertEqual(3, len(parallel))
+        self.assertEqual([result.score for result in serial],
+                [result.score for result in parallel])
+        self.assertEqual([result.numMoves for result in serial],
+                [result.numMoves for result in parallel])
+
+        # Games in this process are seeded the same way.
+        games = pacman.main(args)
+        self.assertEqual([result.score for result in parallel],
+                [game.state.getScore() for game in games])
+
+        results = capture.main(['--null-graphics', '--seed', '1234', '-n', '2', '--jobs', '2'])
+        self.assertEqual(2, len(results))
+
+    def test_global_random_state(self):
+        # Games get their own generators, but the global one is also seeded for code that uses it.
+        args = ['-p', 'GreedyAgent', '--null-graphics', '--seed', '1234', '-n', '2']
+
+        random.seed(0)
+        first = pacman.main(args)
+        firstDraw = random.random()
+
+        random.seed(1)
+        second = pacman.main(args)
+        self.assertEqual(firstDraw, random.random())
+
+        self.assertEqual([game.state.getScore() for game in first],
+                [game.state.getScore() for game in second])
+
+    def test_agent_processes(self):
+        pacman.main(['-p', 'GreedyAgent', '--null-graphics', '-n', '2', '--agent-processes'])
+        capture.main(['--null-graphics', '--agent-processes'])
+
+        with self.assertRaises(ValueError):
+            capture.main(['--null-graphics', '--agent-processes', '--jobs', '2'])
+
+    def test_game_rng(self):
+        layout = getLayout('smallClassic')
+
+        def play(seed, results, index):
+            rules = pacman.ClassicGameRules()
+            agents = [GreedyAgent(0), RandomGhost(1), RandomGhost(2)]
+            game = rules.newGame(layout, agents[0], agents[1:], PacmanNullView(),
+                    rng = random.Random(seed))
+            game.run()
+
+            results[index] = game.moveHistory
+
+        expected = [None]
+        play(5, expected, 0)
+
+        # Games running at the same time do not share any randomness.
+        results = [None] * 4
+        threads = [threading.Thread(target = play, args = (5, results, i)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        for result in results:
+            self.assertEqual(expected[0], result)
+
+    def test_simulate(self):
+        layout = getLayout('smallClassic')
+        rules = pacman.ClassicGameRules()
+        games = []
+
+        for display in [PacmanNullView(), None]:
+            agents = [GreedyAgent(0), RandomGhost(1), RandomGhost(2)]
+            games.append(rules.newGame(layout, agents[0], agents[1:], display,
+                    rng = random.Random(7)))
+
+        games[0].run()
+        games[1].simulate(keepHistory = True)
+
+        # The fast loop plays exactly the same game.
+        self.assertEqual(games[0].state.getScore(), games[1].state.getScore())
+        self.assertEqual(games[0].moveHistory, games[1].moveHistory)
+        self.assertEqual(len(games[0].moveHistory), games[1].numMoves)
+
+    def test_benchmark(self):
+        rates = benchmark.main(['-n', '1'])
+        self.assertEqual(2, len(rates))
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,341 @@
+import os
+import sys
+import tempfile
+import unittest
+
+from pacai.core import distanceCalculator
+from pacai.core.distance import manhattan
+from pacai.core.grid import BitGrid
+from pacai.core.grid import Grid
+from pacai.core.layout import Layout
+from pacai.core.layout import getLayout
+
+TEST_LAYOUT = [
+    '%%%%%%%',
+    '%   % %',
+    '% % % %',
+    '%   %.%',
+    '%%%%%%%',
+]
+
+"""
+Test the precomputed maze distances.
+"""
+class DistanceCalculatorTest(unittest.TestCase):
+    def _bfs(self, walls, source):
+        distances = {source: 0}
+        frontier = [source]
+
+        while (len(frontier) > 0):
+            nextFrontier = []
+            for (x, y) in frontier:
+                for other in [(x, y + 1), (x, y - 1), (x + 1, y), (x - 1, y)]:
+                    if (not walls[other[0]][other[1]] and other not in distances):
+                        distances[other] = distances[(x, y)] + 1
+                        nextFrontier.append(other)
+
+            frontier = nextFrontier
+
+        return distances
+
+    def test_maze_distances(self):
+        for layout in [Layout(TEST_LAYOUT), getLayout('tinyCapture')]:
+            distances = distanceCalculator.computeDistances(layout)
+            positions = layout.walls.asList(False)
+            self.assertEqual(positions, distances.getPositions())
+
+            for source in positions:
+                expected = self._bfs(layout.walls, source)
+                for target in positions:
+                    self.assertEqual(expected.get(target, sys.maxsize),
+                            distances.getDistance(source, target))
+
+            self.assertIsNone(distances.getDistance((0, 0), positions[0]))
+            self.assertIsNone(distances.getDistance((-1, 1), positions[0]))
+
+    def test_distancer(self):
+        layout = Layout(TEST_LAYOUT)
+        distancer = distanceCalculator.Distancer(layout)
+        self.assertFalse(distancer.isReadyForMazeDistance())
+
+        # Before the distances are computed, the manhattan distance is used.
+        self.assertEqual(2, distancer.getDistance((1, 2), (3, 2)))
+
+        distancer.getMazeDistances()
+        self.assertTrue(distancer.isReadyForMazeDistance())
+        self.assertEqual(4, distancer.getDistance((1, 2), (3, 2)))
+        self.assertEqual(sys.maxsize, distancer.getDistance((1, 1), (5, 1)))
+
+        # Positions between cells snap to the cells around them.
+        self.assertEqual(1.5, distancer.getDistance((1, 1), (1, 2.5)))
+
+        with self.assertRaises(Exception):
+            distancer.getDistanceOnGrid((0, 0), (1, 1))
+
+    def test_shared_distances(self):
+        layout = getLayout('tinyCapture')
+        bitLayout = getLayout('tinyCapture', wallGridClass = BitGrid)
+
+        # The same walls (even in a different grid type) share the same distances.
+        self.assertEqual(distanceCalculator.getWallsKey(layout.walls),
+                distanceCalculator.getWallsKey(bitLayout.walls))
+        self.assertNotEqual(distanceCalculator.getWallsKey(layout.walls),
+                distanceCalculator.getWallsKey(Layout(TEST_LAYOUT).walls))
+
+        first = distanceCalculator.Distancer(layout)
+        first.getMazeDistances()
+        second = distanceCalculator.Distancer(bitLayout)
+        second.getMazeDistances()
+
+        self.assertIs(first._distances, second._distances)
+
+    def test_disk_cache(self):
+        walls = Layout(TEST_LAYOUT).walls
+        key = distanceCalculator.getWallsKey(walls)
+        expected = distanceCalculator.MazeDistances(walls)
+
+        with tempfile.TemporaryDirectory() as cacheDir:
+            try:
+                distanceCalculator.setDiskCacheDir(cacheDir)
+                distanceCalculator.distanceMap.pop(key, None)
+
+                distanceCalculator.getMazeDistances(walls)
+                self.assertEqual(1, len(os.listdir(cacheDir)))
+
+                # Forget the distances in this process, so they come from the disk.
+                distanceCalculator.distanceMap.pop(key)
+                loaded = distanceCalculator.getMazeDistances(walls)
+                self.assertIsInstance(loaded._distances, memoryview)
+
+                for source in walls.asList(False):
+                    for target in walls.asList(False):
+                        self.assertEqual(expected.getDistance(source, target),
+                                loaded.getDistance(source, target))
+            finally:
+                distanceCalculator.setDiskCacheDir(None)
+                distanceCalculator.distanceMap.pop(key, None)
+
+    def test_bounded_caches(self):
+        # A run over many layouts only keeps the most recent ones.
+        for length in range(distanceCalculator.MAX_CACHED_WALLS + 4):
+            walls = Grid(length + 3, 3, True)
+            for x in range(1, length + 2):
+                walls[x][1] = False
+
+            distanceCalculator.getJunctionMazeDistances(walls)
+            distanceCalculator.getLazyMazeDistances(walls)
+
+        self.assertEqual(distanceCalculator.MAX_CACHED_WALLS,
+                len(distanceCalculator.junctionDistanceMap))
+        self.assertEqual(distanceCalculator.MAX_CACHED_WALLS,
+                len(distanceCalculator.lazyDistanceMap))
+
+        # Distances without a full table are never put in the disk cache.
+        with tempfile.TemporaryDirectory() as cacheDir:
+            try:
+                distanceCalculator.setDiskCacheDir(cacheDir)
+                key = distanceCalculator.getWallsKey(walls)
+
+                for distances in [distanceCalculator.getJunctionMazeDistances(walls),
+                        distanceCalculator.getLazyMazeDistances(walls)]:
+                    self.assertFalse(distances.hasFullTable())
+                    distanceCalculator._saveDistances(key, distances)
+
+                self.assertEqual([], os.listdir(cacheDir))
+            finally:
+                distanceCalculator.setDiskCacheDir(None)
+
+    def test_lazy_distances(self):
+        layout = getLayout('tinyCapture')
+        expected = distanceCalculator.MazeDistances(layout.walls)
+        positions = layout.walls.asList(False)
+
+        # Only enough room for two rows.
+        rowSize = len(positions) * 2
+        distances = distanceCalculator.LazyMazeDistances(layout.walls, rowSize * 2)
+        self.assertEqual(0, len(distances.getRowCache()))
+
+        for source in positions:
+            for target in positions:
+                self.assertEqual(expected.getDistance(source, target),
+                        distances.getDistance(source, target))
+
+        self.assertIsNone(distances.getDistance((0, 0), positions[0]))
+
+        cache = distances.getRowCache()
+        self.assertEqual(2, len(cache))
+        self.assertEqual(len(positions), cache.misses)
+        self.assertTrue(distances.getHitRate() > 0.9)
+        numCells = layout.walls.getWidth() * layout.walls.getHeight()
+        self.assertEqual(rowSize * 2 + numCells * 2, distances.getMemoryUsage())
+
+        # Queries in either direction use the same row.
+        misses = cache.misses
+        distances.getDistance(positions[-1], positions[0])
+        distances.getDistance(positions[0], positions[-1])
+        self.assertEqual(misses, cache.misses)
+
+    def test_lazy_distancer(self):
+        layout = Layout(TEST_LAYOUT)
+        distancer = distanceCalculator.Distancer(layout, lazy = True, memoryBudget = 100)
+        distancer.getMazeDistances()
+
+        self.assertIsInstance(distancer._distances, distanceCalculator.LazyMazeDistances)
+        self.assertEqual(4, distancer.getDistance((1, 2), (3, 2)))
+        self.assertEqual(1.5, distancer.getDistance((1, 1), (1, 2.5)))
+
+        try:
+            distanceCalculator.setLazyDistances(100)
+            other = distanceCalculator.Distancer(layout)
+            other.getMazeDistances()
+            self.assertTrue(other.isLazy())
+            self.assertIs(distancer._distances, other._distances)
+        finally:
+            distanceCalculator.setLazyDistances(None)
+
+        self.assertFalse(distanceCalculator.Distancer(layout).isLazy())
+
+    def test_incremental_distances(self):
+        layout = getLayout('tinyCapture')
+        expected = distanceCalculator.MazeDistances(layout.walls)
+        positions = layout.walls.asList(False)
+
+        distances = distanceCalculator.IncrementalMazeDistances(layout.walls)
+        self.assertFalse(distances.compute(maxRows = 3))
+        self.assertEqual(3, distances.getNumComputedRows())
+
+        # Pairs without a finished row fall back to the manhattan distance.
+        self.assertEqual(expected.getDistance(positions[2], positions[0]),
+                distances.getDistance(positions[0], positions[2]))
+        self.assertEqual(manhattan(positions[0], positions[-1]),
+                distances.getDistance(positions[0], positions[-1]))
+
+        self.assertTrue(distances.compute())
+        for source in positions:
+            for target in positions:
+                self.assertEqual(expected.getDistance(source, target),
+                        distances.getDistance(source, target))
+
+    def test_incremental_distancer(self):
+        walls = Layout(TEST_LAYOUT).walls
+        key = distanceCalculator.getWallsKey(walls)
+        distanceCalculator.distanceMap.pop(key, None)
+
+        try:
+            first = distanceCalculator.Distancer(Layout(TEST_LAYOUT), incremental = True)
+            first.getMazeDistances(0)
+            self.assertTrue(first.isReadyForMazeDistance())
+            self.assertFalse(first.hasAllDistances())
+
+            # A second distancer shares the progress of the first.
+            second = distanceCalculator.Distancer(Layout(TEST_LAYOUT), incremental = True)
+            second.getMazeDistances(0)
+            self.assertIs(first._distances, second._distances)
+            self.assertEqual(2, first._distances.getNumComputedRows())
+
+            self.assertTrue(first.computeMazeDistances())
+            self.assertIs(distanceCalculator.distanceMap.get(key), first._distances)
+            self.assertEqual(4, first.getDistance((1, 2), (3, 2)))
+
+            self.assertTrue(second.computeMazeDistances(0))
+            self.assertTrue(second.hasAllDistances())
+        finally:
+            distanceCalculator.distanceMap.pop(key, None)
+
+    def test_junction_distances(self):
+        loop = Layout([
+            '%%%%%%',
+            '%    %',
+            '% %% %',
+            '%    %',
+            '%%%%%%',
+        ])
+
+        for layout in [Layout(TEST_LAYOUT), loop, getLayout('tinyCapture'), getLayout('mediumMaze')]:
+            expected = distanceCalculator.MazeDistances(layout.walls)
+            distances = distanceCalculator.JunctionMazeDistances(layout.walls)
+            positions = layout.walls.asList(False)
+
+            for source in positions:
+                for target in positions:
+                    self.assertEqual(expected.getDistance(source, target),
+                            distances.getDistance(source, target))
+
+            self.assertIsNone(distances.getDistance((0, 0), positions[0]))
+
+        # A loop without any real junctions still gets one.
+        self.assertEqual(1, distanceCalculator.JunctionMazeDistances(loop.walls).getNumJunctions())
+
+        # Mazes are mostly corridors.
+        self.assertTrue(distances.getMemoryUsage() * 5 < expected.getMemoryUsage())
+
+        # Capture layouts have more junctions, but still save some.
+        walls = getLayout('defaultCapture').walls
+        self.assertTrue(distanceCalculator.JunctionMazeDistances(walls).getMemoryUsage() * 4
+                < distanceCalculator.MazeDistances(walls).getMemoryUsage())
+
+    def test_compressed_distancer(self):
+        layout = Layout(TEST_LAYOUT)
+        distancer = distanceCalculator.Distancer(layout, compressed = True)
+        distancer.getMazeDistances()
+
+        self.assertIsInstance(distancer._distances, distanceCalculator.JunctionMazeDistances)
+        self.assertTrue(distancer.hasAllDistances())
+        self.assertEqual(4, distancer.getDistance((1, 2), (3, 2)))
+        self.assertEqual(sys.maxsize, distancer.getDistance((1, 1), (5, 1)))
+        self.assertEqual(1.5, distancer.getDistance((1, 1), (1, 2.5)))
+
+    def test_large_distances(self):
+        self.assertEqual('H', distanceCalculator.getDistanceType(1000)[0])
+        self.assertEqual('I', distanceCalculator.getDistanceType(70000)[0])
+
+        # A single corridor that is longer than a 16-bit distance.
+        length = 70000
+        walls = Grid(length + 2, 3, True)
+        for x in range(1, length + 1):
+            walls[x][1] = False
+
+        start = (1, 1)
+        end = (length, 1)
+
+        for distances in [distanceCalculator.LazyMazeDistances(walls),
+                distanceCalculator.JunctionMazeDistances(walls)]:
+            self.assertEqual(length - 1, distances.getDistance(start, end))
+            self.assertEqual([length - 1, 0], distances.getDistances(end, [start, end]))
+
+    def test_nearest(self):
+        layout = getLayout('tinyCapture')
+        positions = layout.walls.asList(False)
+
+        distancers = [
+            distanceCalculator.Distancer(layout),
+            distanceCalculator.Distancer(layout, lazy = True),
+            distanceCalculator.Distancer(layout, compressed = True),
+            distanceCalculator.Distancer(layout, incremental = True),
+        ]
+
+        for distancer in distancers:
+            # Before the distances are ready, this is just the manhattan distance.
+            self.assertEqual([manhattan(positions[0], target) for target in positions],
+                    distancer.distancesTo(positions[0], positions))
+
+            distancer.getMazeDistances(0)
+
+            for source in positions:
+                expected = [distancer.getDistance(source, target) for target in positions]
+                self.assertEqual(expected, distancer.distancesTo(source, positions))
+
+                (distance, target) = distancer.nearest(source, reversed(positions))
+                self.assertEqual(min(expected), distance)
+                self.assertEqual(distance, distancer.getDistance(source, target))
+
+        distancer = distancers[0]
+        self.assertEqual((None, None), distancer.nearest(positions[0], []))
+        self.assertEqual((0, positions[0]), distancer.nearest(positions[0], positions))
+        self.assertEqual([1.5], distancer.distancesTo((1, 1), [(1, 2.5)]))
+
+        with self.assertRaises(Exception):
+            distancer.distancesTo(positions[0], [(0, 0)])
+
+if __name__ == '__main__':
+    unittest.main()
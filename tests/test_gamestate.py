@@ -0,0 +1,359 @@
+import random
+import unittest
+
+from pacai.bin.capture import CaptureGameState
+from pacai.bin.pacman import PacmanGameState
+from pacai.core.directions import Directions
+from pacai.core.grid import SparseGrid
+from pacai.core.layout import Layout
+from pacai.core.layout import getLayout
+from pacai.util.lruCache import LRUCache
+
+TEST_LAYOUT = [
+    '%.%% .%',
+    '%.. o.%',
+    '%.%% .%',
+    '%P . G%',
+    '%.%% .%',
+]
+
+"""
+Test the bookkeeping that game states do while generating successors.
+"""
+class GameStateTest(unittest.TestCase):
+    def setUp(self):
+        self.layout = Layout(TEST_LAYOUT)
+        self.state = PacmanGameState(self.layout)
+
+    def test_zobrist_key(self):
+        state = self.state
+        for action in [Directions.NORTH, Directions.NORTH, Directions.EAST, Directions.EAST]:
+            state = state.generateSuccessor(0, action)
+
+            # The incremental key must match one computed from scratch.
+            expected = state._zobristTable.hashBoard(state._food, state._capsules)
+            self.assertEqual(expected, state._zobristKey)
+
+        self.assertEqual(self.state.getNumFood() - 3, state.getNumFood())
+
+    def test_food_is_read_only(self):
+        food = self.state.getFood()
+        with self.assertRaises(TypeError):
+            food[1][2] = False
+
+        food = food.copy()
+        food[1][2] = False
+        self.assertTrue(self.state.hasFood(1, 2))
+
+    def test_equal_states_hash_equal(self):
+        first = self.state.generateSuccessor(0, Directions.EAST)
+        first = first.generateSuccessor(0, Directions.WEST)
+
+        second = self.state.generateSuccessor(0, Directions.NORTH)
+        second = second.generateSuccessor(0, Directions.SOUTH)
+
+        self.assertNotEqual(first, second)
+        self.assertNotEqual(hash(first), hash(second))
+
+        # Take the same moves in a different order.
+        third = self.state
+        for action in [Directions.NORTH, Directions.SOUTH, Directions.STOP,
+                Directions.EAST, Directions.WEST]:
+            third = third.generateSuccessor(0, action)
+
+        fourth = self.state
+        for action in [Directions.STOP, Directions.NORTH, Directions.SOUTH,
+                Directions.EAST, Directions.WEST]:
+            fourth = fourth.generateSuccessor(0, action)
+
+        self.assertEqual(third, fourth)
+        self.assertEqual(hash(third), hash(fourth))
+
+    def test_shared_agent_states(self):
+        successor = self.state.generateSuccessor(0, Directions.EAST)
+
+        # Only pacman moved, so only pacman's state is copied.
+        self.assertIsNot(self.state.getAgentState(0), successor.getAgentState(0))
+        self.assertIs(self.state.getAgentState(1), successor.getAgentState(1))
+        self.assertEqual((1, 1), self.state.getPacmanPosition())
+        self.assertEqual((2, 1), successor.getPacmanPosition())
+
+        # Eating the capsule scares (and therefore copies) the ghost.
+        state = successor
+        for action in [Directions.EAST, Directions.EAST, Directions.NORTH, Directions.NORTH]:
+            state = state.generateSuccessor(0, action)
+
+        self.assertEqual(0, successor.getAgentState(1).getScaredTimer())
+        self.assertTrue(state.getAgentState(1).isScared())
+
+    def test_delta(self):
+        parent = self.state.generateSuccessor(0, Directions.EAST)
+        state = parent.generateSuccessor(0, Directions.EAST)
+
+        delta = state.deltaFrom(parent)
+        self.assertEqual(0, delta.agentIndex)
+        self.assertEqual((2, 1), delta.oldPosition)
+        self.assertEqual((3, 1), delta.newPosition)
+        self.assertEqual([(3, 1)], delta.foodEaten)
+        self.assertEqual([], delta.capsulesEaten)
+        self.assertEqual(state.getScore() - parent.getScore(), delta.scoreChange)
+        self.assertEqual([0], delta.changedAgents)
+        self.assertEqual([], delta.respawned)
+
+        # Eat the capsule, which scares the ghost.
+        parent = state.generateSuccessor(0, Directions.EAST).generateSuccessor(0, Directions.NORTH)
+        state = parent.generateSuccessor(0, Directions.NORTH)
+
+        delta = state.deltaFrom(parent)
+        self.assertEqual([(4, 3)], delta.capsulesEaten)
+        self.assertEqual([], delta.foodEaten)
+        self.assertEqual({1: (0, state.getAgentState(1).getScaredTimer())}, delta.scaredTimers)
+
+        # Deltas across several moves still find all the eaten food.
+        delta = state.deltaFrom(self.state)
+        self.assertEqual(self.state.getNumFood() - state.getNumFood(), len(delta.foodEaten))
+
+    def test_delta_respawn(self):
+        state = CaptureGameState(getLayout('defaultCapture'), 1200)
+        parent = state.generateSuccessor(0, Directions.STOP)
+
+        # Jump an agent across the board, which only a respawn can do.
+        state = parent.generateSuccessor(1, Directions.STOP)
+        state.getMutableAgentState(1)._position = (1, 2)
+        delta = state.deltaFrom(parent)
+
+        self.assertEqual([1], delta.changedAgents)
+        self.assertEqual([1], delta.respawned)
+
+    def test_generate_all_successors(self):
+        for state in [self.state, CaptureGameState(getLayout('defaultCapture'), 1200)]:
+            for agentIndex in range(state.getNumAgents()):
+                successors = state.generateAllSuccessors(agentIndex)
+                self.assertEqual(state.getLegalActions(agentIndex),
+                        [action for (action, successor) in successors])
+
+                for (action, successor) in successors:
+                    expected = state.generateSuccessor(agentIndex, action)
+                    self.assertEqual(expected, successor)
+                    self.assertEqual(hash(expected), hash(successor))
+
+    def test_successor_cache(self):
+        cache = LRUCache(100)
+        self.state.setSuccessorCache(cache)
+
+        pacmanMoved = self.state.generateSuccessor(0, Directions.EAST)
+        first = pacmanMoved.generateSuccessor(1, Directions.WEST)
+        second = self.state.generateSuccessor(0, Directions.EAST).generateSuccessor(1, Directions.WEST)
+        self.assertIs(first, second)
+        self.assertIs(cache, first.getSuccessorCache())
+
+        # The ghost goes around a loop back to an equal state, which finds the same successors.
+        back = first
+        for action in [Directions.NORTH, Directions.EAST, Directions.SOUTH, Directions.WEST]:
+            back = back.generateSuccessor(1, action)
+
+        self.assertIsNot(first, back)
+        self.assertEqual(first, back)
+        self.assertIs(first.generateSuccessor(0, Directions.EAST),
+                back.generateSuccessor(0, Directions.EAST))
+
+        self.assertEqual(3, cache.hits)
+        self.assertEqual(7, cache.misses)
+
+        # The batched API shares the same cache.
+        for (action, successor) in first.generateAllSuccessors(0):
+            self.assertIs(first.generateSuccessor(0, action), successor)
+
+        uncached = self.state.generateSuccessor(0, Directions.EAST, useCache = False)
+        self.assertIsNot(uncached, self.state.generateSuccessor(0, Directions.EAST))
+        self.assertEqual(uncached, self.state.generateSuccessor(0, Directions.EAST))
+
+    def test_successor_cache_last_eaten(self):
+        self.state.setSuccessorCache(LRUCache(100))
+
+        # Equal states that ate the same food in a different order.
+        first = self.state
+        for action in [Directions.NORTH, Directions.SOUTH, Directions.SOUTH,
+                Directions.NORTH, Directions.SOUTH, Directions.NORTH]:
+            first = first.generateSuccessor(0, action)
+
+        second = self.state
+        for action in [Directions.SOUTH, Directions.NORTH, Directions.NORTH,
+                Directions.SOUTH, Directions.SOUTH, Directions.NORTH]:
+            second = second.generateSuccessor(0, action)
+
+        self.assertEqual(first, second)
+        self.assertEqual((1, 0), first.getLastFoodEaten())
+        self.assertEqual((1, 2), second.getLastFoodEaten())
+
+        # A successor that did not eat keeps its own parent's last eaten food.
+        self.assertEqual((1, 0), first.generateSuccessor(1, Directions.WEST).getLastFoodEaten())
+        self.assertEqual((1, 2), second.generateSuccessor(1, Directions.WEST).getLastFoodEaten())
+
+        for (action, successor) in second.generateAllSuccessors(1):
+            self.assertEqual((1, 2), successor.getLastFoodEaten())
+
+        first = first.generateSuccessor(0, Directions.EAST)
+        second = second.generateSuccessor(0, Directions.EAST)
+        self.assertEqual((1, 2), second.getLastFoodEaten())
+
+        # A successor that did eat is the same for both.
+        self.assertIs(first.generateSuccessor(0, Directions.EAST),
+                second.generateSuccessor(0, Directions.EAST))
+        self.assertEqual((3, 1), second.generateSuccessor(0, Directions.EAST).getLastFoodEaten())
+
+    def test_successor_cache_capture(self):
+        state = CaptureGameState(getLayout('defaultCapture'), 1200)
+        state.setSuccessorCache(LRUCache(100))
+
+        # Equal states with different amounts of time left must not share successors.
+        first = state.generateSuccessor(0, Directions.STOP)
+        second = first.generateSuccessor(0, Directions.STOP)
+        self.assertEqual(first, second)
+        self.assertIsNot(first.generateSuccessor(0, Directions.STOP),
+                second.generateSuccessor(0, Directions.STOP))
+
+    def _checkFoodCounts(self, state):
+        self.assertEqual(state.getFood().count(), state.getNumFood())
+
+        if (isinstance(state, CaptureGameState)):
+            self.assertEqual(state.getRedFood().count(), state.getNumRedFood())
+            self.assertEqual(state.getBlueFood().count(), state.getNumBlueFood())
+            self.assertEqual(state.getNumFood(), state.getNumRedFood() + state.getNumBlueFood())
+
+    def test_food_counts(self):
+        rng = random.Random(11)
+
+        state = self.state
+        for i in range(200):
+            if (state.isOver()):
+                break
+
+            agentIndex = i % state.getNumAgents()
+            state = state.generateSuccessor(agentIndex,
+                    rng.choice(state.getLegalActions(agentIndex)))
+            self._checkFoodCounts(state)
+
+        self.assertTrue(state.getNumFood() < self.state.getNumFood())
+
+        # Agents rarely cross the board when moving randomly, so eat on each side directly.
+        initial = CaptureGameState(getLayout('defaultCapture'), 1200)
+        state = initial.generateSuccessor(0, Directions.STOP)
+        for food in [initial.getRedFood().asList()[0], initial.getBlueFood().asList()[0]]:
+            state.eatFood(*food)
+            self._checkFoodCounts(state)
+
+        self._checkFoodCounts(initial)
+        self.assertEqual(initial.getNumRedFood() - 1, state.getNumRedFood())
+        self.assertEqual(initial.getNumBlueFood() - 1, state.getNumBlueFood())
+
+        # Eating the same food again does nothing.
+        for food in [initial.getRedFood().asList()[0], initial.getBlueFood().asList()[0]]:
+            self.assertFalse(state.eatFood(*food))
+            self._checkFoodCounts(state)
+
+        self.assertEqual(initial.getNumRedFood() - 1, state.getNumRedFood())
+        self.assertEqual(initial.getNumBlueFood() - 1, state.getNumBlueFood())
+
+        # Same for capsules.
+        capsule = initial.getCapsules()[0]
+        self.assertTrue(state.eatCapsule(*capsule))
+        self.assertFalse(state.eatCapsule(*capsule))
+        self.assertEqual(len(initial.getCapsules()) - 1, len(state.getCapsules()))
+        self.assertEqual(len(state.getCapsules()),
+                len(state.getRedCapsules()) + len(state.getBlueCapsules()))
+        self.assertEqual(len(initial.getCapsules()),
+                len(initial.getRedCapsules()) + len(initial.getBlueCapsules()))
+
+    def _checkBytes(self, state, numMoves):
+        rng = random.Random(7)
+        layout = state.getInitialLayout()
+
+        agentIndex = 0
+        for i in range(numMoves):
+            if (state.isOver()):
+                break
+
+            state = state.generateSuccessor(agentIndex,
+                    rng.choice(state.getLegalActions(agentIndex)))
+            agentIndex = (agentIndex + 1) % state.getNumAgents()
+
+            data = state.toBytes()
+            unpacked = state.__class__.fromBytes(layout, data)
+
+            self.assertEqual(state, unpacked)
+            self.assertEqual(hash(state), hash(unpacked))
+            self.assertEqual(state.getFood(), unpacked.getFood())
+            self.assertEqual(state.getCapsules(), unpacked.getCapsules())
+            self.assertEqual(state.getNumFood(), unpacked.getNumFood())
+            self.assertEqual(data, unpacked.toBytes())
+
+        return state
+
+    def test_bytes_pacman(self):
+        self._checkBytes(self.state, 20)
+
+        state = self._checkBytes(PacmanGameState(getLayout('mediumClassic')), 100)
+        with self.assertRaises(ValueError):
+            PacmanGameState.fromBytes(getLayout('smallClassic'), state.toBytes())
+
+        with self.assertRaises(ValueError):
+            CaptureGameState.fromBytes(getLayout('mediumClassic'), state.toBytes())
+
+    def test_bytes_capture(self):
+        state = self._checkBytes(CaptureGameState(getLayout('defaultCapture'), 1200), 200)
+
+        unpacked = CaptureGameState.fromBytes(state.getInitialLayout(), state.toBytes())
+        self.assertEqual(state.getRedFood(), unpacked.getRedFood())
+        self.assertEqual(state.getBlueCapsules(), unpacked.getBlueCapsules())
+        self.assertEqual(state._timeleft, unpacked._timeleft)
+
+    def _checkMakeUnmake(self, state, numMoves):
+        rng = random.Random(4)
+
+        original = state
+        state = state.generateSuccessor(0, Directions.STOP)
+        before = original.generateSuccessor(0, Directions.STOP)
+
+        records = []
+        agentIndex = 0
+        for i in range(numMoves):
+            if (state.isOver()):
+                break
+
+            action = rng.choice(state.getLegalActions(agentIndex))
+            expected = state.generateSuccessor(agentIndex, action)
+
+            records.append(state.applyMove(agentIndex, action))
+            self.assertEqual(expected, state)
+            self.assertEqual(hash(expected), hash(state))
+            self.assertEqual(expected.getNumFood(), state.getNumFood())
+
+            agentIndex = (agentIndex + 1) % state.getNumAgents()
+
+        self.assertTrue(len(records) > 0)
+
+        for record in reversed(records):
+            state.undoMove(record)
+
+        self.assertEqual(before, state)
+        self.assertEqual(hash(before), hash(state))
+        self.assertEqual(before.getFood(), state.getFood())
+        self.assertEqual(before.getCapsules(), state.getCapsules())
+
+        # The state we started from should not have been touched.
+        self.assertEqual(original.getFood(), original.getInitialLayout().food)
+
+    def test_make_unmake_pacman(self):
+        self._checkMakeUnmake(PacmanGameState(getLayout('smallClassic')), 200)
+
+    def test_make_unmake_sparse_food(self):
+        layout = getLayout('defaultCapture', foodGridClass = SparseGrid)
+        self._checkMakeUnmake(CaptureGameState(layout, 1200), 400)
+
+    def test_make_unmake_capture(self):
+        state = CaptureGameState(getLayout('defaultCapture'), 1200)
+        self._checkMakeUnmake(state, 400)
+
+if __name__ == '__main__':
+    unittest.main()
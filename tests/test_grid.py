@@ -0,0 +1,202 @@
+import unittest
+
+from pacai.core.grid import BitGrid
+from pacai.core.grid import Grid
+from pacai.core.grid import ReadOnlyGrid
+from pacai.core.grid import SparseGrid
+from pacai.core.layout import getLayout
+
+"""
+Test the different grid implementations against each other.
+"""
+class GridTest(unittest.TestCase):
+    def _buildGrids(self, width = 5, height = 4):
+        grid = Grid(width, height)
+        bitGrid = BitGrid(width, height)
+
+        for (x, y) in [(0, 0), (1, 3), (4, 2), (2, 1)]:
+            grid[x][y] = True
+            bitGrid[x][y] = True
+
+        return grid, bitGrid
+
+    def test_bitgrid_matches_grid(self):
+        grid, bitGrid = self._buildGrids()
+
+        self.assertEqual(grid.asList(), bitGrid.asList())
+        self.assertEqual(grid.asList(False), bitGrid.asList(False))
+        self.assertEqual(grid.count(), bitGrid.count())
+        self.assertEqual(grid.count(False), bitGrid.count(False))
+        self.assertEqual(str(grid), str(bitGrid))
+        self.assertEqual(hash(grid), hash(bitGrid))
+        self.assertEqual(bitGrid, grid)
+        self.assertEqual(grid, bitGrid)
+
+        for x in range(grid.getWidth()):
+            for y in range(grid.getHeight()):
+                self.assertEqual(grid[x][y], bitGrid[x][y])
+
+    def test_bitgrid_hash_tracks_writes(self):
+        grid, bitGrid = self._buildGrids()
+
+        grid[1][3] = False
+        bitGrid[1][3] = False
+        grid[3][3] = True
+        bitGrid[3][3] = True
+
+        self.assertEqual(hash(grid), hash(bitGrid))
+        self.assertEqual(hash(BitGrid(30, 30, initialValue = True)),
+                hash(Grid(30, 30, initialValue = True)))
+
+    def test_bitgrid_copy(self):
+        _, bitGrid = self._buildGrids()
+
+        copy = bitGrid.copy()
+        self.assertEqual(bitGrid, copy)
+
+        copy[0][0] = False
+        self.assertTrue(bitGrid[0][0])
+        self.assertFalse(copy[0][0])
+        self.assertNotEqual(bitGrid, copy)
+
+    def test_copy_on_write(self):
+        grid, _ = self._buildGrids()
+        original = grid.copy()
+
+        child = grid.copyOnWrite()
+        child.setCell(1, 3, False)
+
+        # Only the written column is copied, the rest are still shared.
+        self.assertIsNot(grid._data[1], child._data[1])
+        self.assertIs(grid._data[0], child._data[0])
+
+        self.assertTrue(grid[1][3])
+        self.assertFalse(child[1][3])
+
+        # The parent must not write through to its child either.
+        grid.setCell(0, 0, False)
+        self.assertFalse(grid[0][0])
+        self.assertTrue(child[0][0])
+
+        grid.setCell(0, 0, True)
+        self.assertEqual(original, grid)
+
+    def test_copy_columns(self):
+        grid, bitGrid = self._buildGrids()
+
+        for (start, end) in [(0, 2), (2, 5), (1, 1), (-1, 9)]:
+            expected = Grid(grid.getWidth(), grid.getHeight())
+            for (x, y) in grid.asList():
+                if (start <= x < end):
+                    expected[x][y] = True
+
+            self.assertEqual(expected, grid.copyColumns(start, end))
+            self.assertEqual(expected, bitGrid.copyColumns(start, end))
+            self.assertEqual(hash(expected), hash(bitGrid.copyColumns(start, end)))
+
+        # Copies must not share columns with the original.
+        left = grid.copyColumns(0, 2)
+        left[0][0] = False
+        self.assertTrue(grid[0][0])
+
+    def test_sparsegrid_matches_grid(self):
+        grid, _ = self._buildGrids()
+
+        sparseGrid = SparseGrid(grid.getWidth(), grid.getHeight())
+        for (x, y) in grid.asList():
+            sparseGrid[x][y] = True
+
+        self.assertEqual(grid.asList(), sparseGrid.asList())
+        self.assertEqual(grid.asList(False), sparseGrid.asList(False))
+        self.assertEqual(grid.count(), sparseGrid.count())
+        self.assertEqual(grid.count(False), sparseGrid.count(False))
+        self.assertEqual(str(grid), str(sparseGrid))
+        self.assertEqual(hash(grid), hash(sparseGrid))
+        self.assertEqual(grid, sparseGrid)
+        self.assertEqual(sparseGrid, grid)
+
+        for x in range(grid.getWidth()):
+            for y in range(grid.getHeight()):
+                self.assertEqual(grid[x][y], sparseGrid[x][y])
+                self.assertEqual(grid[x][y], (x, y) in sparseGrid)
+
+        # Writes keep the count and hash up-to-date.
+        grid[1][3] = False
+        sparseGrid[1][3] = False
+        grid[3][3] = True
+        sparseGrid.setCell(3, 3, True)
+
+        self.assertEqual(grid.count(), sparseGrid.count())
+        self.assertEqual(hash(grid), hash(sparseGrid))
+        self.assertEqual(hash(Grid(6, 7, initialValue = True)),
+                hash(SparseGrid(6, 7, initialValue = True)))
+
+    def test_sparsegrid_copy_on_write(self):
+        grid = SparseGrid(4, 4)
+        grid[1][1] = True
+        grid[2][2] = True
+
+        child = grid.copyOnWrite()
+        child.setCell(1, 1, False)
+
+        self.assertIsNot(grid._columns[1], child._columns[1])
+        self.assertIs(grid._columns[2], child._columns[2])
+        self.assertTrue(grid[1][1])
+        self.assertFalse(child[1][1])
+        self.assertEqual(2, grid.count())
+        self.assertEqual(1, child.count())
+
+    def test_read_only_grid(self):
+        for grid in self._buildGrids():
+            view = ReadOnlyGrid(grid)
+
+            self.assertEqual(grid, view)
+            self.assertEqual(view, grid)
+            self.assertEqual(hash(grid), hash(view))
+            self.assertEqual(grid.asList(), view.asList())
+            self.assertEqual(grid.count(), view.count())
+            self.assertEqual(str(grid), str(view))
+            self.assertTrue(view[1][3])
+            self.assertEqual(list(grid[1]), list(view[1]))
+            self.assertEqual(grid[1].count(True), view[1].count(True))
+            self.assertEqual(len(grid[1]), len(view[1]))
+
+            # Column views are only built once.
+            self.assertIs(view[1], view[1])
+
+            with self.assertRaises(TypeError):
+                view[1][3] = False
+
+            with self.assertRaises(TypeError):
+                view.setCell(1, 3, False)
+
+            with self.assertRaises(TypeError):
+                view[1] = [False] * grid.getHeight()
+
+            # The view shares storage, but copies are independent and mutable.
+            copy = view.copy()
+            copy[1][3] = False
+            self.assertTrue(view[1][3])
+            self.assertNotIsInstance(copy, ReadOnlyGrid)
+
+            grid.setCell(0, 0, False)
+            self.assertFalse(view[0][0])
+
+            # Columns that were already read stay live, even when the grid replaces them.
+            column = view[4]
+            grid.copyOnWrite()
+            grid.setCell(4, 2, False)
+            self.assertFalse(column[2])
+            self.assertFalse(view[4][2])
+
+    def test_bitgrid_layout(self):
+        layout = getLayout('mediumClassic')
+        bitLayout = getLayout('mediumClassic', wallGridClass = BitGrid, foodGridClass = BitGrid)
+
+        self.assertIsInstance(bitLayout.walls, BitGrid)
+        self.assertIsInstance(bitLayout.food, BitGrid)
+        self.assertEqual(layout.walls, bitLayout.walls)
+        self.assertEqual(layout.food, bitLayout.food)
+
+if __name__ == '__main__':
+    unittest.main()
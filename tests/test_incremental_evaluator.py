@@ -0,0 +1,75 @@
+import random
+import unittest
+
+from pacai.bin.capture import CaptureGameState
+from pacai.core.incrementalEvaluator import IncrementalEvaluator
+from pacai.core.layout import getLayout
+
+class FoodEvaluator(IncrementalEvaluator):
+    """
+    Features over all the food on the board, which are expensive to compute from scratch
+    but easy to update when a single piece of food is eaten.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.numComputed = 0
+
+    def computeFeatures(self, state):
+        self.numComputed += 1
+
+        foodList = state.getFood().asList()
+        return {
+            'score': state.getScore(),
+            'numFood': len(foodList),
+            'foodX': sum([x for (x, y) in foodList]),
+        }
+
+    def getWeights(self):
+        return {
+            'score': 100,
+            'numFood': -10,
+            'foodX': 1,
+        }
+
+    def updateFeatures(self, features, delta, state):
+        features['score'] += delta.scoreChange
+        features['numFood'] -= len(delta.foodEaten)
+        features['foodX'] -= sum([x for (x, y) in delta.foodEaten])
+
+        return features
+
+"""
+Test evaluators that update their features from a parent's features.
+"""
+class IncrementalEvaluatorTest(unittest.TestCase):
+    def test_matches_full_computation(self):
+        rng = random.Random(5)
+        evaluator = FoodEvaluator()
+
+        state = CaptureGameState(getLayout('defaultCapture'), 1200)
+        evaluator.evaluate(state)
+
+        numMoves = 0
+        agentIndex = 0
+        while (not state.isOver() and numMoves < 300):
+            parent = state
+            state = state.generateSuccessor(agentIndex,
+                    rng.choice(state.getLegalActions(agentIndex)))
+            agentIndex = (agentIndex + 1) % state.getNumAgents()
+            numMoves += 1
+
+            # Eat some food directly, so there is something to update.
+            if (numMoves % 10 == 0):
+                (x, y) = state.getFood().asList()[0]
+                state.eatFood(x, y)
+
+            value = evaluator.evaluate(state, parent)
+            self.assertEqual(FoodEvaluator().evaluate(state), value)
+
+        # Only the first state is computed from scratch.
+        self.assertEqual(1, evaluator.numComputed)
+        self.assertEqual(evaluator.getFeatures(state), evaluator.getCache().get(state))
+
+if __name__ == '__main__':
+    unittest.main()
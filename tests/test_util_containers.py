@@ -1,5 +1,6 @@
 import unittest
 
+from pacai.util import lruCache
 from pacai.util import priorityQueue
 from pacai.util import queue
 from pacai.util import stack
@@ -52,5 +53,31 @@ class UtilContainersTest(unittest.TestCase):
         for val, pri in reversed(val_list):
             self.assertEqual(val, testPriorityQueue.pop())
 
+    def test_lru_cache(self):
+        testCache = lruCache.LRUCache(2)
+        self.assertEqual(0, len(testCache))
+
+        testCache.put('a', 1)
+        testCache.put('b', 2)
+        self.assertEqual(1, testCache.get('a'))
+
+        # 'b' is now the least recently used item.
+        testCache.put('c', 3)
+        self.assertEqual(2, len(testCache))
+        self.assertIsNone(testCache.get('b'))
+        self.assertEqual(1, testCache.get('a'))
+        self.assertEqual(3, testCache.get('c'))
+
+        self.assertEqual(3, testCache.hits)
+        self.assertEqual(1, testCache.misses)
+        self.assertEqual(1, testCache.evictions)
+
+        self.assertEqual(3, testCache.pop('c'))
+        self.assertIsNone(testCache.pop('c'))
+        self.assertNotIn('c', testCache)
+
+        with self.assertRaises(ValueError):
+            lruCache.LRUCache(0)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,67 @@
+import signal
+import threading
+import time
+import unittest
+
+from pacai.util.watchdog import DeadlineExceeded
+from pacai.util.watchdog import Watchdog
+from pacai.util.watchdog import canWatch
+
+"""
+Test stopping calls that run past their time limit.
+"""
+class WatchdogTest(unittest.TestCase):
+    def test_stops_calls(self):
+        # Busy loops and sleeps are both cut off.
+        for busy in [False, True]:
+            startTime = time.time()
+
+            with self.assertRaises(DeadlineExceeded):
+                with Watchdog(0.1) as watchdog:
+                    self.assertTrue(watchdog.isArmed())
+
+                    if (busy):
+                        while (True):
+                            pass
+                    else:
+                        time.sleep(10)
+
+            self.assertTrue(time.time() - startTime < 1)
+            self.assertFalse(watchdog.isArmed())
+
+    def test_caught_deadline(self):
+        # A call that ignores the first interruption gets interrupted again.
+        with self.assertRaises(DeadlineExceeded):
+            with Watchdog(0.05):
+                try:
+                    time.sleep(10)
+                except DeadlineExceeded:
+                    pass
+
+                time.sleep(10)
+
+    def test_fast_calls(self):
+        with Watchdog(10):
+            value = sum(range(100))
+
+        self.assertEqual(4950, value)
+
+        # The timer is off once the call is done.
+        self.assertEqual((0.0, 0.0), signal.getitimer(signal.ITIMER_REAL))
+
+    def test_other_threads(self):
+        results = []
+
+        def watch():
+            with Watchdog(0.01) as watchdog:
+                time.sleep(0.05)
+                results.append((canWatch(), watchdog.isArmed()))
+
+        thread = threading.Thread(target = watch)
+        thread.start()
+        thread.join()
+
+        self.assertEqual([(False, False)], results)
+
+if __name__ == '__main__':
+    unittest.main()